@@ -1,18 +1,29 @@
 import streamlit as st
 import nest_asyncio
 import pandas as pd
+import time
 import os
 
-from htbuilder import span, div
+from contextlib import nullcontext
 from loguru import logger
-from annotated_text import annotation
-from scripts.predict import InferenceHandler
-from huggingface_hub import snapshot_download
+from scripts.reloader import ModelReloader
+from scripts.service import ServiceClient
+from scripts.metrics import REGISTRY, start_metrics_server
+from scripts.history import HistoryStore
+from scripts.rendering import LABEL_COLORS, build_result_tree
+from scripts.datasets import ArrowDataset, DatasetCatalog, TEXT_COLUMNS, LABEL_COLUMNS, dataset_snapshot, find_column
+from scripts.score_index import PROBABILITY_COLUMN, index_path, load_score_index, join_scores
 
 from scripts.config import (
     BIN_REPO,
     ML_REPO,
-    DATASET_REPO
+    DATASET_REPO,
+    DATASET_PAGE_SIZE,
+    RELOAD_ENABLED,
+    RELOAD_POLL_INTERVAL,
+    METRICS_HOST,
+    METRICS_PORT,
+    SERVICE_URL
 )
 
 
@@ -21,7 +32,10 @@ st.set_page_config(layout='wide')
 rc = None
 
 def load_history(parent_elem):
-    """Loads the history of results from inference for previous inputs made by the user.
+    """Loads a page of the history of results from inference for previous inputs made by the user.
+
+    Only the entries of the selected page are rendered, and their DataFrames are cached by the history store, so the cost of a
+    rerun does not grow with the length of the history.
 
     Parameters
     ----------
@@ -29,50 +43,41 @@ def load_history(parent_elem):
         The Streamlit UI element that contains the history data.
     """
 
+    history = st.session_state.history
     with parent_elem:
-        if len(st.session_state.results) == 0:
+        if len(history) == 0:
             st.markdown(
                 f"<p style='text-align: center; font-weight: bold; font-style: italic; font-size: 1.5vw;'>No History</p>", 
                 unsafe_allow_html=True
             )
         else:
-            for idx, result in enumerate(st.session_state.results):
-                text = result['text_input']
-                discriminatory = False
-
-                data = []
-                for sent_item in result['results']:
-                    sentence = sent_item['sentence']
-                    bin_class = sent_item['binary_classification']['classification']
-                    pred_class = sent_item['binary_classification']['prediction_class']
-                    ml_regr = sent_item['multilabel_regression']
-
-                    row_data = [sentence, bin_class]
-                    if pred_class == 1:
-                        discriminatory = True
-                        for cat in ml_regr.keys():
-                            perc = ml_regr[cat] * 100
-                            row_data.append(f'{perc:.2f}%')
-                    else:
-                        for i in range(6):
-                            row_data.append(None)
-
-                    data.append(row_data)
-                df = pd.DataFrame(data=data, columns=['Sentence', 'Binary Classification', 'Gender', 'Race', 'Sexuality', 'Disability', 'Religion', 'Unspecified'])
-
-                with st.expander(label=f'Entry #{idx+1}', icon='🔴' if discriminatory else '🟢'):
+            num_pages = history.num_pages()
+            page = 1
+            if num_pages > 1:
+                page = st.number_input(f'Page (of {num_pages}, most recent first)', min_value=1, max_value=num_pages, value=1, key='history_page')
+
+            for idx, entry in history.page(page):
+                with st.expander(label=f'Entry #{idx+1}', icon='🔴' if entry.discriminatory else '🟢'):
                     st.markdown('<hr style="margin: 0.5em 0 0 0;">', unsafe_allow_html=True)
                     st.markdown(
-                        f"<p style='text-align: center; font-weight: bold; font-style: italic; font-size: medium;'>\"{text}\"</p>", 
+                        f"<p style='text-align: center; font-weight: bold; font-style: italic; font-size: medium;'>\"{entry.text_input}\"</p>", 
                         unsafe_allow_html=True
                     )
                     st.markdown('<hr style="margin: 0 0 0.5em 0;">', unsafe_allow_html=True)
                     st.markdown('##### Sentence Breakdown:')
-                    st.dataframe(df)
+                    st.dataframe(history.frame(idx, entry))
+
+            dropped = len(history) - history.available()
+            if dropped > 0 and page == num_pages:
+                st.markdown(f'*{dropped} older entries are no longer kept (see the `[history]` section of `config.toml`).*')
 
-@st.cache_data
-def load_inference_handler(api_token: str) -> InferenceHandler | None:
-    """Loads an instance of the InferenceHandler class once a token is entered.
+@st.cache_resource(show_spinner='Loading models...')
+def load_model_reloader(api_token: str) -> ModelReloader:
+    """Loads the shared model reloader, which holds the InferenceHandler (and its batch scheduler) serving every session.
+
+    The handler is retrieved from the process-wide model registry and cached as a resource (not pickled), so it is loaded
+    once and shared across every session and rerun. When the repositories in config.toml change, the reloader loads the new
+    models in the background and swaps them in between requests.
 
     Parameters
     ----------
@@ -81,174 +86,307 @@ def load_inference_handler(api_token: str) -> InferenceHandler | None:
 
     Returns
     -------
-    InferenceHandler | None
-        Returns an instance of the InferenceHandler class if a valid token is entered, otherwise returns None.
+    ModelReloader
+        The shared ModelReloader instance.
     """
 
-    return InferenceHandler(api_token)
+    return ModelReloader(api_token, poll_interval=RELOAD_POLL_INTERVAL if RELOAD_ENABLED else 0)
 
-def build_result_tree(parent_elem, results: dict):
-    """Loads the history of results from inference for previous inputs made by the user.
+@st.cache_resource(show_spinner='Connecting to the inference service...')
+def load_service_client(url: str) -> ServiceClient:
+    """Loads the pooled client of the inference service shared by every session, used instead of loading the models in this process.
 
     Parameters
     ----------
-    parent_elem : DeltaGenerator
-        The Streamlit UI element to post the data to.
-    results : dict
-        The resulting data from performing inference.
+    url : str
+        The base URL of the inference service.
+
+    Returns
+    -------
+    ServiceClient
+        The shared ServiceClient instance, after checking that the service is reachable.
+    """
+
+    client = ServiceClient(url)
+    logger.info(f'Using the inference service at {url} (models: {client.model_key}).')
+    return client
+
+@st.cache_resource
+def load_metrics_server():
+    """Starts the local HTTP endpoint exposing the inference metrics in the Prometheus text format (once per process).
+
+    Returns
+    -------
+    ThreadingHTTPServer | None
+        The running server, or None if it could not be started.
     """
 
-    label_dict = {
-        'Gender': '#4A90E2',
-        'Race': '#E67E22',
-        'Sexuality': '#3B9C5A',  
-        'Disability': '#8B5E3C',
-        'Religion': '#A347BA',  
-        'Unspecified': '#A0A0A0'
-    }
-
-    discriminatory_sentiment = False
-
-    sent_details = []
-    for result in results['results']:
-        sentence = result['sentence']
-        bin_class = result['binary_classification']['classification']
-        pred_class = result['binary_classification']['prediction_class']
-        ml_regr = result['multilabel_regression']
-
-        sent_res = {
-            'sentence': sentence,
-            'classification': f':red[{bin_class}]' if pred_class else f':green[{bin_class}]',
-            'annotated_categories': []
-        }
-
-        if pred_class == 1:
-            discriminatory_sentiment = True
-            at_list = []
-            for entry in ml_regr.keys():
-                val = ml_regr[entry]
-                if val > 0.0:
-                    perc = val * 100
-                    at_list.append(annotation(body=entry, label=f'{perc:.2f}%', background=label_dict[entry]))
-            sent_res['annotated_categories'] = at_list
-        sent_details.append(sent_res)
+    try:
+        return start_metrics_server(METRICS_HOST, METRICS_PORT)
+    except OSError as e:
+        logger.error(f'Unable to start the metrics endpoint on {METRICS_HOST}:{METRICS_PORT}: {e}')
+        return None
+
+def load_diagnostics(parent_elem):
+    """Loads the diagnostics panel showing the aggregated inference metrics and the metrics of the last request.
+
+    Parameters
+    ----------
+    parent_elem : DeltaGenerator
+        The Streamlit UI element that contains the diagnostics.
+    """
 
+    snapshot = REGISTRY.snapshot()
     with parent_elem:
-        result_hdr = ':red[Detected Discriminatory Sentiment]' if discriminatory_sentiment else ':green[No Discriminatory Sentiment Detected]'
-        st.markdown(f'### Results - {result_hdr}')
-        with st.container(border=True):
-            st.markdown('<hr style="margin: 0.5em 0 0 0;">', unsafe_allow_html=True)
-            st.markdown(
-                f"<p style='text-align: center; font-weight: bold; font-style: italic; font-size: large;'>\"{results['text_input']}\"</p>", 
-                unsafe_allow_html=True
-            )
-            st.markdown('<hr style="margin: 0 0 0.5em 0;">', unsafe_allow_html=True)
+        st.markdown('### Diagnostics')
+        if st.session_state.last_metrics is not None:
+            last = st.session_state.last_metrics
+            st.markdown('##### Last Request')
+            st.dataframe(pd.DataFrame(
+                [{'Stage': name, 'Time (ms)': ms} for name, ms in last['stages_ms'].items()] +
+                [{'Stage': 'total', 'Time (ms)': last['total_ms']}]
+            ))
+            st.markdown(f"Tokens: {last['tokens']}, padded tokens: {last['padded_tokens']}, padding waste: {last['padding_waste']:.1%}")
+            if len(last['batches']) > 0:
+                st.dataframe(pd.DataFrame(last['batches']))
+
+        st.markdown('##### Aggregated Histograms')
+        if len(snapshot['histograms']) > 0:
+            st.dataframe(pd.DataFrame(snapshot['histograms']))
+            st.dataframe(pd.DataFrame(snapshot['counters']))
+        else:
+            st.markdown('No metrics have been recorded (enable them in the `[metrics]` section of `config.toml`).')
+
+        if reloader is not None:
+            st.markdown('##### Models')
+            st.json(reloader.stats())
+            st.button('Reload models', on_click=reloader.request_reload, help='Loads the configured models again in the background and swaps them in.')
+        if client is not None:
+            st.markdown('##### Inference Service')
+            st.json(client.stats())
+        if ih is not None and ih.cache is not None:
+            st.markdown('##### Result Cache')
+            st.json(ih.cache.stats())
+        if ih is not None and ih.prefilter is not None:
+            st.markdown('##### Prefilter')
+            st.json(ih.prefilter_stats())
+        if ih is not None and ih.dedup is not None:
+            st.markdown('##### Near-Duplicate Detection')
+            st.json(ih.dedup.stats())
+        if ih is not None:
+            st.markdown('##### Model Memory')
+            st.json(ih.memory_breakdown())
+        if scheduler is not None:
+            st.markdown('##### Batch Scheduler')
+            st.json(scheduler.stats())
+
+        with st.expander('Prometheus Export'):
+            st.code(REGISTRY.to_prometheus(), language='text')
 
-            if discriminatory_sentiment:
-                if (len(results['results']) > 1):
-                    st.markdown('##### Sentence Breakdown:')
-                    for idx, sent in enumerate(sent_details):
-                        with st.expander(label=f'Sentence #{idx+1}', icon='🔴' if len(sent['annotated_categories']) > 0 else '🟢', expanded=True):
-                            st.markdown('<hr style="margin: 0.5em 0 0 0;">', unsafe_allow_html=True)
-                            st.markdown(
-                                f"<p style='text-align: center; font-weight: bold; font-style: italic; font-size: large;'>\"{sent['sentence']}\"</p>", 
-                                unsafe_allow_html=True
-                            )
-                            st.markdown('<hr style="margin: 0 0 0.5em 0;">', unsafe_allow_html=True)
-
-                            classification = sent['classification']
-                            st.markdown(f'##### Classification - {classification}')
-
-                            if len(sent['annotated_categories']) > 0:
-                                st.markdown(
-                                    div(    
-                                        span(' ' if idx != 0 else '')[
-                                            item
-                                        ] for idx, item in enumerate(sent['annotated_categories'])
-                                    ),
-                                    unsafe_allow_html=True
-                                )
-                                st.markdown('\n')
-                else:
-                    sent = sent_details[0]
-                    st.markdown(f"#### Classification - {sent['classification']}")
-                    if len(sent['annotated_categories']) > 0:
-                        st.markdown(
-                            div(    
-                                span(' ' if idx != 0 else '')[
-                                    item
-                                ] for idx, item in enumerate(sent['annotated_categories'])
-                            ),
-                            unsafe_allow_html=True
-                        )
-                        st.markdown('\n')
-
-@st.cache_data
 def analyze_text(input: str):
-    """Performs infernce on the entered text using the InferenceHandler.
+    """Performs infernce on the entered text using the InferenceHandler, rendering the results as they are streamed.
     
     Parameters
     ----------
     input : str
         The text to analyze.
     """
-    if ih is not None:
-        res = None
-        with rc:
-            with st.spinner("Processing...", show_time=True) as spnr:
-                res = ih.classify_text(input)
-                del spnr
+    if classifier is None:
+        return
+
+    # The generation of models is pinned for the whole request, so a hot-swap never mixes old and new models within it
+    with reloader.acquire() if reloader is not None else nullcontext() as generation:
+        request_classifier = generation.classifier if generation is not None else classifier
+        request_ih = generation.handler if generation is not None else None
+
+        inference_time = 0.0
+        stream = request_classifier.classify_text_stream(input)
+
+        def timed_stream():
+            nonlocal inference_time
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = next(stream)
+                except StopIteration as stop:
+                    inference_time += time.perf_counter() - start
+                    return stop.value
+                inference_time += time.perf_counter() - start
+                yield chunk
+
+        start = time.perf_counter()
+        res = build_result_tree(rc, {'text_input': input, 'results': []}, timed_stream())
+        render_time = time.perf_counter() - start - inference_time
 
         if res is not None:
-            st.session_state.results.append(res)
-            build_result_tree(rc, res)
+            st.session_state.history.append(res)
+            st.session_state.last_metrics = res.get('metrics')
+            st.session_state.last_timings = {
+                'sentences': len(res['results']),
+                'inference_ms': inference_time * 1000.0,
+                'render_ms': render_time * 1000.0
+            }
+
+            if request_ih is not None and request_ih.collect_metrics:
+                REGISTRY.observe('stage_seconds', render_time, stage='render')
+            if 'metrics' in res:
+                res['metrics']['stages_ms']['render'] = render_time * 1000.0
+
+@st.cache_resource(show_spinner='Loading datasets...')
+def load_dataset_catalog(api_token: str) -> DatasetCatalog:
+    """Loads the catalog of the datasets in the dataset repository snapshot (downloading the snapshot once per process).
+
+    Parameters
+    ----------
+    api_token: str
+        The Hugging Face token used for downloading the dataset repository.
+
+    Returns
+    -------
+    DatasetCatalog
+        The shared catalog, whose datasets are loaded lazily.
+    """
+
+    return DatasetCatalog(dataset_snapshot(api_token))
+
+def load_dataset(ds: ArrowDataset, key: str):
+    """Renders a page of a dataset, loading the dataset only once the user chooses to view it.
+
+    Parameters
+    ----------
+    ds : ArrowDataset
+        The dataset to render.
+    key : str
+        A key unique to the dataset, used for its widgets.
+    """
+
+    if not st.toggle('Load dataset', key=f'{key}_load', value=ds.loaded):
+        return
+
+    try:
+        ds.load()
+    except Exception as e:
+        logger.error(f'{e}')
+        st.markdown(f'Unable to load the dataset: {e}')
+        return
+
+    stats = ds.stats
+    st.caption(
+        f"{stats['rows']} rows - loaded in {stats['load_seconds'] * 1000:.1f} ms{' (converted from CSV)' if stats['converted'] else ''}, "
+        f"{stats['mapped_bytes'] / 2**20:.2f} MB memory-mapped, {stats['allocated_bytes'] / 2**20:.2f} MB allocated"
+    )
+
+    page = 1
+    num_pages = ds.num_pages()
+    if num_pages > 1:
+        page = st.number_input(f'Page (of {num_pages})', min_value=1, max_value=num_pages, value=1, key=f'{key}_page')
+    st.dataframe(ds.page(page))
+
+@st.cache_resource(show_spinner='Joining model scores...')
+def load_scored_master(_master: ArrowDataset, revision: str, model_key: str, index_mtime: float) -> pd.DataFrame:
+    """Joins the master dataset with the score index of the loaded models (once per dataset revision, model key and index version).
+
+    Parameters
+    ----------
+    _master : ArrowDataset
+        The master dataset.
+    revision : str
+        The revision of the dataset snapshot.
+    model_key : str
+        The revisions of the loaded models.
+    index_mtime : float
+        The modification time of the score index, so that a rebuilt index is joined again.
+
+    Returns
+    -------
+    pd.DataFrame
+        The master dataset with the binary probability and category scores of each row.
+    """
+
+    df = _master.to_pandas()
+    return join_scores(df, find_column(df, TEXT_COLUMNS), load_score_index(model_key))
+
+def load_master_scores(master: ArrowDataset, revision: str):
+    """Renders the precomputed model scores of the master dataset, filtered by the user, without performing any inference.
+
+    Parameters
+    ----------
+    master : ArrowDataset
+        The master dataset.
+    revision : str
+        The revision of the dataset snapshot.
+    """
+
+    if model_key is None:
+        return
+
+    path = index_path(model_key)
+    if not path.exists():
+        st.caption('No model scores have been computed for the loaded models (run `python -m scripts.config score-dataset`).')
+        return
+    if not st.toggle('Show model scores', key='master_scores'):
+        return
+
+    df = load_scored_master(master, revision, model_key, path.stat().st_mtime)
+    categories = list(LABEL_COLORS)
+
+    col1, col2, col3 = st.columns(3)
+    min_prob = col1.slider('Minimum discriminatory probability', 0.0, 1.0, 0.0, key='master_scores_prob')
+    category = col2.selectbox('Category', ['Any'] + categories, key='master_scores_category')
+    min_score = col3.slider('Minimum category score', 0.0, 1.0, 0.0, key='master_scores_min', disabled=category == 'Any')
+    disagree = st.checkbox('Only rows where the binary model disagrees with the label', key='master_scores_disagree')
+
+    mask = df[PROBABILITY_COLUMN] >= min_prob
+    if category != 'Any':
+        mask &= df[category] >= min_score
+    if disagree:
+        label_column = find_column(df, LABEL_COLUMNS)
+        mask &= (df[PROBABILITY_COLUMN] > 0.5) != (df[label_column].astype(float) > 0.5)
+
+    filtered = df[mask]
+    st.caption(f'{len(filtered)} of {len(df)} rows match ({int(df[PROBABILITY_COLUMN].isna().sum())} rows are not scored yet).')
+
+    page = 1
+    num_pages = max(1, -(-len(filtered) // DATASET_PAGE_SIZE))
+    if num_pages > 1:
+        page = st.number_input(f'Page (of {num_pages})', min_value=1, max_value=num_pages, value=1, key='master_scores_page')
+    st.dataframe(filtered.iloc[(page - 1) * DATASET_PAGE_SIZE:page * DATASET_PAGE_SIZE])
 
-@st.cache_data
 def load_datasets(_parent_elem, api_token: str):
-    # if api_token is None or len(api_token) == 0:
-    #     raise Exception()
+    """Loads the Datasets tab, listing the master dataset and the raw and normalized source datasets.
 
-    cache_path = snapshot_download(repo_id=DATASET_REPO, repo_type='dataset', token=api_token)
-    ds_record = pd.read_csv(os.path.join(cache_path, 'dataset_record.csv'))
-    
-    raw_ds_path = os.path.join(cache_path, 'raw')
-    interim_ds_path = os.path.join(cache_path, 'interim')
-    processed_ds_path = os.path.join(cache_path, 'processed')
+    Parameters
+    ----------
+    _parent_elem : DeltaGenerator
+        The Streamlit UI element that contains the datasets.
+    api_token: str
+        The Hugging Face token used for downloading the dataset repository.
+    """
+
+    catalog = load_dataset_catalog(api_token)
+    records = catalog.records()
+    master = catalog.master()
 
     with _parent_elem:
         st.markdown(f'### Disclaimer')
         st.markdown("> The datasets displayed contain content that may be highly discriminatory or offensive in nature. Viewer discretion is advised. This content is presented solely for analysis, research, or educational purposes and does not reflect the views or values of the creators or maintainers of this application.")
         st.markdown('<hr style="margin: 0 0 0.5em 0;">', unsafe_allow_html=True)
 
-        if os.path.exists(os.path.join(processed_ds_path, 'NLPinitiative_Master_Dataset.csv')):
-            master_df = pd.read_csv(os.path.join(processed_ds_path, 'NLPinitiative_Master_Dataset.csv'))
-
-            if len(master_df) > 0:
-                st.markdown(f'### NLPinitiative Master Dataset')
-                with st.expander(label='Master Dataset'):
-                    st.dataframe(master_df)
-
-        if len(ds_record) > 0:
-            for _, row in ds_record.iterrows():
-                try:
-                    ds_id = row['Dataset ID']
-                    ds_ref_url = row['Dataset Reference URL']
-                    raw_fn = row['Raw Dataset Filename']
-                    norm_fn = row['Converted Filename']
-
-                    raw_df = pd.read_csv(os.path.join(raw_ds_path, raw_fn))
-                    norm_df = pd.read_csv(os.path.join(interim_ds_path, norm_fn))
-
-                    st.markdown('<hr style="margin: 0 0 0.5em 0;">', unsafe_allow_html=True)
-                    st.markdown(f'#### {ds_id} - [Link to Dataset Source]({ds_ref_url})')
-                    with st.expander(label='Dataset'):
-                        st.markdown(f'###### Raw Dataset')
-                        st.dataframe(raw_df)
-                        st.markdown(f'###### Normalized Dataset')
-                        st.dataframe(norm_df)
-                    
-                except Exception as e:
-                    logger.error(f'{e}')
+        if master is not None:
+            st.markdown(f'### NLPinitiative Master Dataset')
+            with st.expander(label='Master Dataset'):
+                load_dataset(master, 'master')
+                load_master_scores(master, catalog.revision)
+
+        if len(records) > 0:
+            for record in records:
+                st.markdown('<hr style="margin: 0 0 0.5em 0;">', unsafe_allow_html=True)
+                st.markdown(f"#### {record['id']} - [Link to Dataset Source]({record['url']})")
+                with st.expander(label='Dataset'):
+                    st.markdown(f'###### Raw Dataset')
+                    load_dataset(record['raw'], f"{record['id']}_raw")
+                    st.markdown(f'###### Normalized Dataset')
+                    load_dataset(record['normalized'], f"{record['id']}_normalized")
         else:
             st.markdown(
                 f"<p style='text-align: center; font-weight: bold; font-style: italic; font-size: 1.5vw;'>No Datasets to Display</p>", 
@@ -275,7 +413,16 @@ st.title('NLPinitiative Text Classifier')
 # else:
 #     ih = None
 
-ih = InferenceHandler(None)
+# With a service url the models run in the inference service, and this process only holds a pooled client
+client = load_service_client(SERVICE_URL) if len(SERVICE_URL) > 0 else None
+reloader = load_model_reloader(None) if client is None else None
+generation = reloader.current() if reloader is not None else None
+ih = generation.handler if generation is not None else None
+scheduler = generation.scheduler if generation is not None else None
+classifier = client or scheduler or ih
+model_key = client.model_key if client is not None else (ih.model_key if ih is not None else None)
+if METRICS_PORT > 0:
+    load_metrics_server()
 
 tab1 = st.empty()
 tab2 = st.empty()
@@ -284,8 +431,10 @@ tab3 = st.empty()
 
 tab1, tab2, tab3, tab4 = st.tabs(['Classifier', 'About This App', 'Input History', 'Datasets'])
 
-if "results" not in st.session_state:
-    st.session_state.results = []
+if "history" not in st.session_state:
+    st.session_state.history = HistoryStore(list(LABEL_COLORS))
+    st.session_state.last_metrics = None
+    st.session_state.last_timings = None
 
 with tab1:
     "Text Classifier for determining if entered text is discriminatory (and the categories of discrimination) or Non-Discriminatory."
@@ -294,8 +443,8 @@ with tab1:
     text_form = st.form(key='classifier', clear_on_submit=True, enter_to_submit=True)
     with text_form:
         entry = None
-        text_area = st.text_area('Enter text to classify', value='', disabled=True if ih is None else False)
-        form_btn = st.form_submit_button('submit', disabled=True if ih is None else False)
+        text_area = st.text_area('Enter text to classify', value='', disabled=True if classifier is None else False)
+        form_btn = st.form_submit_button('submit', disabled=True if classifier is None else False)
         if form_btn and text_area is not None and len(text_area) > 0:
             analyze_text(text_area)
 
@@ -368,3 +517,6 @@ with tab4:
             unsafe_allow_html=True
         )
 
+# The diagnostics panel is hidden unless the app is opened with ?diagnostics=1
+if st.query_params.get('diagnostics') == '1':
+    load_diagnostics(st.sidebar)
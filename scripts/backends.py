@@ -0,0 +1,320 @@
+"""
+Script file providing the interchangeable backends used to execute the sequence classification models.
+
+Three backends are available: eager PyTorch (the default), a traced TorchScript module and ONNX Runtime. The ONNX model is
+exported once per version of the weights and cached alongside the model's Hugging Face snapshot (or local directory). Every backend takes the padded tensors produced by the
+tokenizer and returns the model's logits as a float32 torch.Tensor (whatever the dtype of the weights), so they can be swapped
+without changing the inference code.
+"""
+
+import os
+import time
+import torch
+import hashlib
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from loguru import logger
+
+BACKENDS = ['eager', 'torchscript', 'onnx']
+
+# Fixed sentence set used for backend parity checks and latency comparisons
+PARITY_SENTENCES = [
+    'This is a short sentence.',
+    'The committee will review the proposal at its next meeting on Tuesday.',
+    'People like them should not be allowed to vote or hold office.',
+    'She said the new policy would help families in rural communities access healthcare.',
+    'Nobody wants to hear about your religion.',
+    'The weather was pleasant and the crowd was friendly throughout the entire afternoon event downtown.',
+    'They are all the same.',
+    'Officials confirmed that the bridge would reopen after the inspection was completed and approved by the state.'
+]
+
+def _model_inputs(batch) -> tuple:
+    """Extracts the (input_ids, attention_mask, token_type_ids) tensors from a tokenized batch."""
+
+    input_ids = batch['input_ids']
+    attention_mask = batch.get('attention_mask')
+    if attention_mask is None:
+        attention_mask = torch.ones_like(input_ids)
+    token_type_ids = batch.get('token_type_ids')
+    if token_type_ids is None:
+        token_type_ids = torch.zeros_like(input_ids)
+    return input_ids, attention_mask, token_type_ids
+
+WEIGHT_PATTERNS = ['*.safetensors', '*.bin']
+
+def weights_digest(snapshot_dir: Path) -> str:
+    """Computes a digest identifying the version of the weight files in a model directory, without reading them.
+
+    The digest covers the name, size and modification time of each weight file and the name of the file it resolves to (a
+    content-addressed blob in HF snapshots), so it changes whenever the weights are replaced, e.g. by a new revision or by
+    saving a model to the same local directory again.
+
+    Parameters
+    ----------
+    snapshot_dir : Path
+        The local directory holding the model's files.
+
+    Returns
+    -------
+    str
+        The hex digest of the weight files.
+    """
+
+    digest = hashlib.sha1()
+    for weights in sorted(path for pattern in WEIGHT_PATTERNS for path in Path(snapshot_dir).glob(pattern)):
+        stat = weights.stat()
+        digest.update(f'{weights.name}\x00{weights.resolve().name}\x00{stat.st_size}\x00{stat.st_mtime_ns}\n'.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+class _LogitsModule(torch.nn.Module):
+    """Wraps a sequence classification model so that it takes positional tensors and returns only the logits."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids).logits
+
+class InferenceBackend(ABC):
+    """Base class for the model execution backends."""
+
+    name = None
+
+    def __init__(self, model, snapshot_dir: Path = None):
+        """Constructor for instantiating an InferenceBackend object.
+
+        Parameters
+        ----------
+        model : PreTrainedModel
+            The loaded (eager) sequence classification model.
+        snapshot_dir : Path, optional
+            The local directory of the model's snapshot, used for caching exported artifacts (default is None).
+        """
+
+        self.model = model
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir is not None else None
+
+    @abstractmethod
+    def logits(self, batch) -> torch.Tensor:
+        """Runs the model over a padded, tokenized batch.
+
+        Parameters
+        ----------
+        batch : BatchEncoding | dict[str, torch.Tensor]
+            The padded batch of input_ids, attention_mask and (optionally) token_type_ids.
+
+        Returns
+        -------
+        torch.Tensor
+            The logits, with shape (batch size, num_labels).
+        """
+
+class EagerBackend(InferenceBackend):
+    """Executes the model with eager PyTorch."""
+
+    name = 'eager'
+
+    def logits(self, batch) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.model(**batch).logits.float()
+
+class TorchScriptBackend(InferenceBackend):
+    """Executes a TorchScript module traced from the model."""
+
+    name = 'torchscript'
+
+    def __init__(self, model, snapshot_dir: Path = None):
+        super().__init__(model, snapshot_dir)
+
+        example = torch.ones((2, 8), dtype=torch.long)
+        with torch.no_grad():
+            self.module = torch.jit.trace(_LogitsModule(model).eval(), (example, example, torch.zeros_like(example)), strict=False, check_trace=False)
+        self.module = torch.jit.freeze(self.module)
+
+    def logits(self, batch) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.module(*_model_inputs(batch)).float()
+
+class OnnxBackend(InferenceBackend):
+    """Executes an ONNX export of the model with ONNX Runtime, exporting it on first use."""
+
+    name = 'onnx'
+
+    def __init__(self, model, snapshot_dir: Path = None):
+        super().__init__(model, snapshot_dir)
+
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError('The onnx backend requires the onnxruntime and onnx packages (pip install onnxruntime onnx).') from e
+
+        self.onnx_path = self._export()
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(str(self.onnx_path), options, providers=['CPUExecutionProvider'])
+        self.input_names = [item.name for item in self.session.get_inputs()]
+
+    def _export(self) -> Path:
+        """Exports the model to ONNX next to its snapshot, unless an export of the same weights already exists.
+
+        Exports of other versions of the weights are removed, so an updated model is never served by a stale export.
+
+        Returns
+        -------
+        Path
+            The path of the exported ONNX model.
+        """
+
+        if self.snapshot_dir is None:
+            raise ValueError('The onnx backend requires the local snapshot directory of the model.')
+
+        onnx_path = self.snapshot_dir / 'onnx' / f'model-{weights_digest(self.snapshot_dir)}.onnx'
+        if onnx_path.exists():
+            return onnx_path
+
+        for stale in onnx_path.parent.glob('model*.onnx'):
+            logger.info(f'Removing the ONNX export of previous weights ({stale.name}).')
+            stale.unlink()
+
+        logger.info(f'Exporting ONNX model to {onnx_path}...')
+        onnx_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = onnx_path.with_name(onnx_path.name + '.tmp')
+
+        example = torch.ones((2, 8), dtype=torch.long)
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in ('input_ids', 'attention_mask', 'token_type_ids')}
+        dynamic_axes['logits'] = {0: 'batch'}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                _LogitsModule(self.model).eval(),
+                (example, example, torch.zeros_like(example)),
+                str(tmp_path),
+                input_names=['input_ids', 'attention_mask', 'token_type_ids'],
+                output_names=['logits'],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+                dynamo=False
+            )
+
+        os.replace(tmp_path, onnx_path)
+        return onnx_path
+
+    def logits(self, batch) -> torch.Tensor:
+        inputs = dict(zip(('input_ids', 'attention_mask', 'token_type_ids'), _model_inputs(batch)))
+        feeds = {name: inputs[name].numpy() for name in self.input_names}
+        return torch.from_numpy(self.session.run(None, feeds)[0])
+
+_BACKEND_CLASSES = {
+    EagerBackend.name: EagerBackend,
+    TorchScriptBackend.name: TorchScriptBackend,
+    OnnxBackend.name: OnnxBackend
+}
+
+def snapshot_dir_for(repo_id: str, revision: str = None, token: str = None) -> Path:
+    """Resolves the local directory holding a model's files (the repo itself if it is a local path, otherwise its HF snapshot).
+
+    Parameters
+    ----------
+    repo_id : str
+        The repository id or local path of the model.
+    revision : str, optional
+        The revision of the model (default is None).
+    token : str, optional
+        The Hugging Face token (default is None).
+
+    Returns
+    -------
+    Path
+        The local snapshot directory.
+    """
+
+    if os.path.isdir(repo_id):
+        return Path(repo_id)
+
+    from huggingface_hub import snapshot_download
+    return Path(snapshot_download(repo_id=repo_id, revision=revision, token=token, allow_patterns=['config.json']))
+
+def create_backend(name: str, model, snapshot_dir: Path = None) -> InferenceBackend:
+    """Creates the named backend for a loaded model.
+
+    Parameters
+    ----------
+    name : str
+        One of 'eager', 'torchscript' or 'onnx'.
+    model : PreTrainedModel
+        The loaded (eager) sequence classification model.
+    snapshot_dir : Path, optional
+        The local directory of the model's snapshot (default is None).
+
+    Returns
+    -------
+    InferenceBackend
+        The backend instance.
+    """
+
+    if name not in _BACKEND_CLASSES:
+        raise ValueError(f'Unknown inference backend "{name}" (expected one of {BACKENDS}).')
+    return _BACKEND_CLASSES[name](model, snapshot_dir)
+
+def compare_backends(handler, backends: list[str] = BACKENDS, sentences: list[str] = PARITY_SENTENCES, atol: float = 1e-4, repeats: int = 10) -> dict:
+    """Checks the logits of each backend against eager PyTorch on a fixed sentence set and measures their latency.
+
+    Parameters
+    ----------
+    handler : InferenceHandler
+        A loaded handler whose models are used to build each backend.
+    backends : list[str], optional
+        The backends to compare (default is every backend).
+    sentences : list[str], optional
+        The sentences used for the comparison (default is the fixed parity sentence set).
+    atol : float, optional
+        The maximum absolute logit difference from eager PyTorch allowed for a backend to pass (default is 1e-4).
+    repeats : int, optional
+        The number of timed passes over the sentence set per backend (default is 10).
+
+    Returns
+    -------
+    dict[str, dict[str, Any]]
+        For each backend, the maximum absolute logit difference of each model, whether it passed, and its median and mean latency (ms).
+    """
+
+    models = {
+        'bin': (handler.bin_tokenizer, handler.bin_model, handler.bin_snapshot_dir or snapshot_dir_for(handler.bin_repo, handler.bin_revision, handler.api_token)),
+        'ml': (handler.ml_regr_tokenizer, handler.ml_regr_model, handler.ml_snapshot_dir or snapshot_dir_for(handler.ml_repo, handler.ml_revision, handler.api_token))
+    }
+    batches = {key: tokenizer(sentences, padding=True, truncation=True, max_length=512, return_tensors='pt') for key, (tokenizer, _, _) in models.items()}
+    reference = {key: EagerBackend(model).logits(batches[key]) for key, (_, model, _) in models.items()}
+
+    report = {}
+    for name in backends:
+        try:
+            instances = {key: create_backend(name, model, snapshot_dir) for key, (_, model, snapshot_dir) in models.items()}
+        except Exception as e:
+            logger.error(f'Unable to create the {name} backend: {e}')
+            report[name] = {'error': str(e), 'passed': False}
+            continue
+
+        entry = {}
+        for key, backend in instances.items():
+            entry[f'{key}_max_abs_diff'] = (backend.logits(batches[key]) - reference[key]).abs().max().item()
+        entry['passed'] = all(entry[f'{key}_max_abs_diff'] <= atol for key in instances)
+
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for key, backend in instances.items():
+                backend.logits(batches[key])
+            timings.append((time.perf_counter() - start) * 1000.0)
+
+        timings.sort()
+        entry['median_ms'] = timings[len(timings) // 2]
+        entry['mean_ms'] = sum(timings) / len(timings)
+        report[name] = entry
+
+        logger.info(f"{name}: passed={entry['passed']}, median={entry['median_ms']:.2f}ms, max diff={max(entry[f'{key}_max_abs_diff'] for key in instances):.2e}")
+
+    return report
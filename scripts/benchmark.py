@@ -0,0 +1,440 @@
+"""
+Script file providing an offline, reproducible benchmark suite for the inference pipeline.
+
+The suite builds tiny, randomly initialized stand-in checkpoints locally (see scripts/tiny_models.py), so it runs without network
+access or the real HF repositories. It measures sentence splitting (with each segmenter), tokenization, the binary and multilabel forward passes and
+end-to-end classify_text across document sizes and discriminatory ratios, reporting latency percentiles, throughput, peak RSS and
+cold-start time, as well as the time and number of Streamlit elements taken to render the results (per sentence and paged). Results are written as JSON and can be compared against a stored baseline to flag regressions.
+"""
+
+import sys
+import json
+import time
+import random
+import platform
+import resource
+import tempfile
+import subprocess
+import torch
+
+from pathlib import Path
+from loguru import logger
+from nltk.tokenize import sent_tokenize
+
+from scripts.config import ROOT, RENDER_VIRTUALIZE_AFTER
+from scripts.snapshots import ensure_punkt
+from scripts.segmenters import create_segmenter
+from scripts.tiny_models import build_tiny_checkpoints, synthetic_sentence
+
+DOC_SIZES = [1, 10, 100, 1000]
+DISCRIMINATORY_RATIOS = [0.0, 0.5, 1.0]
+
+BENCHMARK_DIR = ROOT / '.benchmarks'
+DEFAULT_BASELINE = BENCHMARK_DIR / 'baseline.json'
+
+class _RatioBackend:
+    """Wraps the binary model backend so that a fixed fraction of sentences is classified as discriminatory.
+
+    The real forward pass is still executed (so its cost is measured), but the returned logits are replaced with ones that flag a
+    deterministic subset of the rows, allowing the multilabel stage to be benchmarked at controlled discriminatory ratios.
+    """
+
+    def __init__(self, backend, ratio: float):
+        self.backend = backend
+        self.ratio = ratio
+
+    def logits(self, batch) -> torch.Tensor:
+        logits = self.backend.logits(batch)
+        flagged = torch.tensor([
+            (hash(tuple(row.tolist())) % 1000) < self.ratio * 1000 for row in batch['input_ids']
+        ])
+        forced = torch.zeros_like(logits)
+        forced[flagged, 1] = 1.0
+        forced[~flagged, 0] = 1.0
+        return forced
+
+def _peak_rss_mb() -> float:
+    """Returns the peak resident set size of this process in MB."""
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+def _summarize(timings: list[float], items: int) -> dict:
+    """Summarizes repeated timings (in seconds) of a stage that processes items per run."""
+
+    timings = sorted(timings)
+    pick = lambda q: timings[min(int(q * len(timings)), len(timings) - 1)] * 1000.0
+    mean = sum(timings) / len(timings)
+    return {
+        'runs': len(timings),
+        'items': items,
+        'p50_ms': pick(0.50),
+        'p90_ms': pick(0.90),
+        'p99_ms': pick(0.99),
+        'mean_ms': mean * 1000.0,
+        'throughput_per_s': items / mean if mean > 0 else None,
+        'peak_rss_mb': _peak_rss_mb()
+    }
+
+def _time(fn, repeats: int) -> list[float]:
+    """Times repeated calls of fn, after one untimed warm-up call."""
+
+    fn()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def _punkt_available() -> bool:
+    """Determines whether the punkt data used by sent_tokenize is available locally (including the vendored directory)."""
+
+    try:
+        ensure_punkt(offline=True)
+        return True
+    except LookupError:
+        return False
+
+_RENDER_SCRIPT = '''
+import sys
+import json
+sys.path.insert(0, {root!r})
+
+import streamlit as st
+from scripts.rendering import build_result_tree
+
+with open({path!r}) as f:
+    results = json.load(f)
+build_result_tree(st.container(), results, virtualize_after={virtualize_after})
+'''
+
+def _synthetic_results(rng: random.Random, size: int, ratio: float) -> dict:
+    """Generates the results of a synthetic document, in the format returned by classify_text."""
+
+    from scripts.results import BIN_LABELS, CATEGORIES
+
+    results = []
+    for _ in range(size):
+        pred_class = int(rng.random() < ratio)
+        results.append({
+            'sentence': synthetic_sentence(rng),
+            'binary_classification': {'classification': BIN_LABELS[pred_class], 'prediction_class': pred_class},
+            'multilabel_regression': {cat: rng.random() for cat in CATEGORIES} if pred_class == 1 else None
+        })
+    return {'text_input': ' '.join(result['sentence'] for result in results), 'results': results}
+
+def _count_elements(node) -> int:
+    """Counts the elements and blocks below a node of a rendered AppTest tree."""
+
+    return sum(1 + _count_elements(child) for child in getattr(node, 'children', {}).values())
+
+def measure_rendering(doc_sizes: list[int] = DOC_SIZES, ratio: float = 0.5, repeats: int = 5, seed: int = 0) -> dict:
+    """Measures the time and the number of Streamlit elements taken to render results, per sentence and paged.
+
+    Each run renders the results of a synthetic document with build_result_tree in a fresh AppTest, once with one expander per
+    sentence and once with the configured virtualize_after (documents up to that size are rendered the same way by both).
+
+    Parameters
+    ----------
+    doc_sizes : list[int], optional
+        The document sizes, in sentences, to render (default is 1, 10, 100 and 1000).
+    ratio : float, optional
+        The fraction of the sentences that are discriminatory (default is 0.5).
+    repeats : int, optional
+        The number of timed runs per measurement (default is 5).
+    seed : int, optional
+        The seed used for the synthetic results (default is 0).
+
+    Returns
+    -------
+    dict[str, dict[str, Any]]
+        The summary of every measurement, with its number of rendered elements, keyed by measurement name.
+    """
+
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    measurements = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in doc_sizes:
+            path = Path(tmp_dir) / f'results_{size}.json'
+            with open(path, 'w') as f:
+                json.dump(_synthetic_results(rng, size, ratio), f)
+
+            for mode, virtualize_after in (('per_sentence', size), ('paged', RENDER_VIRTUALIZE_AFTER)):
+                script = _RENDER_SCRIPT.format(root=str(ROOT), path=str(path), virtualize_after=virtualize_after)
+                elements = []
+
+                def render():
+                    at = AppTest.from_string(script, default_timeout=600).run()
+                    if len(at.exception) > 0:
+                        raise RuntimeError(f'Rendering failed: {at.exception[0].message}')
+                    elements.append(_count_elements(at.main))
+
+                name = f'render_{mode}/sentences={size}'
+                measurements[name] = _summarize(_time(render, repeats), size)
+                measurements[name]['elements'] = elements[-1]
+                logger.info(f"{name}: p50={measurements[name]['p50_ms']:.2f}ms, {elements[-1]} elements")
+
+    return measurements
+
+def measure_cold_start(bin_path: Path, ml_path: Path) -> dict:
+    """Measures the cold-start time of a fresh process: imports, model loading and the first classification.
+
+    Parameters
+    ----------
+    bin_path : Path
+        The path of the stand-in binary classification checkpoint.
+    ml_path : Path
+        The path of the stand-in multilabel regression checkpoint.
+
+    Returns
+    -------
+    dict[str, float]
+        The import, load, first classification and total times in seconds, as reported by the child process.
+    """
+
+    code = (
+        'import time, json; start = time.perf_counter()\n'
+        'from scripts.predict import InferenceHandler\n'
+        'imported = time.perf_counter()\n'
+        f'ih = InferenceHandler(None, bin_repo={str(bin_path)!r}, ml_repo={str(ml_path)!r}, use_cache=False)\n'
+        'loaded = time.perf_counter()\n'
+        "ih.classify_sentences(['This is the first sentence.'])\n"
+        'done = time.perf_counter()\n'
+        "print(json.dumps({'import_s': imported - start, 'load_s': loaded - imported, 'first_classification_s': done - loaded, 'total_s': done - start}))\n"
+    )
+
+    proc = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+_PROFILE_SCRIPT = '''
+import sys, time, json
+phases = {}
+start = last = time.perf_counter()
+def mark(name):
+    global last
+    now = time.perf_counter()
+    phases[name] = now - last
+    last = now
+
+import scripts.config
+mark('import_config')
+import torch
+mark('import_torch')
+import scripts.predict
+mark('import_handler')
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+mark('import_transformers')
+
+kwargs = json.loads(sys.argv[1])
+ih = scripts.predict.InferenceHandler(None, use_cache=False, **kwargs)
+mark('load_handler')
+ih.warmup()
+mark('warmup')
+ih.classify_sentences(['This is the first sentence.', 'This is the second sentence.'])
+mark('first_classification')
+
+print(json.dumps({'phases': phases, 'load_times': ih.load_times, 'ready_s': time.perf_counter() - start}))
+'''
+
+def profile_startup(bin_repo: str = None, ml_repo: str = None, offline: bool = None, import_time: bool = False, top: int = 15) -> dict:
+    """Profiles the startup of a fresh process, from the first import to the first classification.
+
+    Parameters
+    ----------
+    bin_repo : str, optional
+        Overrides the binary classification model repository (default is None, which uses the configured one).
+    ml_repo : str, optional
+        Overrides the multilabel regression model repository (default is None, which uses the configured one).
+    offline : bool, optional
+        Forces offline or online loading (default is None, which uses the configured offline setting).
+    import_time : bool, optional
+        Whether to also report the slowest imports, as measured by `python -X importtime` (default is False).
+    top : int, optional
+        The number of slowest imports to report (default is 15).
+
+    Returns
+    -------
+    dict[str, Any]
+        The time of each startup phase, the handler's load time breakdown, the total time until the first classification is
+        ready and, optionally, the slowest imports (cumulative seconds, by top-level module).
+    """
+
+    kwargs = {key: value for key, value in (('bin_repo', bin_repo), ('ml_repo', ml_repo), ('offline', offline)) if value is not None}
+    command = [sys.executable] + (['-X', 'importtime'] if import_time else []) + ['-c', _PROFILE_SCRIPT, json.dumps(kwargs)]
+    proc = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'The startup profile failed:\n{proc.stderr[-2000:]}')
+
+    profile = json.loads(proc.stdout.strip().splitlines()[-1])
+    if import_time:
+        imports = {}
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            # Only unindented (top-level) entries carry the full cumulative cost of an import
+            if len(name) - len(name.lstrip()) == 1:
+                imports[name.strip()] = int(cumulative) / 1e6
+        profile['slowest_imports'] = dict(sorted(imports.items(), key=lambda item: -item[1])[:top])
+
+    return profile
+
+def run_benchmarks(
+    doc_sizes: list[int] = DOC_SIZES,
+    ratios: list[float] = DISCRIMINATORY_RATIOS,
+    repeats: int = 5,
+    seed: int = 0,
+    cold_start: bool = True,
+    render: bool = True
+) -> dict:
+    """Runs the benchmark suite against tiny stand-in checkpoints.
+
+    Parameters
+    ----------
+    doc_sizes : list[int], optional
+        The document sizes, in sentences, to benchmark (default is 1, 10, 100 and 1000).
+    ratios : list[float], optional
+        The discriminatory ratios to benchmark the end-to-end path at (default is 0.0, 0.5 and 1.0).
+    repeats : int, optional
+        The number of timed runs per measurement (default is 5).
+    seed : int, optional
+        The seed used for the stand-in weights and the synthetic documents (default is 0).
+    cold_start : bool, optional
+        Whether to measure the cold-start time in a fresh process (default is True).
+    render : bool, optional
+        Whether to measure the rendering of the results in the app (default is True).
+
+    Returns
+    -------
+    dict[str, Any]
+        The environment description and the summary of every measurement, keyed by measurement name.
+    """
+
+    from scripts.predict import InferenceHandler
+
+    torch.manual_seed(seed)
+    bin_path, ml_path = build_tiny_checkpoints(BENCHMARK_DIR / 'models', seed=seed)
+
+    results = {
+        'environment': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'threads': torch.get_num_threads(),
+            'seed': seed,
+            'repeats': repeats
+        },
+        'measurements': {}
+    }
+    measurements = results['measurements']
+
+    if cold_start:
+        measurements['cold_start'] = measure_cold_start(bin_path, ml_path)
+        logger.info(f"cold_start: {measurements['cold_start']['total_s']:.2f}s")
+
+    # The end-to-end path uses the regex segmenter, which needs no data; punkt is measured as a separate stage when it is available
+    ih = InferenceHandler(None, bin_repo=str(bin_path), ml_repo=str(ml_path), use_cache=False, segmenter='regex')
+    rng = random.Random(seed)
+    offsets_segmenter = create_segmenter('offsets', ih.bin_tokenizer)
+    has_punkt = _punkt_available()
+    if not has_punkt:
+        logger.warning('punkt data is not available locally, skipping sent_tokenize.')
+
+    bin_backend = ih.bin_backend
+    for size in doc_sizes:
+        sentences = [synthetic_sentence(rng) for _ in range(size)]
+        document = ' '.join(sentences)
+        encodings = ih._encode_batch(ih.bin_tokenizer, sentences)
+        indices = range(len(sentences))
+
+        stages = {
+            'tokenize': lambda: ih._encode_batch(ih.bin_tokenizer, sentences),
+            'binary_forward': lambda: ih._batched_logits(ih.bin_tokenizer, bin_backend, encodings, indices, ih.max_batch_size),
+            'multilabel_forward': lambda: ih._batched_logits(ih.bin_tokenizer, ih.ml_backend, encodings, indices, ih.max_batch_size),
+            'segment_regex': lambda: ih.segmenter.split(document),
+            'segment_offsets': lambda: offsets_segmenter.split(document)
+        }
+        if has_punkt:
+            stages['sent_tokenize'] = lambda: sent_tokenize(document)
+
+        for stage, fn in stages.items():
+            name = f'{stage}/sentences={size}'
+            measurements[name] = _summarize(_time(fn, repeats), size)
+            logger.info(f"{name}: p50={measurements[name]['p50_ms']:.2f}ms")
+
+        for ratio in ratios:
+            ih.bin_backend = _RatioBackend(bin_backend, ratio)
+            try:
+                name = f'classify_text/sentences={size}/ratio={ratio}'
+                fn = lambda: ih.classify_text(document)
+                measurements[name] = _summarize(_time(fn, repeats), size)
+                logger.info(f"{name}: p50={measurements[name]['p50_ms']:.2f}ms")
+            finally:
+                ih.bin_backend = bin_backend
+
+    if render:
+        measurements.update(measure_rendering(doc_sizes, repeats=repeats, seed=seed))
+
+    results['peak_rss_mb'] = _peak_rss_mb()
+    return results
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float = 0.2, metric: str = 'p50_ms') -> list[dict]:
+    """Compares benchmark results against a baseline, flagging measurements that regressed beyond the tolerance.
+
+    Parameters
+    ----------
+    results : dict[str, Any]
+        The results returned by run_benchmarks.
+    baseline : dict[str, Any]
+        Previously stored results to compare against.
+    tolerance : float, optional
+        The allowed relative slowdown before a measurement is flagged (default is 0.2, i.e. 20%).
+    metric : str, optional
+        The latency metric compared for each measurement (default is 'p50_ms').
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        One entry per measurement present in both, with the baseline and current values, the relative change and whether it regressed.
+    """
+
+    comparison = []
+    for name, current in results['measurements'].items():
+        previous = baseline.get('measurements', {}).get(name)
+        if previous is None:
+            continue
+
+        key = metric if metric in current else 'total_s'
+        if key not in current or key not in previous or previous[key] == 0:
+            continue
+
+        change = (current[key] - previous[key]) / previous[key]
+        comparison.append({
+            'measurement': name,
+            'metric': key,
+            'baseline': previous[key],
+            'current': current[key],
+            'change': change,
+            'regressed': change > tolerance
+        })
+
+    return comparison
+
+def save_results(results: dict, path: Path):
+    """Writes benchmark results to a JSON file.
+
+    Parameters
+    ----------
+    results : dict[str, Any]
+        The results to write.
+    path : Path
+        The destination JSON file.
+    """
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
@@ -0,0 +1,296 @@
+"""
+Script file used for streaming large files of documents through the inference models.
+
+Documents are read lazily from a CSV, JSONL or plain-text file, classified in fixed-size chunks and the per-sentence results
+are written incrementally to a JSONL file or a directory of Parquet part files. A checkpoint file is updated after every
+completed chunk, allowing an interrupted run to resume from the last completed chunk.
+"""
+
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from loguru import logger
+from typing import Iterator
+
+INPUT_FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.txt': 'txt'
+}
+
+OUTPUT_FORMATS = ['jsonl', 'parquet']
+
+def read_documents(input_path: Path, text_column: str = 'text', id_column: str = None, csv_chunksize: int = 10000) -> Iterator[tuple]:
+    """Lazily reads documents from a CSV, JSONL or plain-text file.
+
+    Plain-text files are treated as one document per line.
+
+    Parameters
+    ----------
+    input_path : Path
+        The path to the input file.
+    text_column : str, optional
+        The column (CSV) or field (JSONL) containing the document text (default is 'text').
+    id_column : str, optional
+        The column (CSV) or field (JSONL) containing a document identifier (default is None, which uses the document index).
+    csv_chunksize : int, optional
+        The number of CSV rows read into memory at a time (default is 10000).
+
+    Yields
+    ------
+    tuple[Any, str]
+        The document id and the document text.
+    """
+
+    input_path = Path(input_path)
+    fmt = INPUT_FORMATS.get(input_path.suffix.lower())
+    if fmt is None:
+        raise ValueError(f'Unsupported input format "{input_path.suffix}" (expected one of {list(INPUT_FORMATS.keys())}).')
+
+    doc_idx = 0
+    if fmt == 'csv':
+        usecols = [text_column] if id_column is None else [text_column, id_column]
+        for frame in pd.read_csv(input_path, usecols=usecols, chunksize=csv_chunksize, dtype={text_column: str}, keep_default_na=False):
+            ids = frame[id_column].tolist() if id_column is not None else range(doc_idx, doc_idx + len(frame))
+            for doc_id, text in zip(ids, frame[text_column].tolist()):
+                yield doc_id, text
+            doc_idx += len(frame)
+    else:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if fmt == 'jsonl':
+                    if len(line.strip()) == 0:
+                        continue
+                    record = json.loads(line)
+                    yield (record[id_column] if id_column is not None else doc_idx), record.get(text_column) or ''
+                else:
+                    yield doc_idx, line.rstrip('\r\n')
+                doc_idx += 1
+
+def _chunked(documents: Iterator[tuple], chunk_size: int) -> Iterator[list]:
+    """Groups an iterator of documents into lists of at most chunk_size documents."""
+
+    chunk = []
+    for doc in documents:
+        chunk.append(doc)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+
+    if len(chunk) > 0:
+        yield chunk
+
+def classify_documents(handler, documents: list[tuple], max_batch_size: int = None):
+    """Classifies a chunk of documents, returning one flat row per sentence.
+
+    All sentences of the chunk are classified together so that they share the batched forward passes.
+
+    Parameters
+    ----------
+    handler : InferenceHandler
+        The handler used to perform inference.
+    documents : list[tuple[Any, str]]
+        The (document id, text) pairs to classify.
+    max_batch_size : int, optional
+        Overrides the maximum number of sentences per forward pass (default is None).
+
+    Returns
+    -------
+    pa.Table
+        One row per sentence containing the document id, sentence index, sentence, binary classification and category scores
+        (null for sentences that are not discriminatory).
+    """
+
+    sentences = []
+    doc_ids = []
+    sent_indices = []
+    for doc_id, text in documents:
+        for sent_idx, sent in enumerate(handler.segmenter.split(text)):
+            sentences.append(sent)
+            doc_ids.append(doc_id)
+            sent_indices.append(sent_idx)
+
+    results = handler.classify_sentences_compact(sentences, max_batch_size)
+    return results.to_arrow(doc_id=doc_ids, sentence_index=sent_indices)
+
+def _widen_floats(table):
+    """Casts the float32 columns of a table to float64 through their shortest repr, so JSON gets 0.3 rather than 0.30000001192092896."""
+
+    import pyarrow as pa
+
+    for idx, field in enumerate(table.schema):
+        if pa.types.is_float32(field.type):
+            column = table.column(idx).combine_chunks()
+            values = column.to_numpy(zero_copy_only=False).astype(str).astype(np.float64)
+            mask = column.is_null().to_numpy(zero_copy_only=False)
+            table = table.set_column(idx, pa.field(field.name, pa.float64()), pa.array(values, mask=mask))
+    return table
+
+class _JsonlWriter:
+    """Appends records to a single JSONL file, tracking the byte offset of the last completed chunk."""
+
+    def __init__(self, output_path: Path, checkpoint: dict):
+        self.output_path = output_path
+        offset = checkpoint.get('output_bytes', 0)
+
+        mode = 'r+b' if output_path.exists() else 'wb'
+        self.file = open(output_path, mode)
+        self.file.truncate(offset)
+        self.file.seek(offset)
+
+    def write_chunk(self, chunk_idx: int, table) -> dict:
+        table = _widen_floats(table)
+        for record in table.to_pylist():
+            self.file.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {'output_bytes': self.file.tell()}
+
+    def close(self):
+        self.file.close()
+
+class _ParquetWriter:
+    """Writes each completed chunk to its own Parquet part file within an output directory."""
+
+    def __init__(self, output_path: Path, checkpoint: dict):
+        self.output_path = output_path
+        self.output_path.mkdir(parents=True, exist_ok=True)
+
+        completed = checkpoint.get('chunks_completed', 0)
+        for part in self.output_path.glob('part-*.parquet'):
+            if int(part.stem.split('-')[1]) >= completed:
+                part.unlink()
+
+    def write_chunk(self, chunk_idx: int, table) -> dict:
+        import pyarrow.parquet as pq
+
+        if table.num_rows > 0:
+            tmp_path = self.output_path / f'.part-{chunk_idx:06d}.parquet.tmp'
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, self.output_path / f'part-{chunk_idx:06d}.parquet')
+        return {}
+
+    def close(self):
+        pass
+
+def _checkpoint_path(output_path: Path) -> Path:
+    """Returns the path of the checkpoint file associated with an output path."""
+
+    return output_path.with_name(output_path.name + '.checkpoint.json')
+
+def classify_file(
+    handler,
+    input_path: Path,
+    output_path: Path,
+    output_format: str = None,
+    chunk_size: int = 256,
+    text_column: str = 'text',
+    id_column: str = None,
+    max_batch_size: int = None,
+    resume: bool = True
+) -> dict:
+    """Streams a file of documents through the inference models, writing per-sentence results incrementally.
+
+    Parameters
+    ----------
+    handler : InferenceHandler
+        The handler used to perform inference.
+    input_path : Path
+        The CSV, JSONL or plain-text file of documents.
+    output_path : Path
+        The JSONL file or Parquet directory to write the results to.
+    output_format : str, optional
+        Either 'jsonl' or 'parquet' (default is None, which infers the format from the output path).
+    chunk_size : int, optional
+        The number of documents classified and written per chunk (default is 256).
+    text_column : str, optional
+        The column (CSV) or field (JSONL) containing the document text (default is 'text').
+    id_column : str, optional
+        The column (CSV) or field (JSONL) containing a document identifier (default is None).
+    max_batch_size : int, optional
+        Overrides the maximum number of sentences per forward pass (default is None).
+    resume : bool, optional
+        Whether to resume from an existing checkpoint of the same run, i.e. the same unmodified input, columns, chunk size,
+        output format and models (default is True).
+
+    Returns
+    -------
+    dict[str, Any]
+        The final checkpoint state, including the number of chunks, documents and sentences processed.
+    """
+
+    input_path = Path(input_path)
+    output_path = Path(output_path)
+    if output_format is None:
+        output_format = 'jsonl' if output_path.suffix.lower() in ('.jsonl', '.ndjson') else 'parquet'
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f'Unsupported output format "{output_format}" (expected one of {OUTPUT_FORMATS}).')
+
+    # A run is only resumed if it was classifying the same, unmodified input with the same models into the same kind of output
+    checkpoint_path = _checkpoint_path(output_path)
+    input_stat = input_path.stat()
+    run = {
+        'input_path': str(input_path.resolve()),
+        'input_size': input_stat.st_size,
+        'input_mtime_ns': input_stat.st_mtime_ns,
+        'text_column': text_column,
+        'id_column': id_column,
+        'chunk_size': chunk_size,
+        'output_format': output_format,
+        'model_key': handler.model_key
+    }
+    checkpoint = {**run, 'chunks_completed': 0, 'documents_completed': 0, 'sentences_written': 0}
+
+    if resume and checkpoint_path.exists():
+        with open(checkpoint_path, 'r') as f:
+            saved = json.load(f)
+
+        mismatched = [key for key, value in run.items() if saved.get(key) != value]
+        if len(mismatched) == 0:
+            checkpoint = saved
+            logger.info(f"Resuming from chunk {checkpoint['chunks_completed']} ({checkpoint['documents_completed']} documents completed).")
+        else:
+            logger.warning(f"Existing checkpoint does not match this run ({', '.join(mismatched)} changed), starting over.")
+
+    writer = _JsonlWriter(output_path, checkpoint) if output_format == 'jsonl' else _ParquetWriter(output_path, checkpoint)
+
+    documents = read_documents(input_path, text_column=text_column, id_column=id_column)
+    for _ in range(checkpoint['documents_completed']):
+        if next(documents, None) is None:
+            break
+
+    start = time.perf_counter()
+    run_docs = 0
+    run_sents = 0
+    try:
+        for chunk in _chunked(documents, chunk_size):
+            table = classify_documents(handler, chunk, max_batch_size)
+            checkpoint.update(writer.write_chunk(checkpoint['chunks_completed'], table))
+
+            checkpoint['chunks_completed'] += 1
+            checkpoint['documents_completed'] += len(chunk)
+            checkpoint['sentences_written'] += table.num_rows
+
+            tmp_path = checkpoint_path.with_name(checkpoint_path.name + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(checkpoint, f)
+            os.replace(tmp_path, checkpoint_path)
+
+            run_docs += len(chunk)
+            run_sents += table.num_rows
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"Chunk {checkpoint['chunks_completed']}: {checkpoint['documents_completed']} documents, "
+                f"{checkpoint['sentences_written']} sentences written "
+                f"({run_docs / elapsed:.1f} docs/s, {run_sents / elapsed:.1f} sentences/s)."
+            )
+    finally:
+        writer.close()
+
+    logger.success(f"Classified {checkpoint['documents_completed']} documents ({checkpoint['sentences_written']} sentences) into {output_path}.")
+    return checkpoint
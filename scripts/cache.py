@@ -0,0 +1,244 @@
+"""
+Script file providing a two-tier (in-memory LRU and on-disk SQLite) cache of sentence-level inference results.
+
+Entries are keyed by a hash of the normalized sentence and the binary/multilabel model revisions, so a change of either model
+never serves stale results. The SQLite store is shared by every model key: each entry records the model key it was produced
+by and only the entries of the cache's own model key are read, so caches of other models (e.g. stand-in models or a hot-swapped
+generation) never clear it. Entries of unused model keys are evicted like any other least recently used entry.
+"""
+
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+from pathlib import Path
+from collections import OrderedDict
+from loguru import logger
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_sentence(sentence: str) -> str:
+    """Normalizes a sentence for use as a cache key (unicode NFC and collapsed whitespace).
+
+    Parameters
+    ----------
+    sentence : str
+        The sentence to normalize.
+
+    Returns
+    -------
+    str
+        The normalized sentence.
+    """
+
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', sentence)).strip()
+
+class ResultCache:
+    """A two-tier cache mapping sentences to their (prediction class, category scores) results."""
+
+    def __init__(self, model_key: str, memory_entries: int = 10000, disk_path: Path = None, disk_entries: int = 1000000):
+        """Constructor for instantiating a ResultCache object.
+
+        Parameters
+        ----------
+        model_key : str
+            A string identifying the binary and multilabel model revisions the cached results were produced by.
+        memory_entries : int, optional
+            The maximum number of entries kept in the in-memory LRU (default is 10000).
+        disk_path : Path, optional
+            The path of the SQLite store (default is None, which disables the on-disk tier).
+        disk_entries : int, optional
+            The maximum number of entries kept in the SQLite store (default is 1000000).
+        """
+
+        self.model_key = model_key
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if disk_path is not None:
+            self._open_disk(Path(disk_path))
+
+    def _open_disk(self, disk_path: Path):
+        """Opens (or creates) the SQLite store, recreating it if it was created without the model_key column."""
+
+        disk_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(results)').fetchall()]
+        if len(columns) > 0 and 'model_key' not in columns:
+            logger.info('Upgrading the cached results store to per-model entries, discarding its previous entries.')
+            self._db.execute('DROP TABLE results')
+            self._db.execute('DROP TABLE IF EXISTS meta')
+
+        self._db.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, model_key TEXT, value TEXT, accessed REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS results_model_key ON results (model_key)')
+
+        # The number of rows is tracked as entries are inserted, so the store is only counted when it may have to be evicted
+        self._disk_count = self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def key(self, sentence: str) -> str:
+        """Computes the cache key of a sentence for the current model revisions.
+
+        Parameters
+        ----------
+        sentence : str
+            The sentence to compute the key for.
+
+        Returns
+        -------
+        str
+            The hex digest of the normalized sentence and model key.
+        """
+
+        return hashlib.sha256(f'{self.model_key}\x00{normalize_sentence(sentence)}'.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: list[str]) -> dict:
+        """Looks up several keys, checking the in-memory tier before the on-disk tier.
+
+        Parameters
+        ----------
+        keys : list[str]
+            The keys to look up.
+
+        Returns
+        -------
+        dict[str, tuple[int, list[float] | None]]
+            The cached (prediction class, category scores) of every key that was found.
+        """
+
+        found = {}
+        with self._lock:
+            missing = []
+            for key in dict.fromkeys(keys):
+                value = self._memory.get(key)
+                if value is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = value
+                    self.counters['memory_hits'] += 1
+                else:
+                    missing.append(key)
+
+            if self._db is not None and len(missing) > 0:
+                rows = []
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    rows += self._db.execute(
+                        f"SELECT key, value FROM results WHERE model_key = ? AND key IN ({','.join('?' * len(chunk))})",
+                        [self.model_key, *chunk]
+                    ).fetchall()
+
+                now = time.time()
+                for key, value in rows:
+                    value = tuple(json.loads(value))
+                    found[key] = value
+                    self._memory_put(key, value)
+                self._db.executemany('UPDATE results SET accessed = ? WHERE key = ?', [(now, key) for key, _ in rows])
+                self.counters['disk_hits'] += sum(1 for key in missing if key in found)
+
+            self.counters['misses'] += sum(1 for key in missing if key not in found)
+
+        return found
+
+    def put_many(self, items: dict):
+        """Stores several results in both tiers, evicting the least recently used entries when a tier is full.
+
+        Parameters
+        ----------
+        items : dict[str, tuple[int, list[float] | None]]
+            The (prediction class, category scores) results to store, keyed by cache key.
+        """
+
+        if len(items) == 0:
+            return
+
+        with self._lock:
+            for key, value in items.items():
+                self._memory_put(key, value)
+
+            if self._db is not None:
+                now = time.time()
+                rows = [(key, self.model_key, json.dumps(value), now) for key, value in items.items()]
+                inserted = self._db.executemany(
+                    'INSERT OR IGNORE INTO results (key, model_key, value, accessed) VALUES (?, ?, ?, ?)', rows
+                ).rowcount
+                if inserted < len(rows):
+                    # Only results that were missing are put, so keys that already exist (e.g. stored by another process) are rare
+                    self._db.executemany(
+                        'UPDATE results SET model_key = ?, value = ?, accessed = ? WHERE key = ?',
+                        [(model_key, value, accessed, key) for key, model_key, value, accessed in rows]
+                    )
+                self._disk_count += inserted
+
+                if self._disk_count > self.disk_entries:
+                    self._evict_disk()
+
+    def _evict_disk(self):
+        """Evicts the least recently used entries of the SQLite store down to 1% below its capacity (the lock must be held).
+
+        The store is recounted first, since other processes may share it, and the slack below the capacity means it is only
+        counted again after that many more inserts.
+        """
+
+        self._disk_count = self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        overflow = self._disk_count - (self.disk_entries - self.disk_entries // 100)
+        if self._disk_count > self.disk_entries and overflow > 0:
+            self._db.execute('DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)', (overflow,))
+            self._disk_count -= overflow
+            self.counters['evictions'] += overflow
+
+    def _memory_put(self, key: str, value: tuple):
+        """Inserts an entry into the in-memory LRU (the lock must be held)."""
+
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def stats(self) -> dict:
+        """Returns the hit/miss counters and the current size of each tier.
+
+        Returns
+        -------
+        dict[str, Any]
+            The hit, miss and eviction counters, the hit rate and the number of entries in each tier.
+        """
+
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self._memory)
+            stats['disk_entries'] = (
+                self._db.execute('SELECT COUNT(*) FROM results WHERE model_key = ?', (self.model_key,)).fetchone()[0]
+                if self._db is not None else 0
+            )
+
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups > 0 else 0.0
+        return stats
+
+    def clear(self):
+        """Removes every entry of the cache's model key from both tiers."""
+
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._disk_count -= self._db.execute('DELETE FROM results WHERE model_key = ?', (self.model_key,)).rowcount
+
+    def close(self):
+        """Closes the SQLite store."""
+
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
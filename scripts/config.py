@@ -1,6 +1,9 @@
 # Used for setting some constants for the project codebase
+import os
+import json
 import toml
 import typer
+from enum import Enum
 from pathlib import Path
 from loguru import logger
 from typing_extensions import Annotated
@@ -24,7 +27,8 @@ try:
     
     logger.success('config.toml loaded successfully.')
 except Exception as e:
-    logger.error(e)
+    # Fall back to an in-memory default; config.toml is only ever written by the 'set' command, never as an import side effect
+    logger.error(f'{e} Using empty repositories (run `python -m scripts.config set` to configure them).')
     config = {
         'repositories': {
             'bin_repo': '',
@@ -33,17 +37,135 @@ except Exception as e:
         }
     }
 
-    with open(ROOT / 'config.toml', 'w') as f:
-        toml.dump(config, f)
-        f.close()
-
 
 # HF Hub Repositories
 BIN_REPO = config['repositories']['bin_repo']
 ML_REPO = config['repositories']['ml_repo']
 DATASET_REPO = config['repositories']['ds_repo']
 
-@app.command()
+# HF Hub Revisions (None loads the latest revision)
+BIN_REVISION = config['repositories'].get('bin_revision')
+ML_REVISION = config['repositories'].get('ml_revision')
+
+# Inference Settings
+INFERENCE_CONFIG = config.get('inference', {})
+MAX_BATCH_SIZE = int(INFERENCE_CONFIG.get('max_batch_size', 32))
+INFERENCE_BACKEND = INFERENCE_CONFIG.get('backend', 'eager')
+STREAM_CHUNK_SIZE = int(INFERENCE_CONFIG.get('stream_chunk_size', 8))
+SEGMENTER = INFERENCE_CONFIG.get('segmenter', 'regex')
+LOW_MEMORY = bool(INFERENCE_CONFIG.get('low_memory', False))
+
+# Sentence Result Cache Settings
+CACHE_CONFIG = config.get('cache', {})
+CACHE_ENABLED = bool(CACHE_CONFIG.get('enabled', True))
+CACHE_MEMORY_ENTRIES = int(CACHE_CONFIG.get('memory_entries', 10000))
+CACHE_DISK_PATH = ROOT / CACHE_CONFIG['disk_path'] if CACHE_CONFIG.get('disk_path') else None
+CACHE_DISK_ENTRIES = int(CACHE_CONFIG.get('disk_entries', 1000000))
+
+# Multi-Process Inference Pool Settings
+POOL_CONFIG = config.get('pool', {})
+POOL_ENABLED = bool(POOL_CONFIG.get('enabled', False))
+POOL_WORKERS = int(POOL_CONFIG.get('workers', 4))
+POOL_THREADS_PER_WORKER = int(POOL_CONFIG.get('threads_per_worker', 1))
+POOL_START_METHOD = POOL_CONFIG.get('start_method', 'spawn')
+
+# Micro-Batching Scheduler Settings
+SCHEDULER_CONFIG = config.get('scheduler', {})
+SCHEDULER_ENABLED = bool(SCHEDULER_CONFIG.get('enabled', True))
+SCHEDULER_MAX_WAIT_MS = float(SCHEDULER_CONFIG.get('max_wait_ms', 10))
+SCHEDULER_MAX_BATCH_SENTENCES = int(SCHEDULER_CONFIG.get('max_batch_sentences', 64))
+SCHEDULER_MAX_PENDING_SENTENCES = int(SCHEDULER_CONFIG.get('max_pending_sentences', 2048))
+SCHEDULER_BUCKET_WIDTH = int(SCHEDULER_CONFIG.get('bucket_width', 12))
+
+# Offline Startup Settings (the NLPINITIATIVE_OFFLINE environment variable overrides the configured setting)
+OFFLINE_CONFIG = config.get('offline', {})
+OFFLINE_ENABLED = os.environ.get('NLPINITIATIVE_OFFLINE', str(OFFLINE_CONFIG.get('enabled', False))).lower() in ('1', 'true', 'yes')
+OFFLINE_MODELS_DIR = ROOT / OFFLINE_CONFIG.get('models_dir', 'models')
+NLTK_DATA_DIR = ROOT / OFFLINE_CONFIG.get('nltk_data', 'nltk_data')
+
+# Prefilter Cascade Settings
+PREFILTER_CONFIG = config.get('prefilter', {})
+PREFILTER_ENABLED = bool(PREFILTER_CONFIG.get('enabled', False))
+PREFILTER_PATH = ROOT / PREFILTER_CONFIG.get('path', 'models/prefilter.npz')
+PREFILTER_THRESHOLD = float(PREFILTER_CONFIG.get('threshold', 0.05))
+
+# Near-Duplicate Detection Settings
+DEDUP_CONFIG = config.get('dedup', {})
+DEDUP_ENABLED = bool(DEDUP_CONFIG.get('enabled', False))
+DEDUP_THRESHOLD = float(DEDUP_CONFIG.get('threshold', 0.8))
+DEDUP_NUM_PERM = int(DEDUP_CONFIG.get('num_perm', 128))
+DEDUP_AUDIT_RATE = float(DEDUP_CONFIG.get('audit_rate', 0.0))
+
+# Dataset Browser Settings
+DATASETS_CONFIG = config.get('datasets', {})
+DATASET_CACHE_DIR = ROOT / DATASETS_CONFIG.get('cache_dir', '.cache/datasets')
+DATASET_PAGE_SIZE = int(DATASETS_CONFIG.get('page_size', 100))
+SCORE_INDEX_DIR = ROOT / DATASETS_CONFIG.get('score_index_dir', '.cache/score_index')
+
+# Distilled Student Model Settings
+STUDENT_CONFIG = config.get('student', {})
+STUDENT_ENABLED = bool(STUDENT_CONFIG.get('enabled', False))
+STUDENT_PATH = ROOT / STUDENT_CONFIG.get('path', 'models/student')
+
+# Input History Settings
+HISTORY_CONFIG = config.get('history', {})
+HISTORY_MAX_ENTRIES = int(HISTORY_CONFIG.get('max_entries', 50))
+HISTORY_SPILL_DIR = ROOT / HISTORY_CONFIG['spill_dir'] if HISTORY_CONFIG.get('spill_dir') else None
+HISTORY_PAGE_SIZE = int(HISTORY_CONFIG.get('page_size', 10))
+
+# Result Rendering Settings (results with more sentences than virtualize_after are shown as a summary and pages of sentences)
+RENDER_CONFIG = config.get('rendering', {})
+RENDER_VIRTUALIZE_AFTER = int(RENDER_CONFIG.get('virtualize_after', 50))
+RENDER_PAGE_SIZE = int(RENDER_CONFIG.get('page_size', 25))
+
+# Inference Service Settings (an empty url runs the models inside the Streamlit process)
+SERVICE_CONFIG = config.get('service', {})
+SERVICE_HOST = SERVICE_CONFIG.get('host', '127.0.0.1')
+SERVICE_PORT = int(SERVICE_CONFIG.get('port', 8500))
+SERVICE_MAX_BODY_BYTES = int(SERVICE_CONFIG.get('max_body_bytes', 1048576))
+SERVICE_MAX_BATCH_TEXTS = int(SERVICE_CONFIG.get('max_batch_texts', 64))
+SERVICE_MAX_CONCURRENCY = int(SERVICE_CONFIG.get('max_concurrency', 8))
+SERVICE_QUEUE_TIMEOUT = float(SERVICE_CONFIG.get('queue_timeout', 5.0))
+SERVICE_URL = SERVICE_CONFIG.get('url', '')
+SERVICE_CLIENT_POOL_SIZE = int(SERVICE_CONFIG.get('client_pool_size', 4))
+SERVICE_TIMEOUT = float(SERVICE_CONFIG.get('timeout', 120.0))
+
+# Model Hot-Swap Settings
+RELOAD_CONFIG = config.get('reload', {})
+RELOAD_ENABLED = bool(RELOAD_CONFIG.get('enabled', True))
+RELOAD_POLL_INTERVAL = float(RELOAD_CONFIG.get('poll_interval', 2.0))
+
+# Instrumentation Settings
+METRICS_CONFIG = config.get('metrics', {})
+METRICS_ENABLED = bool(METRICS_CONFIG.get('enabled', False))
+METRICS_ATTACH = bool(METRICS_CONFIG.get('attach_to_results', False))
+METRICS_HOST = METRICS_CONFIG.get('host', '127.0.0.1')
+METRICS_PORT = int(METRICS_CONFIG.get('port', 0))
+
+def read_repositories() -> dict:
+    """Re-reads the model repositories and revisions from config.toml (the constants above only hold the values read at import).
+
+    Returns
+    -------
+    dict[str, str | None]
+        The bin_repo, ml_repo, bin_revision and ml_revision currently in config.toml, or those read at import if config.toml
+        cannot be read (e.g. it does not exist).
+    """
+
+    try:
+        with open(ROOT / 'config.toml', 'r') as f:
+            repositories = toml.load(f).get('repositories', {})
+    except OSError:
+        return {'bin_repo': BIN_REPO, 'ml_repo': ML_REPO, 'bin_revision': BIN_REVISION, 'ml_revision': ML_REVISION}
+
+    return {
+        'bin_repo': repositories.get('bin_repo', BIN_REPO),
+        'ml_repo': repositories.get('ml_repo', ML_REPO),
+        'bin_revision': repositories.get('bin_revision'),
+        'ml_revision': repositories.get('ml_revision')
+    }
+
+@app.command('set')
 def main(
     bin_repo: Annotated[str, typer.Option("--binary-repo", "-b")] = None,
     ml_repo: Annotated[str, typer.Option("--multilabel-regression-repo", "-m")] = None,
@@ -71,6 +193,497 @@ def main(
             toml.dump(config, f)
             f.close()
 
+class OutputFormat(str, Enum):
+    jsonl = 'jsonl'
+    parquet = 'parquet'
+
+@app.command()
+def classify(
+    input_path: Annotated[Path, typer.Argument(help='CSV, JSONL or plain-text (one document per line) file of documents.')],
+    output_path: Annotated[Path, typer.Argument(help='JSONL file or Parquet directory to write per-sentence results to.')],
+    output_format: Annotated[OutputFormat, typer.Option("--format", "-f")] = None,
+    chunk_size: Annotated[int, typer.Option("--chunk-size", "-c")] = 256,
+    text_column: Annotated[str, typer.Option("--text-column", "-t")] = 'text',
+    id_column: Annotated[str, typer.Option("--id-column", "-i")] = None,
+    batch_size: Annotated[int, typer.Option("--batch-size", "-b")] = None,
+    resume: Annotated[bool, typer.Option("--resume/--no-resume")] = True,
+    workers: Annotated[int, typer.Option("--workers", "-w")] = 0,
+    threads_per_worker: Annotated[int, typer.Option("--threads-per-worker")] = POOL_THREADS_PER_WORKER,
+    dedup: Annotated[bool, typer.Option("--dedup/--no-dedup")] = DEDUP_ENABLED,
+    dedup_threshold: Annotated[float, typer.Option("--dedup-threshold")] = DEDUP_THRESHOLD,
+    audit_rate: Annotated[float, typer.Option("--audit-rate")] = DEDUP_AUDIT_RATE,
+    api_token: Annotated[str, typer.Option("--token", envvar='HF_TOKEN')] = None
+):
+    """Streams a file of documents through the models in fixed-size chunks, resuming from the last completed chunk."""
+
+    from scripts.bulk import classify_file
+    from scripts.dedup import NearDuplicateDetector
+    from scripts.registry import get_inference_handler
+
+    handler = get_inference_handler(api_token, warmup=workers == 0)
+    handler.dedup = NearDuplicateDetector(dedup_threshold, audit_rate=audit_rate) if dedup else None
+    if workers > 0:
+        from scripts.pool import InferencePool
+        handler.attach_pool(InferencePool(handler, workers=workers, threads_per_worker=threads_per_worker, start_method='fork'))
+
+    classify_file(
+        handler,
+        input_path,
+        output_path,
+        output_format=output_format.value if output_format is not None else None,
+        chunk_size=chunk_size,
+        text_column=text_column,
+        id_column=id_column,
+        max_batch_size=batch_size,
+        resume=resume
+    )
+
+    if handler.dedup is not None:
+        stats = handler.dedup.stats()
+        logger.info(
+            f"Near-duplicates: {stats['exact_duplicates'] + stats['near_duplicates']} of {stats['sentences']} sentences "
+            f"({stats['near_duplicates']} near, {stats['exact_duplicates']} exact), dedup ratio {stats['dedup_ratio']:.2%}, "
+            f"estimated compute saved {stats['compute_saved']:.2%}."
+        )
+        if stats['audited'] > 0:
+            logger.info(
+                f"Audited {stats['audited']} duplicates: {stats['audit_flips']} prediction flips ({stats['audit_flip_rate']:.2%}), "
+                f"category score drift max {stats['max_score_drift']:.4f} / mean {stats['mean_score_drift']:.4f}."
+            )
+
+@app.command('compare-backends')
+def compare_backends(
+    backends: Annotated[list[str], typer.Option("--backend", "-B")] = None,
+    atol: Annotated[float, typer.Option("--atol")] = 1e-4,
+    repeats: Annotated[int, typer.Option("--repeats", "-r")] = 10,
+    api_token: Annotated[str, typer.Option("--token", envvar='HF_TOKEN')] = None
+):
+    """Checks each inference backend's logits against eager PyTorch and reports per-backend latency."""
+
+    from scripts.backends import BACKENDS, compare_backends as run_comparison
+    from scripts.predict import InferenceHandler
+
+    handler = InferenceHandler(api_token, use_cache=False, backend='eager')
+    report = run_comparison(handler, backends or BACKENDS, atol=atol, repeats=repeats)
+
+    for name, entry in report.items():
+        if 'error' in entry:
+            logger.error(f'{name}: {entry["error"]}')
+        else:
+            logger.info(f"{name}: {'PASS' if entry['passed'] else 'FAIL'} - median {entry['median_ms']:.2f}ms, mean {entry['mean_ms']:.2f}ms")
+
+    if not all(entry['passed'] for entry in report.values()):
+        raise typer.Exit(code=1)
+
+@app.command('compare-segmenters')
+def compare_segmenters(
+    dataset_path: Annotated[Path, typer.Option("--dataset", "-d", help='CSV to split (default is the master dataset).')] = None,
+    text_column: Annotated[str, typer.Option("--text-column", "-t")] = None,
+    max_texts: Annotated[int, typer.Option("--max-texts")] = None,
+    repeats: Annotated[int, typer.Option("--repeats", "-r")] = 3,
+    report_path: Annotated[Path, typer.Option("--report")] = None,
+    api_token: Annotated[str, typer.Option("--token", envvar='HF_TOKEN')] = None
+):
+    """Reports each sentence segmenter's throughput and its agreement with punkt on the master dataset."""
+
+    from transformers import AutoTokenizer
+    from scripts.datasets import TEXT_COLUMNS, find_column, load_master_dataset
+    from scripts.segmenters import SEGMENTERS, create_segmenter, compare_segmenters as run_comparison
+    from scripts.snapshots import resolve_local_model
+
+    df = load_master_dataset(dataset_path, api_token)
+    text_column = find_column(df, TEXT_COLUMNS, text_column)
+    texts = df[text_column].dropna().astype(str).tolist()[:max_texts]
+
+    # The offsets segmenter only needs the binary model's tokenizer, not its weights
+    source, revision = resolve_local_model('binary', BIN_REPO, BIN_REVISION) if OFFLINE_ENABLED else (BIN_REPO, BIN_REVISION)
+    tokenizer = AutoTokenizer.from_pretrained(str(source), token=api_token, revision=None if OFFLINE_ENABLED else revision)
+
+    segmenters = [create_segmenter(name, tokenizer, OFFLINE_ENABLED) for name in SEGMENTERS]
+    report = run_comparison(segmenters, texts, reference=segmenters[0], repeats=repeats)
+
+    for name, entry in report['segmenters'].items():
+        logger.info(
+            f"{name}: {entry['texts_per_second']:.0f} texts/s, {entry['sentences_per_second']:.0f} sentences/s, "
+            f"{entry['text_agreement']:.2%} of texts split identically to punkt, boundary precision {entry['boundary_precision']:.2%}, "
+            f"recall {entry['boundary_recall']:.2%}"
+        )
+
+    if report_path is not None:
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+@app.command('check-memory')
+def check_memory(
+    max_texts: Annotated[int, typer.Option("--max-texts", help='Number of master dataset sentences added to the parity sentences.')] = 0,
+    atol: Annotated[float, typer.Option("--atol")] = 0.05,
+    max_flips: Annotated[int, typer.Option("--max-flips")] = 0,
+    api_token: Annotated[str, typer.Option("--token", envvar='HF_TOKEN')] = None
+):
+    """Compares the memory use and outputs of the low-memory mode against the fp32 models, failing if the outputs drift too far."""
+
+    from scripts.backends import PARITY_SENTENCES
+    from scripts.memory import check_drift
+    from scripts.predict import InferenceHandler
+
+    reference = InferenceHandler(api_token, use_cache=False, prefilter=False, low_memory=False)
+    candidate = InferenceHandler(api_token, use_cache=False, prefilter=False, low_memory=True)
+
+    sentences = list(PARITY_SENTENCES)
+    if max_texts > 0:
+        from scripts.datasets import TEXT_COLUMNS, find_column, load_master_dataset
+        df = load_master_dataset(api_token=api_token)
+        texts = df[find_column(df, TEXT_COLUMNS)].dropna().astype(str).tolist()
+        sentences += list(dict.fromkeys(sent for text in texts for sent in reference.segmenter.split(text)))[:max_texts]
+
+    report = check_drift(reference, candidate, sentences, atol=atol, max_flips=max_flips)
+    for name, handler in (('fp32', reference), ('low-memory', candidate)):
+        breakdown = handler.memory_breakdown()
+        logger.info(
+            f"{name}: {breakdown['total_bytes'] / 2**20:.1f} MiB of weights (binary {breakdown['bin_model']['total_bytes'] / 2**20:.1f} MiB, "
+            f"multilabel {breakdown['ml_model']['total_bytes'] / 2**20:.1f} MiB, {breakdown['ml_model']['shared_bytes'] / 2**20:.1f} MiB shared)"
+        )
+        logger.info(f"{name} components: {json.dumps({model: breakdown[model]['components'] for model in ('bin_model', 'ml_model')})}")
+
+    logger.info(
+        f"{report['sentences']} sentences: max probability drift {report['max_probability_drift']:.4f}, max score drift "
+        f"{report['max_score_drift']:.4f}, {report['prediction_flips']} prediction flips - {'PASS' if report['passed'] else 'FAIL'}"
+    )
+
+    if not report['passed']:
+        raise typer.Exit(code=1)
+
+@app.command('benchmark')
+def benchmark(
+    output_path: Annotated[Path, typer.Option("--output", "-o")] = Path('.benchmarks/results.json'),
+    baseline_path: Annotated[Path, typer.Option("--baseline")] = Path('.benchmarks/baseline.json'),
+    save_baseline: Annotated[bool, typer.Option("--save-baseline")] = False,
+    tolerance: Annotated[float, typer.Option("--tolerance")] = 0.2,
+    sizes: Annotated[list[int], typer.Option("--sentences", "-n")] = None,
+    ratios: Annotated[list[float], typer.Option("--ratio")] = None,
+    repeats: Annotated[int, typer.Option("--repeats", "-r")] = 5,
+    seed: Annotated[int, typer.Option("--seed")] = 0,
+    cold_start: Annotated[bool, typer.Option("--cold-start/--no-cold-start")] = True,
+    render: Annotated[bool, typer.Option("--render/--no-render")] = True
+):
+    """Runs the offline inference benchmark suite against tiny stand-in models, flagging regressions against a stored baseline."""
+
+    from scripts.benchmark import DOC_SIZES, DISCRIMINATORY_RATIOS, run_benchmarks, compare_to_baseline, save_results
+
+    results = run_benchmarks(sizes or DOC_SIZES, ratios or DISCRIMINATORY_RATIOS, repeats=repeats, seed=seed, cold_start=cold_start, render=render)
+    save_results(results, output_path)
+    logger.info(f'Benchmark results written to {output_path}.')
+
+    if save_baseline:
+        save_results(results, baseline_path)
+        logger.info(f'Baseline saved to {baseline_path}.')
+        return
+
+    if not baseline_path.exists():
+        logger.warning(f'No baseline found at {baseline_path}, run with --save-baseline to store one.')
+        return
+
+    with open(baseline_path) as f:
+        comparison = compare_to_baseline(results, json.load(f), tolerance)
+
+    regressions = [entry for entry in comparison if entry['regressed']]
+    for entry in comparison:
+        log = logger.error if entry['regressed'] else logger.info
+        log(f"{entry['measurement']}: {entry['metric']} {entry['baseline']:.3f} -> {entry['current']:.3f} ({entry['change']:+.1%})")
+
+    if len(regressions) > 0:
+        logger.error(f'{len(regressions)} of {len(comparison)} measurements regressed by more than {tolerance:.0%}.')
+        raise typer.Exit(code=1)
+
+@app.command('load-test')
+def load_test(
+    sessions: Annotated[int, typer.Option("--sessions", "-s")] = 20,
+    submissions: Annotated[int, typer.Option("--submissions", "-n")] = 5,
+    corpus_path: Annotated[Path, typer.Option("--corpus", help='CSV, JSONL or plain-text file of texts to submit (default is synthetic texts).')] = None,
+    text_column: Annotated[str, typer.Option("--text-column", "-t")] = 'text',
+    think_time: Annotated[float, typer.Option("--think-time")] = 0.0,
+    ramp_up: Annotated[float, typer.Option("--ramp-up")] = 0.0,
+    timeout: Annotated[float, typer.Option("--timeout")] = 120.0,
+    seed: Annotated[int, typer.Option("--seed")] = 0,
+    output_path: Annotated[Path, typer.Option("--output", "-o")] = Path('.benchmarks/loadtest.json'),
+    baseline_path: Annotated[Path, typer.Option("--baseline")] = Path('.benchmarks/loadtest_baseline.json'),
+    save_baseline: Annotated[bool, typer.Option("--save-baseline")] = False,
+    tolerance: Annotated[float, typer.Option("--tolerance")] = 0.2
+):
+    """Simulates concurrent sessions of the app against tiny stand-in models, flagging errors and regressions against a stored baseline."""
+
+    from scripts.loadtest import run_load_test
+    from scripts.benchmark import compare_to_baseline, save_results
+
+    report = run_load_test(
+        sessions=sessions,
+        submissions=submissions,
+        corpus_path=corpus_path,
+        text_column=text_column,
+        think_time=think_time,
+        ramp_up=ramp_up,
+        timeout=timeout,
+        seed=seed
+    )
+    save_results(report, output_path)
+    logger.info(f'Load test report written to {output_path}.')
+
+    for name, entry in report['measurements'].items():
+        if entry['count'] > 0:
+            logger.info(f"{name}: {entry['count']} runs, p50={entry['p50_ms']:.1f}ms, p90={entry['p90_ms']:.1f}ms, max={entry['max_ms']:.1f}ms")
+    memory = report['memory']
+    logger.info(f"Memory: {memory['start_mb']:.1f} MB -> {memory['end_mb']:.1f} MB (peak {memory['peak_mb']:.1f} MB), {report['submissions_per_second']:.2f} submissions/s.")
+
+    for error in report['errors']:
+        logger.error(f"Session {error['session']} ({error['kind']}): {error['error']}")
+
+    failed = report['error_count'] > 0
+    if failed:
+        logger.error(f"{report['error_count']} errors occurred during the load test.")
+
+    if save_baseline:
+        save_results(report, baseline_path)
+        logger.info(f'Baseline saved to {baseline_path}.')
+    elif not baseline_path.exists():
+        logger.warning(f'No baseline found at {baseline_path}, run with --save-baseline to store one.')
+    else:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        comparison = compare_to_baseline(report, baseline, tolerance)
+
+        for entry in comparison:
+            log = logger.error if entry['regressed'] else logger.info
+            log(f"{entry['measurement']}: {entry['metric']} {entry['baseline']:.3f} -> {entry['current']:.3f} ({entry['change']:+.1%})")
+        logger.info(f"Memory growth: {baseline['memory']['growth_mb']:.1f} MB -> {memory['growth_mb']:.1f} MB.")
+
+        regressions = [entry for entry in comparison if entry['regressed']]
+        if len(regressions) > 0:
+            logger.error(f'{len(regressions)} of {len(comparison)} measurements regressed by more than {tolerance:.0%}.')
+            failed = True
+
+    if failed:
+        raise typer.Exit(code=1)
+
+@app.command('snapshot')
+def snapshot(
+    api_token: Annotated[str, typer.Option("--token", envvar='HF_TOKEN')] = None
+):
+    """Downloads both models (pinned to their current revisions) and the punkt data for fully offline startup."""
+
+    from scripts.snapshots import create_snapshot
+
+    manifest = create_snapshot(api_token, BIN_REPO, ML_REPO, BIN_REVISION, ML_REVISION)
+    for kind, entry in manifest.items():
+        logger.info(f"{kind}: {entry['repo_id']}@{entry['revision']}")
+    logger.info("Set enabled = true in the [offline] section of config.toml (or NLPINITIATIVE_OFFLINE=1) to start from the snapshot.")
+
+@app.command('profile-startup')
+def profile_startup(
+    bin_repo: Annotated[str, typer.Option("--binary-repo", "-b")] = None,
+    ml_repo: Annotated[str, typer.Option("--multilabel-regression-repo", "-m")] = None,
+    offline: Annotated[bool, typer.Option("--offline/--online")] = None,
+    import_time: Annotated[bool, typer.Option("--imports")] = False,
+    target: Annotated[float, typer.Option("--target")] = 5.0
+):
+    """Profiles a cold start in a fresh process, from the first import until the first classification is ready."""
+
+    from scripts.benchmark import profile_startup as run_profile
+
+    profile = run_profile(bin_repo, ml_repo, offline, import_time)
+    for name, secs in profile['phases'].items():
+        logger.info(f'{name:<22} {secs:7.2f}s')
+    logger.info('handler load breakdown: ' + ', '.join(f'{name}={secs:.2f}s' for name, secs in profile['load_times'].items()))
+    for name, secs in profile.get('slowest_imports', {}).items():
+        logger.info(f'import {name:<30} {secs:7.2f}s')
+
+    if profile['ready_s'] > target:
+        logger.error(f"First classification ready after {profile['ready_s']:.2f}s (target {target:.2f}s).")
+        raise typer.Exit(code=1)
+    logger.success(f"First classification ready after {profile['ready_s']:.2f}s (target {target:.2f}s).")
+
+@app.command('train-prefilter')
+def train_prefilter(
+    dataset_path: Annotated[Path, typer.Option("--dataset", "-d", help='CSV to train on (default is the master dataset).')] = None,
+    text_column: Annotated[str, typer.Option("--text-column", "-t")] = None,
+    label_column: Annotated[str, typer.Option("--label-column", "-l")] = None,
+    test_size: Annotated[float, typer.Option("--test-size")] = 0.2,
+    epochs: Annotated[int, typer.Option("--epochs", "-e")] = 5,
+    seed: Annotated[int, typer.Option("--seed")] = 0,
+    max_recall_lost: Annotated[float, typer.Option("--max-recall-lost")] = 0.01,
+    against_model: Annotated[bool, typer.Option("--against-model/--against-labels")] = False,
+    sentences: Annotated[bool, typer.Option("--sentences/--whole-texts", help='Train and evaluate on the sentences of the rows, as they are cleared at runtime.')] = True,
+    report_path: Annotated[Path, typer.Option("--report")] = None,
+    api_token: Annotated[str, typer.Option("--token", envvar='HF_TOKEN')] = None
+):
+    """Trains the n-gram prefilter cascade stage and reports the recall lost versus compute saved on a held-out split."""
+
+    from scripts.datasets import TEXT_COLUMNS, LABEL_COLUMNS, find_column, load_master_dataset
+    from scripts.prefilter import train_prefilter as run_training, recommend_threshold
+
+    df = load_master_dataset(dataset_path, api_token)
+    text_column = find_column(df, TEXT_COLUMNS, text_column)
+    label_column = find_column(df, LABEL_COLUMNS, label_column)
+    df = df.dropna(subset=[text_column, label_column])
+
+    handler, segment, reference_fn = None, None, None
+    if against_model:
+        from scripts.predict import InferenceHandler
+        handler = InferenceHandler(api_token, use_cache=False, prefilter=False)
+        reference_fn = lambda texts: [
+            int(any(r['binary_classification']['prediction_class'] == 1 for r in handler.classify_text(text)['results']))
+            for text in texts
+        ]
+
+    if sentences:
+        if handler is not None:
+            segment = handler.segmenter.split
+            reference_fn = lambda sents: handler.classify_sentences_compact(sents).classes.astype(int).tolist()
+        else:
+            from scripts.segmenters import create_segmenter
+
+            # Only the offsets segmenter needs the binary model's tokenizer, and never its weights
+            tokenizer = None
+            if SEGMENTER == 'offsets':
+                from transformers import AutoTokenizer
+                from scripts.snapshots import resolve_local_model
+                source, revision = resolve_local_model('binary', BIN_REPO, BIN_REVISION) if OFFLINE_ENABLED else (BIN_REPO, BIN_REVISION)
+                tokenizer = AutoTokenizer.from_pretrained(str(source), token=api_token, revision=None if OFFLINE_ENABLED else revision)
+            segment = create_segmenter(SEGMENTER, tokenizer, OFFLINE_ENABLED).split
+
+    prefilter, report = run_training(
+        df[text_column].astype(str).tolist(),
+        (df[label_column].astype(float) > 0.5).astype(int).tolist(),
+        test_size=test_size,
+        seed=seed,
+        epochs=epochs,
+        reference_fn=reference_fn,
+        segment=segment
+    )
+    prefilter.save(PREFILTER_PATH)
+    logger.success(
+        f'Prefilter saved to {PREFILTER_PATH} ({report["train_size"]} training / {report["test_size"]} held-out texts, '
+        f'{report["train_sentences"]} / {report["test_sentences"]} {"sentences" if sentences else "texts"}).'
+    )
+
+    for entry in report['thresholds']:
+        model_loss = f", recall lost vs BERT {entry['model_recall_lost']:.2%}" if 'model_recall_lost' in entry else ''
+        logger.info(f"threshold {entry['threshold']:.2f}: compute saved {entry['skip_rate']:.2%}, recall lost {entry['recall_lost']:.2%}{model_loss}")
+
+    report['recommended_threshold'] = recommend_threshold(report['thresholds'], max_recall_lost)
+    if report['recommended_threshold'] is not None:
+        logger.info(f"Recommended threshold (recall lost <= {max_recall_lost:.2%}): {report['recommended_threshold']} (set it in the [prefilter] section of config.toml).")
+    else:
+        logger.warning(f'No threshold loses at most {max_recall_lost:.2%} recall.')
+
+    if report_path is not None:
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+@app.command('score-dataset')
+def score_dataset(
+    dataset_path: Annotated[Path, typer.Option("--dataset", "-d", help='CSV to score (default is the master dataset).')] = None,
+    text_column: Annotated[str, typer.Option("--text-column", "-t")] = None,
+    batch_size: Annotated[int, typer.Option("--batch-size")] = None,
+    api_token: Annotated[str, typer.Option("--token", envvar='HF_TOKEN')] = None
+):
+    """Scores every row of the master dataset with both models into the score index, skipping rows that are already indexed."""
+
+    from scripts.datasets import TEXT_COLUMNS, find_column, load_master_dataset
+    from scripts.predict import InferenceHandler
+    from scripts.score_index import build_score_index
+
+    df = load_master_dataset(dataset_path, api_token)
+    text_column = find_column(df, TEXT_COLUMNS, text_column)
+
+    handler = InferenceHandler(api_token, use_cache=False, prefilter=False)
+    stats = build_score_index(handler, df[text_column].dropna().astype(str).tolist(), batch_size=batch_size)
+    logger.success(
+        f"Score index for {handler.model_key} written to {stats['path']} in {stats['seconds']:.1f}s "
+        f"({stats['scored']} texts scored, {stats['reused']} reused)."
+    )
+
+@app.command('distill')
+def distill(
+    dataset_path: Annotated[Path, typer.Option("--dataset", "-d", help='CSV to distill on (default is the master dataset).')] = None,
+    text_column: Annotated[str, typer.Option("--text-column", "-t")] = None,
+    num_layers: Annotated[int, typer.Option("--layers", help='Number of encoder layers of the student.')] = 4,
+    epochs: Annotated[int, typer.Option("--epochs", "-e")] = 2,
+    batch_size: Annotated[int, typer.Option("--batch-size")] = 16,
+    learning_rate: Annotated[float, typer.Option("--learning-rate")] = 5e-5,
+    max_length: Annotated[int, typer.Option("--max-length")] = 128,
+    test_size: Annotated[float, typer.Option("--test-size")] = 0.1,
+    seed: Annotated[int, typer.Option("--seed")] = 0,
+    sentences: Annotated[bool, typer.Option("--sentences/--whole-texts", help='Distill on the unique sentences of the rows, as they are classified at runtime.')] = True,
+    max_texts: Annotated[int, typer.Option("--max-texts")] = None,
+    report_path: Annotated[Path, typer.Option("--report")] = None,
+    api_token: Annotated[str, typer.Option("--token", envvar='HF_TOKEN')] = None
+):
+    """Distills the binary and multilabel models into a single two-head student and reports its agreement, latency and memory."""
+
+    from scripts.datasets import TEXT_COLUMNS, find_column, load_master_dataset
+    from scripts.distill import distill_student, save_student
+    from scripts.predict import InferenceHandler
+
+    df = load_master_dataset(dataset_path, api_token)
+    text_column = find_column(df, TEXT_COLUMNS, text_column)
+    texts = df[text_column].dropna().astype(str).tolist()
+
+    handler = InferenceHandler(api_token, use_cache=False, prefilter=False, student=False)
+    if sentences:
+        texts = list(dict.fromkeys(sent for text in texts for sent in handler.segmenter.split(text)))
+    if max_texts is not None:
+        texts = texts[:max_texts]
+
+    student, tokenizer, report = distill_student(
+        handler,
+        texts,
+        num_layers=num_layers,
+        epochs=epochs,
+        batch_size=batch_size,
+        learning_rate=learning_rate,
+        max_length=max_length,
+        test_size=test_size,
+        seed=seed
+    )
+    manifest = save_student(student, tokenizer, report, STUDENT_PATH)
+    logger.success(f"Student {manifest['id']} saved to {STUDENT_PATH} ({report['train_size']} training / {report['texts']} held-out texts).")
+
+    logger.info(
+        f"binary agreement {report['binary_agreement']:.2%}, binary probability MAE {report['binary_probability_mae']:.4f}, "
+        f"category score MAE {report['category_score_mae'] if report['category_score_mae'] is not None else 'n/a'}"
+    )
+    logger.info(
+        f"{report['teacher_ms_per_text']:.2f} -> {report['student_ms_per_text']:.2f} ms per text "
+        f"({report['latency_reduction']:.2%} less), {report['teacher_weight_bytes'] / 2**20:.1f} -> "
+        f"{report['student_weight_bytes'] / 2**20:.1f} MiB of weights ({report['memory_reduction']:.2%} less)"
+    )
+    logger.info('Set enabled = true in the [student] section of config.toml to serve the student.')
+
+    if report_path is not None:
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+@app.command('serve')
+def serve(
+    host: Annotated[str, typer.Option("--host")] = None,
+    port: Annotated[int, typer.Option("--port", "-p")] = None,
+    api_token: Annotated[str, typer.Option("--token", envvar='HF_TOKEN')] = None
+):
+    """Runs the standalone HTTP inference service until interrupted."""
+
+    from scripts.registry import get_inference_handler
+    from scripts.service import InferenceService
+
+    handler = get_inference_handler(api_token, warmup=not POOL_ENABLED)
+    if POOL_ENABLED:
+        from scripts.pool import InferencePool
+        handler.attach_pool(InferencePool(handler))
+
+    InferenceService(handler, host or SERVICE_HOST, SERVICE_PORT if port is None else port).serve_forever()
+
 
 if __name__ == "__main__":
     app()
\ No newline at end of file
@@ -0,0 +1,292 @@
+"""
+Script file used for locating and reading the NLPinitiative datasets hosted in the HF dataset repository.
+
+Each CSV of the dataset snapshot is converted once to an uncompressed Arrow IPC file in a local cache keyed by the snapshot
+revision. Datasets are then opened lazily by memory-mapping these files, so reading a page of rows only touches that page.
+"""
+
+import os
+import time
+import threading
+
+from pathlib import Path
+
+from scripts.config import (
+    DATASET_REPO,
+    DATASET_CACHE_DIR,
+    DATASET_PAGE_SIZE,
+    OFFLINE_ENABLED
+)
+
+MASTER_DATASET = os.path.join('processed', 'NLPinitiative_Master_Dataset.csv')
+DATASET_RECORD = 'dataset_record.csv'
+RAW_DIR = 'raw'
+INTERIM_DIR = 'interim'
+TEXT_COLUMNS = ['TEXT', 'text', 'Text']
+LABEL_COLUMNS = ['DISCRIMINATORY', 'discriminatory', 'Discriminatory']
+
+def dataset_snapshot(api_token: str = None, offline: bool = OFFLINE_ENABLED) -> Path:
+    """Resolves the local snapshot of the dataset repository, downloading it if needed.
+
+    Parameters
+    ----------
+    api_token : str, optional
+        The Hugging Face token used for the download (default is None).
+    offline : bool, optional
+        Whether to only use an already downloaded snapshot (default is the configured offline setting).
+
+    Returns
+    -------
+    Path
+        The local directory of the dataset snapshot.
+    """
+
+    from huggingface_hub import snapshot_download
+    return Path(snapshot_download(repo_id=DATASET_REPO, repo_type='dataset', token=api_token, local_files_only=offline))
+
+def find_column(df, candidates: list[str], column: str = None) -> str:
+    """Determines which of several candidate column names a DataFrame uses.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The DataFrame to search.
+    candidates : list[str]
+        The accepted names, in order of preference.
+    column : str, optional
+        An explicit column name, which is used if given (default is None).
+
+    Returns
+    -------
+    str
+        The name of the column.
+
+    Raises
+    ------
+    KeyError
+        If none of the names is a column of the DataFrame.
+    """
+
+    for name in ([column] if column is not None else candidates):
+        if name in df.columns:
+            return name
+    raise KeyError(f'None of the columns {[column] if column is not None else candidates} exist (found {list(df.columns)}).')
+
+def load_master_dataset(path: Path = None, api_token: str = None):
+    """Reads the master dataset the models were trained on.
+
+    Parameters
+    ----------
+    path : Path, optional
+        A local CSV file to read instead of the dataset repository's copy (default is None).
+    api_token : str, optional
+        The Hugging Face token used if the dataset repository needs to be downloaded (default is None).
+
+    Returns
+    -------
+    pd.DataFrame
+        The master dataset.
+
+    Raises
+    ------
+    FileNotFoundError
+        If no path is given and the dataset repository's snapshot does not contain the master dataset.
+    """
+
+    if path is None:
+        snapshot = dataset_snapshot(api_token)
+        master = DatasetCatalog(snapshot).master()
+        if master is None:
+            raise FileNotFoundError(f'The dataset snapshot {snapshot} does not contain the master dataset ({MASTER_DATASET}).')
+        return master.to_pandas()
+
+    import pandas as pd
+    return pd.read_csv(path)
+
+class ArrowDataset:
+    """A CSV file of the dataset snapshot, converted once to Arrow IPC and opened lazily as a memory-mapped table."""
+
+    def __init__(self, csv_path: Path, arrow_path: Path):
+        """Constructor for instantiating an ArrowDataset object.
+
+        Parameters
+        ----------
+        csv_path : Path
+            The CSV file of the dataset.
+        arrow_path : Path
+            The cached Arrow IPC file the CSV is converted to.
+        """
+
+        self.csv_path = Path(csv_path)
+        self.arrow_path = Path(arrow_path)
+        self.stats = None
+
+        self._table = None
+        self._lock = threading.Lock()
+
+    def _convert(self):
+        """Converts the CSV to Arrow IPC, writing to a temporary file first so a partial file is never used."""
+
+        import pandas as pd
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(pd.read_csv(self.csv_path), preserve_index=False)
+        self.arrow_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.arrow_path.with_name(f'{self.arrow_path.name}.{os.getpid()}.tmp')
+        with pa.OSFile(str(tmp_path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, self.arrow_path)
+
+    def load(self):
+        """Opens the dataset, converting the CSV first if it has not been converted yet.
+
+        Returns
+        -------
+        pa.Table
+            The memory-mapped table.
+        """
+
+        with self._lock:
+            if self._table is not None:
+                return self._table
+
+            import pyarrow as pa
+
+            start = time.perf_counter()
+            converted = not self.arrow_path.exists()
+            if converted:
+                self._convert()
+
+            allocated = pa.total_allocated_bytes()
+            self._table = pa.ipc.open_file(pa.memory_map(str(self.arrow_path), 'r')).read_all()
+            self.stats = {
+                'load_seconds': time.perf_counter() - start,
+                'converted': converted,
+                'rows': self._table.num_rows,
+                'mapped_bytes': self._table.nbytes,
+                'allocated_bytes': pa.total_allocated_bytes() - allocated
+            }
+            return self._table
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the dataset has been opened."""
+
+        return self._table is not None
+
+    @property
+    def num_rows(self) -> int:
+        """The number of rows in the dataset."""
+
+        return self.load().num_rows
+
+    def num_pages(self, page_size: int = DATASET_PAGE_SIZE) -> int:
+        """The number of pages of page_size rows in the dataset."""
+
+        return max(1, -(-self.num_rows // page_size))
+
+    def page(self, page: int, page_size: int = DATASET_PAGE_SIZE):
+        """Reads a page of rows.
+
+        Parameters
+        ----------
+        page : int
+            The page number, starting from 1.
+        page_size : int, optional
+            The number of rows per page (default is the configured page_size).
+
+        Returns
+        -------
+        pd.DataFrame
+            The rows of the page, indexed by their position in the dataset.
+        """
+
+        offset = (page - 1) * page_size
+        df = self.load().slice(offset, page_size).to_pandas()
+        df.index = range(offset, offset + len(df))
+        return df
+
+    def to_pandas(self):
+        """Reads the whole dataset.
+
+        Returns
+        -------
+        pd.DataFrame
+            The dataset.
+        """
+
+        return self.load().to_pandas()
+
+class DatasetCatalog:
+    """The datasets of a snapshot of the dataset repository, each backed by an ArrowDataset cached under the snapshot revision."""
+
+    def __init__(self, snapshot: Path, cache_dir: Path = DATASET_CACHE_DIR):
+        """Constructor for instantiating a DatasetCatalog object.
+
+        Parameters
+        ----------
+        snapshot : Path
+            The local directory of the dataset snapshot, as returned by dataset_snapshot.
+        cache_dir : Path, optional
+            The directory the converted datasets are cached in (default is the configured cache_dir).
+        """
+
+        self.snapshot = Path(snapshot)
+        # snapshot_download returns <cache>/snapshots/<commit hash>, so the directory name identifies the revision
+        self.revision = self.snapshot.name
+        self.cache_dir = Path(cache_dir) / self.revision
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    def dataset(self, relative_path: str) -> ArrowDataset:
+        """Returns the (lazily loaded) dataset of a CSV file in the snapshot.
+
+        Parameters
+        ----------
+        relative_path : str
+            The path of the CSV file, relative to the snapshot.
+
+        Returns
+        -------
+        ArrowDataset
+            The dataset, shared by every caller asking for the same file.
+        """
+
+        with self._lock:
+            ds = self._datasets.get(relative_path)
+            if ds is None:
+                ds = self._datasets[relative_path] = ArrowDataset(
+                    self.snapshot / relative_path,
+                    self.cache_dir / Path(relative_path).with_suffix('.arrow')
+                )
+            return ds
+
+    def master(self) -> ArrowDataset | None:
+        """Returns the master dataset, or None if the snapshot does not contain it."""
+
+        return self.dataset(MASTER_DATASET) if (self.snapshot / MASTER_DATASET).exists() else None
+
+    def records(self) -> list[dict]:
+        """Lists the source datasets recorded in the snapshot's dataset record.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            The id and reference URL of each source dataset, with its raw and normalized datasets.
+        """
+
+        import pandas as pd
+
+        record_path = self.snapshot / DATASET_RECORD
+        if not record_path.exists():
+            return []
+
+        records = []
+        for _, row in pd.read_csv(record_path).iterrows():
+            records.append({
+                'id': row['Dataset ID'],
+                'url': row['Dataset Reference URL'],
+                'raw': self.dataset(os.path.join(RAW_DIR, row['Raw Dataset Filename'])),
+                'normalized': self.dataset(os.path.join(INTERIM_DIR, row['Converted Filename']))
+            })
+        return records
@@ -0,0 +1,274 @@
+"""
+Script file providing the near-duplicate detection stage run before inference.
+
+Sentences are normalized (lower-cased, with punctuation and runs of whitespace removed) and reduced to MinHash signatures of their
+character shingles. Locality-sensitive hashing over bands of the signatures finds candidate pairs, which are grouped when their
+estimated Jaccard similarity reaches the configured threshold. Only the first sentence of each group (its representative) is
+scored, and its result is fanned out to the rest of the group. In audit mode a sample of the duplicates is scored as well, to
+measure how far the fanned-out results drift from the duplicates' own results.
+"""
+
+import re
+import zlib
+import threading
+import numpy as np
+
+from scripts.config import DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_AUDIT_RATE
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+# The Mersenne prime 2^31 - 1, small enough that the permutation products fit in 64 bits
+_PRIME = (1 << 31) - 1
+
+def normalize(text: str) -> str:
+    """Lower-cases a text and reduces it to its words separated by single spaces."""
+
+    return ' '.join(_TOKEN.findall(text.lower()))
+
+def lsh_bands(threshold: float, num_perm: int) -> tuple[int, int]:
+    """Chooses the number of bands and rows per band of the LSH index for a Jaccard threshold.
+
+    A pair with similarity s becomes a candidate with probability 1 - (1 - s^rows)^bands, which rises steeply around
+    (1 / bands)^(1 / rows). The split whose midpoint is closest below the threshold is chosen, so that pairs at the threshold are
+    likely to become candidates and the signature comparison rejects the rest.
+
+    Parameters
+    ----------
+    threshold : float
+        The Jaccard similarity above which sentences are grouped.
+    num_perm : int
+        The number of hash permutations of each signature.
+
+    Returns
+    -------
+    tuple[int, int]
+        The number of bands and the number of rows per band.
+    """
+
+    splits = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [(bands, rows) for bands, rows in splits if (1 / bands) ** (1 / rows) <= threshold]
+    if len(below) == 0:
+        return splits[0]
+    return max(below, key=lambda split: (1 / split[0]) ** (1 / split[1]))
+
+class NearDuplicateDetector:
+    """Groups near-duplicate sentences with MinHash/LSH and keeps the dedup and audit statistics."""
+
+    def __init__(
+        self,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = DEDUP_NUM_PERM,
+        audit_rate: float = DEDUP_AUDIT_RATE,
+        shingle_size: int = 5,
+        seed: int = 0
+    ):
+        """Constructor for instantiating a NearDuplicateDetector object.
+
+        Parameters
+        ----------
+        threshold : float, optional
+            The estimated Jaccard similarity of the shingles above which sentences are grouped (default is the configured threshold).
+        num_perm : int, optional
+            The number of hash permutations of each MinHash signature (default is the configured num_perm).
+        audit_rate : float, optional
+            The fraction of duplicates that are also scored to measure the drift of the fanned-out results (default is the
+            configured audit_rate).
+        shingle_size : int, optional
+            The length of the character shingles (default is 5).
+        seed : int, optional
+            The seed of the hash permutations and the audit sampling (default is 0).
+        """
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.audit_rate = audit_rate
+        self.shingle_size = shingle_size
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self._audit_rng = np.random.default_rng(seed)
+
+        self._lock = threading.Lock()
+        self.counts = {
+            'sentences': 0,
+            'representatives': 0,
+            'exact_duplicates': 0,
+            'near_duplicates': 0,
+            'characters': 0,
+            'skipped_characters': 0,
+            'audited': 0,
+            'audit_flips': 0
+        }
+        self._score_drift = []
+
+    def signature(self, text: str) -> np.ndarray:
+        """Computes the MinHash signature of a normalized text's character shingles.
+
+        Parameters
+        ----------
+        text : str
+            The normalized text.
+
+        Returns
+        -------
+        np.ndarray
+            The uint64 signature, with shape (num_perm,).
+        """
+
+        size = self.shingle_size
+        shingles = {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles)) % _PRIME
+        return ((self._a * hashes[None, :] + self._b) % _PRIME).min(axis=1)
+
+    def group(self, sentences: list[str]) -> np.ndarray:
+        """Assigns each sentence to the first earlier sentence it is a near-duplicate of.
+
+        Sentences that are equal once normalized are grouped without hashing. A sentence is only compared with representatives
+        (never with other duplicates), so a group cannot drift away from its representative through a chain of small edits.
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The sentences to group.
+
+        Returns
+        -------
+        np.ndarray
+            The index of each sentence's representative, with shape (len(sentences),), where representatives point to themselves.
+        """
+
+        reps = np.arange(len(sentences))
+        by_text = {}
+        signatures = {}
+        buckets = {}
+
+        for idx, sent in enumerate(sentences):
+            text = normalize(sent)
+            rep = by_text.get(text)
+            if rep is not None:
+                reps[idx] = rep
+                continue
+
+            # Texts without words only match texts that are equal to them once normalized
+            if len(text) == 0:
+                by_text[text] = idx
+                continue
+
+            signature = self.signature(text)
+            keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+            # The most similar candidate representative is chosen, if its estimated similarity reaches the threshold
+            candidates = {cand for key in keys for cand in buckets.get(key, ())}
+            best, best_sim = None, self.threshold
+            for cand in sorted(candidates):
+                sim = float(np.mean(signatures[cand] == signature))
+                if sim >= best_sim and (best is None or sim > best_sim):
+                    best, best_sim = cand, sim
+
+            if best is not None:
+                reps[idx] = best
+                by_text[text] = best
+                continue
+
+            by_text[text] = idx
+            signatures[idx] = signature
+            for key in keys:
+                buckets.setdefault(key, []).append(idx)
+
+        return reps
+
+    def record(self, sentences: list[str], reps: np.ndarray):
+        """Adds a grouped list of sentences to the dedup statistics."""
+
+        lengths = np.fromiter((len(sent) for sent in sentences), dtype=np.int64, count=len(sentences))
+        duplicates = reps != np.arange(len(sentences))
+        exact = sum(sentences[idx] == sentences[reps[idx]] for idx in np.flatnonzero(duplicates).tolist())
+
+        with self._lock:
+            self.counts['sentences'] += len(sentences)
+            self.counts['representatives'] += len(sentences) - int(duplicates.sum())
+            self.counts['exact_duplicates'] += exact
+            self.counts['near_duplicates'] += int(duplicates.sum()) - exact
+            self.counts['characters'] += int(lengths.sum())
+            self.counts['skipped_characters'] += int(lengths[duplicates].sum())
+
+    def audit_sample(self, sentences: list[str], reps: np.ndarray) -> list[int]:
+        """Samples the duplicates to score in audit mode (exact copies of their representative are never sampled).
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The grouped sentences.
+        reps : np.ndarray
+            The representative of each sentence, as returned by group.
+
+        Returns
+        -------
+        list[int]
+            The indices of the sampled duplicates.
+        """
+
+        if self.audit_rate <= 0:
+            return []
+
+        duplicates = np.asarray(
+            [idx for idx in np.flatnonzero(reps != np.arange(len(reps))).tolist() if sentences[idx] != sentences[reps[idx]]],
+            dtype=np.int64
+        )
+        with self._lock:
+            sampled = self._audit_rng.random(len(duplicates)) < self.audit_rate
+        return duplicates[sampled].tolist()
+
+    def record_audit(self, fanned_out: list[tuple], scored: list[tuple]):
+        """Compares the fanned-out results of audited duplicates with their own results.
+
+        Parameters
+        ----------
+        fanned_out : list[tuple[int, list[float] | None]]
+            The prediction class and category scores each duplicate received from its representative.
+        scored : list[tuple[int, list[float] | None]]
+            The prediction class and category scores of each duplicate's own forward pass.
+        """
+
+        flips, drift = 0, []
+        for (rep_class, rep_scores), (own_class, own_scores) in zip(fanned_out, scored):
+            if rep_class != own_class:
+                flips += 1
+            elif rep_scores is not None and own_scores is not None:
+                drift.append(float(np.max(np.abs(np.asarray(rep_scores) - np.asarray(own_scores)))))
+
+        with self._lock:
+            self.counts['audited'] += len(scored)
+            self.counts['audit_flips'] += flips
+            self._score_drift.extend(drift)
+
+    def stats(self) -> dict:
+        """Returns the dedup ratio, the estimated compute saved and the audited drift since the detector was created.
+
+        The compute saved is estimated as the fraction of the input characters that belonged to duplicates, since the cost of a
+        forward pass grows with the length of the sentence.
+
+        Returns
+        -------
+        dict[str, Any]
+            The threshold and LSH configuration, the sentence, representative and duplicate counts, the dedup ratio, the compute
+            saved and, in audit mode, the number of audited duplicates, their prediction flips and their category score drift.
+        """
+
+        with self._lock:
+            stats = dict(self.counts)
+            drift = list(self._score_drift)
+
+        stats['threshold'] = self.threshold
+        stats['bands'], stats['rows'] = self.bands, self.rows
+        stats['dedup_ratio'] = 1 - stats['representatives'] / stats['sentences'] if stats['sentences'] > 0 else 0.0
+        stats['compute_saved'] = stats.pop('skipped_characters') / stats['characters'] if stats['characters'] > 0 else 0.0
+        del stats['characters']
+
+        stats['audit_rate'] = self.audit_rate
+        stats['audit_flip_rate'] = stats['audit_flips'] / stats['audited'] if stats['audited'] > 0 else 0.0
+        stats['max_score_drift'] = max(drift) if len(drift) > 0 else 0.0
+        stats['mean_score_drift'] = float(np.mean(drift)) if len(drift) > 0 else 0.0
+        return stats
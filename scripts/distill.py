@@ -0,0 +1,350 @@
+"""
+Script file used for distilling the binary and multilabel models into a single, smaller student model with two heads.
+
+The student is a standard sequence classification model with 2 + 6 outputs: the first two are the binary classification logits
+and the remaining six are the category regression scores, so one forward pass of a single (shallower) encoder replaces the two
+full encoders of the teachers, and it can be executed by every inference backend. It is initialized from the binary teacher,
+keeping its embeddings and an evenly spaced subset of its encoder layers, with the two heads initialized from the teachers'
+classifiers, and trained on CPU to match the teachers' binary probabilities and category scores over the master dataset.
+"""
+
+import json
+import time
+import shutil
+import hashlib
+import numpy as np
+
+from pathlib import Path
+from loguru import logger
+
+from scripts.config import STUDENT_PATH
+
+BINARY_OUTPUTS = 2
+MANIFEST_NAME = 'student.json'
+REPORT_NAME = 'report.json'
+
+def read_student_manifest(path: Path = STUDENT_PATH) -> dict:
+    """Reads the manifest written alongside a distilled student model.
+
+    Parameters
+    ----------
+    path : Path, optional
+        The directory of the student model (default is the configured student path).
+
+    Returns
+    -------
+    dict[str, Any]
+        The student's id, the model key of its teachers and its number of encoder layers.
+
+    Raises
+    ------
+    FileNotFoundError
+        If no student has been distilled into the directory.
+    """
+
+    manifest_path = Path(path) / MANIFEST_NAME
+    if not manifest_path.exists():
+        raise FileNotFoundError(f'No distilled student model in {path} (run `python -m scripts.config distill` first).')
+
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def _param_bytes(*models) -> int:
+    """The memory used by the parameters and buffers of the given models, in bytes (shared tensors are counted once)."""
+
+    seen, total = set(), 0
+    for model in models:
+        for tensor in list(model.parameters()) + list(model.buffers()):
+            if tensor.data_ptr() not in seen:
+                seen.add(tensor.data_ptr())
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+def build_student(bin_teacher, ml_teacher, num_layers: int = 4):
+    """Builds a student model from the binary teacher's architecture with fewer encoder layers and 2 + 6 outputs.
+
+    Parameters
+    ----------
+    bin_teacher : PreTrainedModel
+        The binary classification teacher, whose embeddings and encoder layers initialize the student.
+    ml_teacher : PreTrainedModel
+        The multilabel regression teacher, whose classifier initializes the student's regression head.
+    num_layers : int, optional
+        The number of encoder layers of the student (default is 4).
+
+    Returns
+    -------
+    PreTrainedModel
+        The untrained student model.
+    """
+
+    import copy
+    import torch
+    from transformers import AutoModelForSequenceClassification
+
+    num_outputs = BINARY_OUTPUTS + ml_teacher.config.num_labels
+    config = copy.deepcopy(bin_teacher.config)
+    config.num_hidden_layers = num_layers
+    config.num_labels = num_outputs
+    config.problem_type = None
+    config.id2label = {idx: f'LABEL_{idx}' for idx in range(num_outputs)}
+    config.label2id = {label: idx for idx, label in config.id2label.items()}
+
+    student = AutoModelForSequenceClassification.from_config(config)
+
+    teacher_layers = bin_teacher.config.num_hidden_layers
+    layer_map = np.linspace(0, teacher_layers - 1, num_layers).round().astype(int).tolist()
+    try:
+        student_base, teacher_base = student.base_model, bin_teacher.base_model
+        student_base.embeddings.load_state_dict(teacher_base.embeddings.state_dict())
+        for student_idx, teacher_idx in enumerate(layer_map):
+            student_base.encoder.layer[student_idx].load_state_dict(teacher_base.encoder.layer[teacher_idx].state_dict())
+        if getattr(student_base, 'pooler', None) is not None and getattr(teacher_base, 'pooler', None) is not None:
+            student_base.pooler.load_state_dict(teacher_base.pooler.state_dict())
+
+        with torch.no_grad():
+            student.classifier.weight[:BINARY_OUTPUTS] = bin_teacher.classifier.weight
+            student.classifier.bias[:BINARY_OUTPUTS] = bin_teacher.classifier.bias
+            student.classifier.weight[BINARY_OUTPUTS:] = ml_teacher.classifier.weight
+            student.classifier.bias[BINARY_OUTPUTS:] = ml_teacher.classifier.bias
+        logger.info(f'Initialized the student from teacher layers {layer_map}.')
+    except (AttributeError, RuntimeError) as e:
+        logger.warning(f'Unable to initialize the student from the teachers ({e}), it is trained from a random initialization.')
+
+    return student
+
+def _student_outputs(student, tokenizer, texts: list[str], batch_size: int = 64, max_length: int = 128):
+    """Runs the student over texts, returning the binary probabilities and clamped category scores as float32 arrays."""
+
+    import torch
+
+    probs, scores = [], []
+    student.eval()
+    with torch.inference_mode():
+        for start in range(0, len(texts), batch_size):
+            batch = tokenizer(texts[start:start + batch_size], padding=True, truncation=True, max_length=max_length, return_tensors='pt')
+            logits = student(**batch).logits.float()
+            probs.append(torch.softmax(logits[:, :BINARY_OUTPUTS], dim=-1)[:, 1].numpy())
+            scores.append(logits[:, BINARY_OUTPUTS:].clamp(0.0, 1.0).numpy())
+    return np.concatenate(probs).astype(np.float32), np.concatenate(scores).astype(np.float32)
+
+def evaluate_student(handler, student, tokenizer, texts: list[str], teacher_probs: np.ndarray, teacher_scores: np.ndarray, repeats: int = 3) -> dict:
+    """Compares a student with its teachers on held-out texts.
+
+    Parameters
+    ----------
+    handler : InferenceHandler
+        The handler holding the teacher models.
+    student : PreTrainedModel
+        The student model.
+    tokenizer : PreTrainedTokenizer | PreTrainedTokenizerFast
+        The tokenizer of the student.
+    texts : list[str]
+        The held-out texts.
+    teacher_probs : np.ndarray
+        The binary teacher's probability that each text is discriminatory.
+    teacher_scores : np.ndarray
+        The multilabel teacher's clamped category scores of each text.
+    repeats : int, optional
+        The number of timed passes over the texts for each model (default is 3).
+
+    Returns
+    -------
+    dict[str, Any]
+        The binary agreement, the category score errors on the texts both flag, the latency of the teachers' and the
+        student's forward passes per text and the memory used by their weights.
+    """
+
+    import torch
+
+    student_probs, student_scores = _student_outputs(student, tokenizer, texts)
+    teacher_flags = teacher_probs > 0.5
+    student_flags = student_probs > 0.5
+    flagged = teacher_flags & student_flags
+
+    report = {
+        'texts': len(texts),
+        'binary_agreement': float((teacher_flags == student_flags).mean()) if len(texts) > 0 else None,
+        'binary_probability_mae': float(np.abs(teacher_probs - student_probs).mean()) if len(texts) > 0 else None,
+        'teacher_flag_rate': float(teacher_flags.mean()) if len(texts) > 0 else None,
+        'student_flag_rate': float(student_flags.mean()) if len(texts) > 0 else None,
+        'category_score_mae': float(np.abs(teacher_scores[flagged] - student_scores[flagged]).mean()) if flagged.any() else None,
+        'top_category_agreement': float((teacher_scores[flagged].argmax(axis=1) == student_scores[flagged].argmax(axis=1)).mean()) if flagged.any() else None
+    }
+
+    # The teachers are timed on the runtime path (the binary pass over every text plus the multilabel pass over flagged texts),
+    # and the student over length-sorted texts, as the runtime path batches them
+    teacher_times, student_times = [], []
+    batch_size = handler.max_batch_size
+    by_length = sorted(texts, key=len)
+    with torch.inference_mode():
+        for _ in range(repeats):
+            start = time.perf_counter()
+            handler._forward(texts, batch_size)
+            teacher_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            _student_outputs(student, tokenizer, by_length, batch_size, max_length=512)
+            student_times.append(time.perf_counter() - start)
+
+    num_texts = max(len(texts), 1)
+    report['teacher_ms_per_text'] = min(teacher_times) * 1000.0 / num_texts
+    report['student_ms_per_text'] = min(student_times) * 1000.0 / num_texts
+    report['latency_reduction'] = 1.0 - report['student_ms_per_text'] / report['teacher_ms_per_text'] if report['teacher_ms_per_text'] > 0 else None
+    report['teacher_weight_bytes'] = _param_bytes(handler.bin_model, handler.ml_regr_model)
+    report['student_weight_bytes'] = _param_bytes(student)
+    report['memory_reduction'] = 1.0 - report['student_weight_bytes'] / report['teacher_weight_bytes']
+    return report
+
+def distill_student(
+    handler,
+    texts: list[str],
+    num_layers: int = 4,
+    epochs: int = 2,
+    batch_size: int = 16,
+    learning_rate: float = 5e-5,
+    max_length: int = 128,
+    temperature: float = 2.0,
+    regression_weight: float = 1.0,
+    test_size: float = 0.1,
+    seed: int = 0
+):
+    """Distills the handler's binary and multilabel models into a single student model.
+
+    The teachers' outputs are computed once through the handler's batched scoring path. The student is then trained with a
+    temperature-scaled soft cross-entropy against the binary teacher's probabilities plus the mean squared error against the
+    multilabel teacher's category scores.
+
+    Parameters
+    ----------
+    handler : InferenceHandler
+        The handler holding the teacher models.
+    texts : list[str]
+        The training texts (e.g. the sentences of the master dataset).
+    num_layers : int, optional
+        The number of encoder layers of the student (default is 4).
+    epochs : int, optional
+        The number of passes over the training texts (default is 2).
+    batch_size : int, optional
+        The number of texts per optimization step (default is 16).
+    learning_rate : float, optional
+        The AdamW learning rate (default is 5e-5).
+    max_length : int, optional
+        The maximum number of tokens per text during training (default is 128).
+    temperature : float, optional
+        The softmax temperature of the binary distillation loss (default is 2.0).
+    regression_weight : float, optional
+        The weight of the category regression loss relative to the binary loss (default is 1.0).
+    test_size : float, optional
+        The fraction of texts held out for the evaluation report (default is 0.1).
+    seed : int, optional
+        The seed of the split, the initialization and the batch order (default is 0).
+
+    Returns
+    -------
+    tuple[PreTrainedModel, PreTrainedTokenizer | PreTrainedTokenizerFast, dict]
+        The trained student, its tokenizer and the evaluation report (see evaluate_student).
+    """
+
+    import torch
+    from scripts.prefilter import split_indices
+
+    torch.manual_seed(seed)
+    logger.info(f'Scoring {len(texts)} texts with the teachers...')
+    start = time.perf_counter()
+    teacher_probs, teacher_scores = handler.score_texts(texts)
+    logger.info(f'Teacher outputs computed in {time.perf_counter() - start:.1f}s.')
+
+    train_idx, test_idx = split_indices(len(texts), test_size, seed)
+    tokenizer = handler.bin_tokenizer
+    student = build_student(handler.bin_model, handler.ml_regr_model, num_layers)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=learning_rate)
+
+    targets = torch.from_numpy(np.stack([1.0 - teacher_probs, teacher_probs], axis=1))
+    score_targets = torch.from_numpy(teacher_scores)
+    rng = np.random.default_rng(seed)
+
+    start = time.perf_counter()
+    for epoch in range(epochs):
+        student.train()
+        order = rng.permutation(train_idx)
+        total_loss = 0.0
+        for batch_start in range(0, len(order), batch_size):
+            rows = order[batch_start:batch_start + batch_size]
+            batch = tokenizer([texts[row] for row in rows], padding=True, truncation=True, max_length=max_length, return_tensors='pt')
+            logits = student(**batch).logits
+
+            # Soft targets at temperature T, scaled by T^2 so the gradient magnitude does not depend on T
+            soft_targets = torch.softmax(torch.log(targets[rows].clamp_min(1e-6)) / temperature, dim=-1)
+            binary_loss = -(soft_targets * torch.log_softmax(logits[:, :BINARY_OUTPUTS] / temperature, dim=-1)).sum(dim=-1).mean() * temperature ** 2
+            regression_loss = torch.nn.functional.mse_loss(logits[:, BINARY_OUTPUTS:], score_targets[rows])
+            loss = binary_loss + regression_weight * regression_loss
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(rows)
+
+        logger.info(f'Distillation epoch {epoch + 1}/{epochs}: loss={total_loss / max(len(order), 1):.4f} ({time.perf_counter() - start:.0f}s elapsed)')
+
+    student.eval()
+    report = evaluate_student(
+        handler,
+        student,
+        tokenizer,
+        [texts[idx] for idx in test_idx],
+        teacher_probs[test_idx],
+        teacher_scores[test_idx]
+    )
+    report.update({
+        'teachers': handler.model_key,
+        'num_layers': num_layers,
+        'teacher_layers': handler.bin_model.config.num_hidden_layers,
+        'train_size': len(train_idx),
+        'epochs': epochs,
+        'train_seconds': time.perf_counter() - start
+    })
+    return student, tokenizer, report
+
+def save_student(student, tokenizer, report: dict, path: Path = STUDENT_PATH) -> dict:
+    """Saves a distilled student with its tokenizer, evaluation report and manifest.
+
+    Parameters
+    ----------
+    student : PreTrainedModel
+        The trained student model.
+    tokenizer : PreTrainedTokenizer | PreTrainedTokenizerFast
+        The tokenizer of the student.
+    report : dict
+        The evaluation report returned by distill_student.
+    path : Path, optional
+        The directory to save the student to (default is the configured student path).
+
+    Returns
+    -------
+    dict[str, Any]
+        The manifest, whose id identifies the student's weights (and keys the result cache when the student is used).
+    """
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    # An ONNX export of a previous student would otherwise be served by the onnx backend
+    shutil.rmtree(path / 'onnx', ignore_errors=True)
+    student.save_pretrained(path, safe_serialization=True)
+    tokenizer.save_pretrained(path)
+
+    digest = hashlib.sha1()
+    for weights in sorted(path.glob('*.safetensors')):
+        digest.update(weights.read_bytes())
+
+    manifest = {
+        'id': digest.hexdigest()[:16],
+        'teachers': report.get('teachers'),
+        'num_layers': report.get('num_layers'),
+        'binary_outputs': BINARY_OUTPUTS
+    }
+    with open(path / MANIFEST_NAME, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    with open(path / REPORT_NAME, 'w') as f:
+        json.dump(report, f, indent=2)
+    return manifest
@@ -0,0 +1,289 @@
+"""
+Script file providing a compact, paginated store for the history of a user's classified inputs.
+
+Each entry keeps the SentenceResults of its sentences (the original strings, an int8 vector of prediction classes and a float32
+matrix of category scores, NaN for sentences that were not classified as discriminatory) instead of the nested result dicts. Only
+the most recent max_entries are held in memory; older entries are spilled to .npz files (with the sentences stored as
+offset-encoded UTF-8) when a spill directory is configured and dropped otherwise. The DataFrames rendered for the history are
+cached per entry, so a rerun only builds the frames of the page being shown that were not built before.
+"""
+
+import shutil
+import weakref
+import tempfile
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from collections import OrderedDict, deque
+
+from scripts.config import (
+    HISTORY_MAX_ENTRIES,
+    HISTORY_SPILL_DIR,
+    HISTORY_PAGE_SIZE
+)
+
+from scripts.results import BIN_LABELS, CATEGORIES, SentenceResults
+
+def _encode_strings(strings) -> tuple[np.ndarray, np.ndarray]:
+    """Encodes strings as one UTF-8 byte buffer and the offset of the end of each string, for storage without pickling."""
+
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.cumsum([0] + [len(value) for value in encoded], dtype=np.int64)
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def _decode_strings(data: np.ndarray, offsets: np.ndarray) -> list[str]:
+    """Decodes the strings written by _encode_strings."""
+
+    buffer = data.tobytes()
+    offsets = offsets.tolist()
+    return [buffer[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+
+class HistoryEntry:
+    """A single classified input and the columnar results of its sentences."""
+
+    __slots__ = ('text_input', 'results')
+
+    def __init__(self, text_input: str, results: SentenceResults):
+        self.text_input = text_input
+        self.results = results
+
+    @classmethod
+    def from_result(cls, result: dict):
+        """Builds an entry from the result of InferenceHandler.classify_text.
+
+        Parameters
+        ----------
+        result : dict
+            The result to store.
+
+        Returns
+        -------
+        HistoryEntry
+            The columnar form of the result.
+        """
+
+        sent_results = result['results']
+        outcomes = [
+            (
+                sent['binary_classification']['prediction_class'],
+                [sent['multilabel_regression'][cat] for cat in CATEGORIES] if sent['multilabel_regression'] is not None else None
+            )
+            for sent in sent_results
+        ]
+        return cls(result['text_input'], SentenceResults.from_outcomes([sent['sentence'] for sent in sent_results], outcomes))
+
+    @property
+    def discriminatory(self) -> bool:
+        """Whether any sentence of the entry was classified as discriminatory."""
+
+        return bool(self.results.discriminatory.any())
+
+    @property
+    def nbytes(self) -> int:
+        """The approximate memory used by the entry's arrays and text, in bytes."""
+
+        return self.results.nbytes + sum(len(sent) for sent in self.results.sentences) + len(self.text_input)
+
+    def to_result(self) -> dict:
+        """Rebuilds the result dict the entry was created from (with scores rounded to float32).
+
+        Returns
+        -------
+        dict[str, Any]
+            The result, in the same structure as the one returned by InferenceHandler.classify_text.
+        """
+
+        return {'text_input': self.text_input, 'results': self.results.to_dicts()}
+
+    def save(self, path: Path):
+        """Writes the entry to an .npz file."""
+
+        data, offsets = _encode_strings(self.results.sentences)
+        np.savez(
+            path,
+            text_input=np.array(self.text_input),
+            sentence_data=data,
+            sentence_offsets=offsets,
+            classes=self.results.classes,
+            scores=self.results.scores
+        )
+
+    @classmethod
+    def load(cls, path: Path):
+        """Reads an entry written by save."""
+
+        with np.load(path) as data:
+            sentences = _decode_strings(data['sentence_data'], data['sentence_offsets'])
+            return cls(str(data['text_input']), SentenceResults(sentences, data['classes'], data['scores']))
+
+class HistoryStore:
+    """A capped, columnar store of the inputs a user has classified, with per-entry caching of the rendered frames."""
+
+    def __init__(
+        self,
+        categories: list[str],
+        max_entries: int = HISTORY_MAX_ENTRIES,
+        spill_dir: Path = HISTORY_SPILL_DIR,
+        frame_cache_entries: int = 2 * HISTORY_PAGE_SIZE
+    ):
+        """Constructor for instantiating a HistoryStore object.
+
+        Parameters
+        ----------
+        categories : list[str]
+            The categories of the multilabel regression model, in the order they are displayed.
+        max_entries : int, optional
+            The maximum number of entries held in memory (default is the configured max_entries).
+        spill_dir : Path, optional
+            The directory in which a private folder for entries evicted from memory is created (default is the configured
+            spill_dir, where None drops evicted entries). The folder is removed when the store is garbage collected.
+        frame_cache_entries : int, optional
+            The maximum number of rendered DataFrames that are cached (default is two pages of the configured page_size).
+        """
+
+        self.categories = list(categories)
+        self.max_entries = max(1, max_entries)
+        self.frame_cache_entries = frame_cache_entries
+
+        self._entries = deque()
+        self._offset = 0
+        self._spill_dir = None
+        self._frames = OrderedDict()
+
+        if spill_dir is not None:
+            Path(spill_dir).mkdir(parents=True, exist_ok=True)
+            self._spill_dir = Path(tempfile.mkdtemp(prefix='history-', dir=spill_dir))
+            weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+
+    def __len__(self) -> int:
+        """The number of entries ever added, including those that were dropped."""
+
+        return self._offset + len(self._entries)
+
+    def append(self, result: dict) -> int:
+        """Adds the result of a classified input, evicting the oldest in-memory entry if the store is full.
+
+        Parameters
+        ----------
+        result : dict
+            The result returned by InferenceHandler.classify_text.
+
+        Returns
+        -------
+        int
+            The index of the new entry.
+        """
+
+        self._entries.append(HistoryEntry.from_result(result))
+        while len(self._entries) > self.max_entries:
+            entry = self._entries.popleft()
+            if self._spill_dir is not None:
+                entry.save(self._spill_path(self._offset))
+            self._offset += 1
+        return len(self) - 1
+
+    def _spill_path(self, idx: int) -> Path:
+        return self._spill_dir / f'{idx}.npz'
+
+    def get(self, idx: int) -> HistoryEntry | None:
+        """Returns an entry, reading it from the spill directory if it was evicted from memory.
+
+        Parameters
+        ----------
+        idx : int
+            The index of the entry.
+
+        Returns
+        -------
+        HistoryEntry | None
+            The entry, or None if it was dropped.
+
+        Raises
+        ------
+        IndexError
+            If no entry with the index was ever added.
+        """
+
+        if idx < 0 or idx >= len(self):
+            raise IndexError(f'History entry {idx} does not exist.')
+        if idx >= self._offset:
+            return self._entries[idx - self._offset]
+        if self._spill_dir is not None and self._spill_path(idx).exists():
+            return HistoryEntry.load(self._spill_path(idx))
+        return None
+
+    def available(self) -> int:
+        """The number of entries that can still be retrieved, i.e. those held in memory or spilled to disk."""
+
+        return len(self) if self._spill_dir is not None else len(self._entries)
+
+    def num_pages(self, page_size: int = HISTORY_PAGE_SIZE) -> int:
+        """The number of pages needed to show every retrievable entry."""
+
+        return max(1, -(-self.available() // page_size))
+
+    def page(self, page: int, page_size: int = HISTORY_PAGE_SIZE) -> list[tuple[int, HistoryEntry]]:
+        """Returns a page of entries, most recent first.
+
+        Parameters
+        ----------
+        page : int
+            The page number, starting from 1.
+        page_size : int, optional
+            The number of entries per page (default is the configured page_size).
+
+        Returns
+        -------
+        list[tuple[int, HistoryEntry]]
+            The index and entry of each entry on the page.
+        """
+
+        last = len(self) - 1 - (page - 1) * page_size
+        first = max(len(self) - self.available(), last - page_size + 1)
+        return [(idx, entry) for idx in range(last, first - 1, -1) if (entry := self.get(idx)) is not None]
+
+    def frame(self, idx: int, entry: HistoryEntry = None) -> pd.DataFrame:
+        """Returns the DataFrame displayed for an entry, building it only if it is not cached.
+
+        Parameters
+        ----------
+        idx : int
+            The index of the entry.
+        entry : HistoryEntry, optional
+            The entry, if it was already retrieved (default is None).
+
+        Returns
+        -------
+        pd.DataFrame
+            The sentences, their binary classification and the percentage of each category.
+        """
+
+        df = self._frames.get(idx)
+        if df is not None:
+            self._frames.move_to_end(idx)
+            return df
+
+        entry = entry if entry is not None else self.get(idx)
+        scores = entry.results.scores[:, [CATEGORIES.index(cat) for cat in self.categories]]
+        percentages = np.char.mod('%.2f%%', scores * 100).astype(object)
+        percentages[np.isnan(scores)] = None
+
+        df = pd.DataFrame(percentages, columns=self.categories)
+        df.insert(0, 'Binary Classification', np.array(BIN_LABELS, dtype=object)[entry.results.classes])
+        df.insert(0, 'Sentence', entry.results.sentences)
+
+        self._frames[idx] = df
+        while len(self._frames) > self.frame_cache_entries:
+            self._frames.popitem(last=False)
+        return df
+
+    def last(self) -> dict | None:
+        """Returns the most recent entry as a result dict, or None if the history is empty."""
+
+        return self._entries[-1].to_result() if len(self._entries) > 0 else None
+
+    def nbytes(self) -> int:
+        """The approximate memory used by the in-memory entries, in bytes."""
+
+        return sum(entry.nbytes for entry in self._entries)
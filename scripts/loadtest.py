@@ -0,0 +1,367 @@
+"""
+Script file providing a load test of the Streamlit app with concurrent simulated sessions.
+
+Each session drives its own streamlit.testing.v1.AppTest of app.py from a separate thread, like the script threads of a single
+Streamlit server process: it loads the page, then repeatedly submits a text from the corpus and performs an idle rerun (as any
+widget interaction would). Resources cached with st.cache_resource (the model reloader, the scheduler and the dataset catalog)
+are shared by every session, as they are in the server. The app is served by tiny, randomly initialized stand-in models (see
+scripts/tiny_models.py) registered in place of the configured repositories, and the Hugging Face Hub is not contacted.
+
+The latency of every rerun, the inference and render time of every submission, the resident memory over time and any errors are
+recorded, and the report can be compared against a stored baseline to flag regressions between commits.
+"""
+
+import os
+import time
+import random
+import platform
+import resource
+import threading
+import subprocess
+
+from pathlib import Path
+from contextlib import contextmanager
+from loguru import logger
+
+from scripts.config import ROOT, read_repositories
+from scripts.tiny_models import build_tiny_checkpoints, synthetic_sentence
+
+APP_PATH = ROOT / 'app.py'
+LOADTEST_DIR = ROOT / '.benchmarks'
+DEFAULT_REPORT = LOADTEST_DIR / 'loadtest.json'
+DEFAULT_BASELINE = LOADTEST_DIR / 'loadtest_baseline.json'
+
+def _rss_mb() -> float:
+    """Returns the current resident set size of this process in MB (the peak where the current size is not available)."""
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024.0 * 1024.0)
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024.0 * 1024.0) if platform.system() == 'Darwin' else peak / 1024.0
+
+def _summarize_ms(values: list[float]) -> dict:
+    """Summarizes a list of latencies in milliseconds."""
+
+    if len(values) == 0:
+        return {'count': 0}
+
+    values = sorted(values)
+    pick = lambda q: values[min(int(q * len(values)), len(values) - 1)]
+    return {
+        'count': len(values),
+        'p50_ms': pick(0.50),
+        'p90_ms': pick(0.90),
+        'p99_ms': pick(0.99),
+        'mean_ms': sum(values) / len(values),
+        'max_ms': values[-1]
+    }
+
+def _commit() -> str | None:
+    """Returns the commit of the working tree, if it is a git checkout."""
+
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_corpus(corpus_path: Path = None, text_column: str = 'text', size: int = 200, seed: int = 0) -> list[str]:
+    """Loads the texts submitted by the sessions.
+
+    Parameters
+    ----------
+    corpus_path : Path, optional
+        A CSV, JSONL or plain-text file of texts, read like the input of the classify command (default is None, which generates
+        synthetic texts of 1 to 30 sentences).
+    text_column : str, optional
+        The column (CSV) or field (JSONL) containing the text (default is 'text').
+    size : int, optional
+        The number of synthetic texts to generate (default is 200).
+    seed : int, optional
+        The seed used for the synthetic texts (default is 0).
+
+    Returns
+    -------
+    list[str]
+        The non-empty texts of the corpus.
+    """
+
+    if corpus_path is not None:
+        from scripts.bulk import read_documents
+        return [text for _, text in read_documents(corpus_path, text_column=text_column) if len(text.strip()) > 0]
+
+    rng = random.Random(seed)
+    return [' '.join(synthetic_sentence(rng) for _ in range(rng.randint(1, 30))) for _ in range(size)]
+
+class _MemorySampler:
+    """Samples the resident memory of the process at a fixed interval in a background thread."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = []
+        self._start = time.perf_counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='MemorySampler', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self.samples.append([round(time.perf_counter() - self._start, 3), round(_rss_mb(), 2)])
+            if self._stopped.wait(self.interval):
+                return
+
+    def stop(self) -> list:
+        self._stopped.set()
+        self._thread.join()
+        self.samples.append([round(time.perf_counter() - self._start, 3), round(_rss_mb(), 2)])
+        return self.samples
+
+@contextmanager
+def _shared_test_state():
+    """Makes the process-wide state patched by each AppTest run safe to share between concurrent AppTests.
+
+    Each AppTest run installs a mock runtime and removes it when it returns, which would otherwise remove it from under the
+    script threads of the sessions that are still running (losing, for instance, the form of any widget created meanwhile).
+    While patched, the last installed runtime is used instead. Each run also patches the config to enable the testing mode for
+    the duration of the run, so the testing mode is enabled for the whole load test instead. Finally, each AppTest compiles
+    app.py in its own script cache (the server compiles it once), and parsing it in several threads at once can fail, so the
+    parsing is serialized.
+    """
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner import magic
+    from streamlit.testing.v1.util import patch_config_options
+
+    original_instance = Runtime.__dict__['instance']
+    original_exists = Runtime.__dict__['exists']
+    original_add_magic = magic.add_magic
+    compile_lock = threading.Lock()
+    last = []
+
+    def add_magic(code, script_path):
+        with compile_lock:
+            return original_add_magic(code, script_path)
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+            return cls._instance
+        if len(last) > 0:
+            return last[0]
+        return original_instance.__func__(cls)
+
+    def exists(cls):
+        return cls._instance is not None or len(last) > 0
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+    magic.add_magic = add_magic
+    try:
+        with patch_config_options({'global.appTest': True}):
+            yield
+    finally:
+        Runtime.instance = original_instance
+        Runtime.exists = original_exists
+        magic.add_magic = original_add_magic
+
+def _run_session(
+    session_id: int,
+    texts: list[str],
+    think_time: float,
+    timeout: float,
+    start_delay: float,
+    seed: int,
+    records: list,
+    errors: list
+):
+    """Runs one simulated session, appending a record per rerun and an entry per error.
+
+    Parameters
+    ----------
+    session_id : int
+        The index of the session.
+    texts : list[str]
+        The texts the session submits, in order.
+    think_time : float
+        The mean number of seconds the session waits between reruns (drawn uniformly from 0 to twice this value).
+    timeout : float
+        The number of seconds a rerun may take before it is counted as an error.
+    start_delay : float
+        The number of seconds to wait before the session loads the page.
+    seed : int
+        The seed of the session's think times.
+    records : list[dict[str, Any]]
+        The list the rerun records are appended to.
+    errors : list[dict[str, Any]]
+        The list the errors are appended to.
+    """
+
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed * 1000 + session_id)
+    time.sleep(start_delay)
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+
+    def rerun(kind: str, submit: str = None) -> bool:
+        nonlocal at
+        if submit is not None:
+            # Cleared so that a submission which was not classified is not credited with the previous one's timings
+            at.session_state['last_timings'] = None
+            at.text_area[0].input(submit)
+            at.button[0].click()
+
+        start = time.perf_counter()
+        try:
+            at.run()
+        except Exception as e:
+            errors.append({'session': session_id, 'kind': kind, 'error': f'{type(e).__name__}: {e}'})
+            # A timed out run may still be executing, so the session continues with a fresh AppTest
+            at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+            return False
+
+        record = {'session': session_id, 'kind': kind, 'ms': (time.perf_counter() - start) * 1000.0}
+        for exception in at.exception:
+            errors.append({'session': session_id, 'kind': kind, 'error': exception.message})
+        if submit is not None and len(at.exception) == 0:
+            timings = at.session_state['last_timings'] if 'last_timings' in at.session_state else None
+            if timings is not None:
+                record.update(timings)
+            else:
+                errors.append({'session': session_id, 'kind': kind, 'error': 'The submitted text was not classified.'})
+        records.append(record)
+        return len(at.exception) == 0
+
+    if not rerun('initial'):
+        return
+
+    for text in texts:
+        time.sleep(rng.uniform(0, 2 * think_time))
+        if len(at.text_area) == 0 or len(at.button) == 0:
+            errors.append({'session': session_id, 'kind': 'submit', 'error': 'The classifier form was not rendered.'})
+            rerun('initial')
+            continue
+
+        rerun('submit', text)
+        time.sleep(rng.uniform(0, 2 * think_time))
+        rerun('idle')
+
+def run_load_test(
+    sessions: int = 20,
+    submissions: int = 5,
+    corpus_path: Path = None,
+    text_column: str = 'text',
+    think_time: float = 0.0,
+    ramp_up: float = 0.0,
+    timeout: float = 120.0,
+    memory_interval: float = 0.5,
+    seed: int = 0
+) -> dict:
+    """Runs concurrent simulated sessions of the app against tiny stand-in models.
+
+    Parameters
+    ----------
+    sessions : int, optional
+        The number of concurrent sessions (default is 20).
+    submissions : int, optional
+        The number of texts each session submits (default is 5).
+    corpus_path : Path, optional
+        A CSV, JSONL or plain-text file of the texts to submit (default is None, which uses synthetic texts).
+    text_column : str, optional
+        The column (CSV) or field (JSONL) containing the text (default is 'text').
+    think_time : float, optional
+        The mean number of seconds a session waits between reruns (default is 0.0).
+    ramp_up : float, optional
+        The number of seconds over which the session starts are spread (default is 0.0).
+    timeout : float, optional
+        The number of seconds a rerun may take before it is counted as an error (default is 120.0).
+    memory_interval : float, optional
+        The number of seconds between samples of the resident memory (default is 0.5).
+    seed : int, optional
+        The seed of the stand-in weights, the synthetic corpus and the assignment of texts to sessions (default is 0).
+
+    Returns
+    -------
+    dict[str, Any]
+        The environment description, the latency summaries of the reruns, inference and rendering (keyed by measurement name,
+        as in the benchmark results), the memory samples and growth, and the errors.
+    """
+
+    # Set before the Hub client is first imported, so the dataset snapshot is only read from the local cache
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+
+    import torch
+    import streamlit
+    from scripts.predict import InferenceHandler
+    from scripts.registry import register_inference_handler
+
+    torch.manual_seed(seed)
+    bin_path, ml_path = build_tiny_checkpoints(LOADTEST_DIR / 'models', seed=seed)
+    handler = InferenceHandler(None, bin_repo=str(bin_path), ml_repo=str(ml_path), use_cache=False, segmenter='regex')
+    handler.warmup()
+    register_inference_handler(handler, **read_repositories())
+
+    corpus = load_corpus(corpus_path, text_column, size=max(200, sessions * submissions), seed=seed)
+    rng = random.Random(seed)
+    assignments = [[rng.choice(corpus) for _ in range(submissions)] for _ in range(sessions)]
+
+    records, errors = [], []
+    threads = [
+        threading.Thread(
+            target=_run_session,
+            args=(idx, assignments[idx], think_time, timeout, ramp_up * idx / sessions, seed, records, errors),
+            name=f'LoadTestSession-{idx}',
+            daemon=True
+        )
+        for idx in range(sessions)
+    ]
+
+    logger.info(f'Running {sessions} sessions of {submissions} submissions against the stand-in models...')
+    sampler = _MemorySampler(memory_interval)
+    start = time.perf_counter()
+    with _shared_test_state():
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall_seconds = time.perf_counter() - start
+    samples = sampler.stop()
+
+    submits = [record for record in records if record['kind'] == 'submit']
+    measurements = {
+        f'rerun_{kind}': _summarize_ms([record['ms'] for record in records if record['kind'] == kind])
+        for kind in ('initial', 'submit', 'idle')
+    }
+    measurements['inference'] = _summarize_ms([record['inference_ms'] for record in submits if 'inference_ms' in record])
+    measurements['render'] = _summarize_ms([record['render_ms'] for record in submits if 'render_ms' in record])
+
+    memory = [mb for _, mb in samples]
+    return {
+        'environment': {
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'streamlit': streamlit.__version__,
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'sessions': sessions,
+            'submissions': submissions,
+            'think_time': think_time,
+            'ramp_up': ramp_up,
+            'corpus': str(corpus_path) if corpus_path is not None else 'synthetic',
+            'seed': seed
+        },
+        'measurements': measurements,
+        'wall_seconds': wall_seconds,
+        'submissions_per_second': len(submits) / wall_seconds if wall_seconds > 0 else None,
+        'sentences_per_second': sum(record.get('sentences', 0) for record in submits) / wall_seconds if wall_seconds > 0 else None,
+        'memory': {
+            'start_mb': memory[0],
+            'end_mb': memory[-1],
+            'peak_mb': max(memory),
+            'growth_mb': memory[-1] - memory[0],
+            'samples': samples
+        },
+        'error_count': len(errors),
+        'errors': errors[:100]
+    }
@@ -0,0 +1,165 @@
+"""
+Script file providing the reduced-memory residency of the models and the reporting of their memory use.
+
+In low-memory mode the models are kept in bf16 on CPU (where supported), tensors that are bit-identical between the binary and
+multilabel models are stored once, and autograd state is dropped. memory_breakdown reports the bytes held by each component of
+each model, counting every storage once, and check_drift bounds how far the low-memory outputs drift from the fp32 ones.
+"""
+
+import torch
+import numpy as np
+
+def bf16_supported() -> bool:
+    """Determines whether bf16 matrix multiplications can be run on the CPU."""
+
+    try:
+        a = torch.ones((2, 2), dtype=torch.bfloat16)
+        return bool(torch.isfinite(a @ a).all())
+    except RuntimeError:
+        return False
+
+def _named_tensors(model):
+    """Yields the name, owning module, attribute and tensor of every parameter and buffer, including tied duplicates."""
+
+    for prefix, module in model.named_modules(remove_duplicate=False):
+        for attr, tensor in list(module._parameters.items()) + list(module._buffers.items()):
+            if tensor is not None:
+                yield f'{prefix}.{attr}' if prefix else attr, module, attr, tensor
+
+def _component(model, name: str) -> str:
+    """Returns the top-level component a tensor belongs to (e.g. embeddings, encoder, pooler or classifier)."""
+
+    prefix = f'{model.base_model_prefix}.'
+    if name.startswith(prefix):
+        name = name[len(prefix):]
+    return name.split('.', 1)[0]
+
+def dedupe_tensors(source, target) -> dict:
+    """Makes the target model share every parameter and buffer that is bit-identical to the source's tensor of the same name.
+
+    Parameters
+    ----------
+    source : PreTrainedModel
+        The model whose tensors are kept.
+    target : PreTrainedModel
+        The model whose identical tensors are replaced by the source's.
+
+    Returns
+    -------
+    dict[str, int]
+        The number of tensors that are now shared and the bytes freed.
+    """
+
+    source_tensors = {name: tensor for name, _, _, tensor in _named_tensors(source)}
+
+    shared, freed = 0, 0
+    for name, module, attr, tensor in _named_tensors(target):
+        match = source_tensors.get(name)
+        if match is None or match is tensor or match.shape != tensor.shape or match.dtype != tensor.dtype:
+            continue
+        if match.untyped_storage().data_ptr() == tensor.untyped_storage().data_ptr() or not torch.equal(match, tensor):
+            continue
+
+        freed += tensor.untyped_storage().nbytes()
+        if attr in module._parameters:
+            module._parameters[attr] = match
+        else:
+            module._buffers[attr] = match
+        shared += 1
+
+    return {'tensors': shared, 'bytes': freed}
+
+def release_unused(model):
+    """Drops the state a model only needs for training (gradients and autograd tracking of its parameters)."""
+
+    model.requires_grad_(False)
+    model.zero_grad(set_to_none=True)
+
+def memory_breakdown(models: dict) -> dict:
+    """Reports the bytes held by each component of each model, counting every tensor storage once.
+
+    Storages that a model shares with a model listed before it are reported under its shared_bytes rather than its components.
+
+    Parameters
+    ----------
+    models : dict[str, PreTrainedModel]
+        The models to report, by name.
+
+    Returns
+    -------
+    dict[str, Any]
+        For each model, its dtype, the bytes of each component, the bytes it shares with the earlier models and its total bytes,
+        and the total bytes of all models.
+    """
+
+    counted = set()
+    report = {}
+    total = 0
+    for model_name, model in models.items():
+        components, shared, own = {}, 0, set()
+        for name, _, _, tensor in _named_tensors(model):
+            storage = tensor.untyped_storage()
+            key = storage.data_ptr()
+            if key in own:
+                continue
+            own.add(key)
+            if key in counted:
+                shared += storage.nbytes()
+                continue
+
+            counted.add(key)
+            component = _component(model, name)
+            components[component] = components.get(component, 0) + storage.nbytes()
+
+        model_bytes = sum(components.values())
+        total += model_bytes
+        report[model_name] = {
+            'dtype': str(model.dtype).replace('torch.', ''),
+            'components': components,
+            'shared_bytes': shared,
+            'total_bytes': model_bytes
+        }
+
+    report['total_bytes'] = total
+    return report
+
+def check_drift(reference, candidate, sentences: list[str], atol: float = 0.05, max_flips: int = 0) -> dict:
+    """Measures how far the outputs of a (low-memory) handler drift from those of a reference (fp32) handler.
+
+    Parameters
+    ----------
+    reference : InferenceHandler
+        The handler whose outputs are taken as correct.
+    candidate : InferenceHandler
+        The handler to check.
+    sentences : list[str]
+        The sentences to score.
+    atol : float, optional
+        The largest accepted absolute difference of a binary probability or category score (default is 0.05).
+    max_flips : int, optional
+        The largest accepted number of sentences whose binary prediction changes (default is 0).
+
+    Returns
+    -------
+    dict[str, Any]
+        The largest and mean differences of the binary probabilities and category scores, the number of prediction flips and
+        whether they are within the bounds.
+    """
+
+    ref_probs, ref_scores = reference.score_texts(sentences)
+    probs, scores = candidate.score_texts(sentences)
+
+    prob_drift = np.abs(ref_probs - probs)
+    score_drift = np.abs(ref_scores - scores)
+    flips = int(((ref_probs > 0.5) != (probs > 0.5)).sum())
+
+    report = {
+        'sentences': len(sentences),
+        'max_probability_drift': float(prob_drift.max()) if len(sentences) > 0 else 0.0,
+        'mean_probability_drift': float(prob_drift.mean()) if len(sentences) > 0 else 0.0,
+        'max_score_drift': float(score_drift.max()) if len(sentences) > 0 else 0.0,
+        'mean_score_drift': float(score_drift.mean()) if len(sentences) > 0 else 0.0,
+        'prediction_flips': flips
+    }
+    report['passed'] = report['max_probability_drift'] <= atol and report['max_score_drift'] <= atol and flips <= max_flips
+    return report
@@ -0,0 +1,407 @@
+"""
+Script file providing lightweight per-stage instrumentation of the inference pipeline.
+
+While a request is being tracked (see track), the pipeline records the time spent in each stage (sentence splitting, cache
+lookup, tokenization, the binary and multilabel forward passes, ...), the number of sentences and tokens processed, and the
+size and padding waste of every forward pass batch. The per-request measurements can be attached to a classify_text result,
+and are aggregated into process-wide histograms that are exported in the Prometheus text format, optionally through a small
+local HTTP endpoint. When no request is being tracked every instrumentation point reduces to a single context variable lookup.
+"""
+
+import time
+import bisect
+import threading
+import contextvars
+
+from contextlib import contextmanager, nullcontext
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from loguru import logger
+
+from scripts.config import METRICS_ENABLED
+
+PREFIX = 'nlpinitiative'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+RATIO_BUCKETS = (0.0, 0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8, 1.0)
+
+_HELP = {
+    'stage_seconds': ('histogram', 'Time spent in each stage of the inference pipeline.'),
+    'request_seconds': ('histogram', 'Total time spent handling a tracked request.'),
+    'batch_size': ('histogram', 'Number of sentences per forward pass.'),
+    'padding_waste_ratio': ('histogram', 'Fraction of the tokens of a forward pass batch that are padding.'),
+    'requests_total': ('counter', 'Number of tracked requests.'),
+    'sentences_total': ('counter', 'Number of sentences classified by tracked requests.'),
+    'tokens_total': ('counter', 'Number of (unpadded) tokens passed through the models.'),
+    'padded_tokens_total': ('counter', 'Number of tokens passed through the models, including padding.'),
+    'prefilter_sentences_total': ('counter', 'Number of sentences checked by the prefilter cascade stage.'),
+    'prefilter_skipped_total': ('counter', 'Number of sentences cleared by the prefilter without running the binary classifier.'),
+    'dedup_sentences_total': ('counter', 'Number of sentences grouped by the near-duplicate detection stage.'),
+    'dedup_skipped_total': ('counter', 'Number of near-duplicate sentences given the result of their group representative without inference.'),
+    'model_load_seconds': ('histogram', 'Time spent loading a generation of models, while the active generation keeps serving.'),
+    'model_swap_seconds': ('histogram', 'Time spent swapping a loaded generation of models in.'),
+    'model_reloads_total': ('counter', 'Number of generations of models swapped in.')
+}
+
+class Histogram:
+    """A fixed-bucket histogram of observed values."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Records a value in the first bucket whose upper bound is greater than or equal to it."""
+
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile as the upper bound of the bucket it falls in (the largest bound for the overflow bucket)."""
+
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for idx, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[min(idx, len(self.buckets) - 1)]
+        return self.buckets[-1]
+
+class RequestMetrics:
+    """The stage timings, counters and batch statistics collected while handling a single request."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.batches = []
+        self._active = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times a stage, adding the elapsed time to any earlier time recorded for the same stage."""
+
+        outer = self._active
+        self._active = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+            self._active = outer
+
+    def add_time(self, name: str, seconds: float):
+        """Adds time, in seconds, to a stage."""
+
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def count(self, name: str, value: int = 1):
+        """Increments a counter."""
+
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def batch(self, size: int, tokens: int, padded_tokens: int):
+        """Records a forward pass batch, attributing it to the stage that is currently being timed."""
+
+        self.batches.append({'stage': self._active, 'size': size, 'tokens': tokens, 'padded_tokens': padded_tokens})
+
+    def as_dict(self) -> dict:
+        """Summarizes the request's measurements.
+
+        Returns
+        -------
+        dict[str, Any]
+            The per-stage times (ms), the total time (ms), the counters, the token and padded token totals, the padding waste
+            ratio and the size of every forward pass batch.
+        """
+
+        tokens = sum(batch['tokens'] for batch in self.batches)
+        padded_tokens = sum(batch['padded_tokens'] for batch in self.batches)
+        return {
+            'stages_ms': {name: seconds * 1000.0 for name, seconds in self.stages.items()},
+            'total_ms': (time.perf_counter() - self.started_at) * 1000.0,
+            'counters': dict(self.counters),
+            'tokens': tokens,
+            'padded_tokens': padded_tokens,
+            'padding_waste': 1.0 - tokens / padded_tokens if padded_tokens > 0 else 0.0,
+            'batches': list(self.batches)
+        }
+
+class MetricsRegistry:
+    """A thread-safe, process-wide collection of labelled histograms and counters."""
+
+    def __init__(self, prefix: str = PREFIX):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name: str, value: float, buckets: tuple = LATENCY_BUCKETS, **labels):
+        """Records a value in a labelled histogram, creating the histogram on first use."""
+
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increments a labelled counter."""
+
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def record(self, request: RequestMetrics):
+        """Folds the measurements of a finished request into the histograms and counters.
+
+        Parameters
+        ----------
+        request : RequestMetrics
+            The measurements collected while handling the request.
+        """
+
+        self.inc('requests_total')
+        self.inc('sentences_total', request.counters.get('sentences', 0))
+        self.observe('request_seconds', time.perf_counter() - request.started_at)
+        for name, seconds in request.stages.items():
+            self.observe('stage_seconds', seconds, stage=name)
+
+        for batch in request.batches:
+            stage = batch['stage'] or 'unknown'
+            self.observe('batch_size', batch['size'], BATCH_SIZE_BUCKETS, stage=stage)
+            if batch['padded_tokens'] > 0:
+                self.observe('padding_waste_ratio', 1.0 - batch['tokens'] / batch['padded_tokens'], RATIO_BUCKETS, stage=stage)
+            self.inc('tokens_total', batch['tokens'], stage=stage)
+            self.inc('padded_tokens_total', batch['padded_tokens'], stage=stage)
+
+    def snapshot(self) -> dict:
+        """Summarizes every histogram and counter.
+
+        Returns
+        -------
+        dict[str, list[dict[str, Any]]]
+            For each histogram its labels, count, sum, mean and estimated p50/p90/p99, and for each counter its labels and value.
+        """
+
+        with self._lock:
+            histograms = [
+                {
+                    'name': name,
+                    **dict(labels),
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'mean': histogram.sum / histogram.count if histogram.count > 0 else 0.0,
+                    'p50': histogram.quantile(0.50),
+                    'p90': histogram.quantile(0.90),
+                    'p99': histogram.quantile(0.99)
+                }
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+            counters = [{'name': name, **dict(labels), 'value': value} for (name, labels), value in sorted(self._counters.items())]
+
+        return {'histograms': histograms, 'counters': counters}
+
+    def to_prometheus(self) -> str:
+        """Renders every histogram and counter in the Prometheus text exposition format.
+
+        Returns
+        -------
+        str
+            The metrics, one sample per line.
+        """
+
+        def label_str(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            return '{' + ','.join(f'{key}="{value}"' for key, value in pairs) + '}' if len(pairs) > 0 else ''
+
+        with self._lock:
+            series = {}
+            for (name, labels), histogram in self._histograms.items():
+                series.setdefault(name, []).append((labels, histogram))
+            for (name, labels), value in self._counters.items():
+                series.setdefault(name, []).append((labels, value))
+
+            lines = []
+            for name in sorted(series):
+                metric = f'{self.prefix}_{name}'
+                kind, help_text = _HELP.get(name, ('histogram' if isinstance(series[name][0][1], Histogram) else 'counter', name))
+                lines.append(f'# HELP {metric} {help_text}')
+                lines.append(f'# TYPE {metric} {kind}')
+
+                for labels, value in sorted(series[name], key=lambda item: item[0]):
+                    if isinstance(value, Histogram):
+                        cumulative = 0
+                        for bound, bucket_count in zip(value.buckets, value.counts):
+                            cumulative += bucket_count
+                            lines.append(f'{metric}_bucket{label_str(labels, [("le", bound)])} {cumulative}')
+                        lines.append(f'{metric}_bucket{label_str(labels, [("le", "+Inf")])} {value.count}')
+                        lines.append(f'{metric}_sum{label_str(labels)} {value.sum}')
+                        lines.append(f'{metric}_count{label_str(labels)} {value.count}')
+                    else:
+                        lines.append(f'{metric}{label_str(labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Removes every histogram and counter."""
+
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+# The process-wide registry the tracked requests are recorded in
+REGISTRY = MetricsRegistry()
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_NO_STAGE = nullcontext()
+
+def current() -> RequestMetrics | None:
+    """Returns the measurements of the request being tracked in the current context, if any."""
+
+    return _current.get()
+
+def stage(name: str):
+    """Returns a context manager timing a stage of the tracked request (a no-op when no request is being tracked).
+
+    Parameters
+    ----------
+    name : str
+        The name of the stage.
+    """
+
+    request = _current.get()
+    return _NO_STAGE if request is None else request.stage(name)
+
+def count(name: str, value: int = 1):
+    """Increments a counter of the tracked request, if any.
+
+    Parameters
+    ----------
+    name : str
+        The name of the counter.
+    value : int, optional
+        The amount to increment the counter by (default is 1).
+    """
+
+    request = _current.get()
+    if request is not None:
+        request.count(name, value)
+
+def record_batch(size: int, tokens: int, padded_tokens: int):
+    """Records a forward pass batch of the tracked request, if any.
+
+    Parameters
+    ----------
+    size : int
+        The number of sentences in the batch.
+    tokens : int
+        The number of (unpadded) tokens in the batch.
+    padded_tokens : int
+        The number of tokens in the batch after padding.
+    """
+
+    request = _current.get()
+    if request is not None:
+        request.batch(size, tokens, padded_tokens)
+
+@contextmanager
+def track(enabled: bool = METRICS_ENABLED):
+    """Tracks a request for the duration of the context, recording its measurements in the registry when it ends.
+
+    Nested calls (e.g. classify_sentences called from classify_text) join the request that is already being tracked.
+
+    Parameters
+    ----------
+    enabled : bool, optional
+        Whether to track the request (default is the configured metrics enabled setting).
+
+    Yields
+    ------
+    RequestMetrics | None
+        The measurements of the tracked request, or None when tracking is disabled.
+    """
+
+    outer = _current.get()
+    if not enabled or outer is not None:
+        yield outer
+        return
+
+    request = RequestMetrics()
+    token = _current.set(request)
+    try:
+        yield request
+    finally:
+        _current.reset(token)
+        REGISTRY.record(request)
+
+@contextmanager
+def resume(request: RequestMetrics | None):
+    """Continues tracking an existing request for the duration of the context, without recording it in the registry when it ends.
+
+    Used by generators, which must not leave a request tracked in their caller's context while they are suspended.
+
+    Parameters
+    ----------
+    request : RequestMetrics | None
+        The request to continue tracking, or None to track nothing.
+    """
+
+    if request is None:
+        yield
+        return
+
+    token = _current.set(request)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serves the registry in the Prometheus text format at /metrics."""
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+
+        body = REGISTRY.to_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(host: str = '127.0.0.1', port: int = 9464) -> ThreadingHTTPServer:
+    """Starts a background HTTP server exposing the registry at /metrics.
+
+    Parameters
+    ----------
+    host : str, optional
+        The address to bind to (default is '127.0.0.1', which only accepts local connections).
+    port : int, optional
+        The port to listen on (default is 9464).
+
+    Returns
+    -------
+    ThreadingHTTPServer
+        The running server (call shutdown() to stop it).
+    """
+
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='MetricsServer', daemon=True).start()
+    logger.info(f'Serving inference metrics at http://{host}:{server.server_address[1]}/metrics.')
+    return server
@@ -0,0 +1,356 @@
+"""
+Script file providing a multi-process CPU inference pool.
+
+The pool starts K worker processes, each with its own torch.set_num_threads budget, and shards the sentences of every request
+across them. With the 'fork' start method the workers inherit the parent's already loaded models, sharing the weights
+copy-on-write; with 'spawn' each worker loads the models itself (from memory-mapped safetensors). Forking is only safe while no
+other thread of the parent is running inference, so 'fork' is intended for single-threaded parents such as the bulk CLI, and
+'spawn' for the Streamlit app. Workers are health checked, and a worker that dies is restarted (always with 'spawn', since the
+restart happens on a background thread) with its in-flight work re-dispatched.
+
+A pool is attached to an InferenceHandler (see InferenceHandler.attach_pool), after which every forward pass made by
+classify_text, classify_sentences and the bulk paths is dispatched to the workers, while sentence splitting and result
+caching remain in the parent process.
+"""
+
+import math
+import time
+import itertools
+import threading
+import multiprocessing as mp
+
+from multiprocessing.connection import wait
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from loguru import logger
+
+from scripts.config import (
+    POOL_WORKERS,
+    POOL_THREADS_PER_WORKER,
+    POOL_START_METHOD
+)
+
+# The handler inherited by forked workers (set in the parent immediately before forking)
+_inherited_handler = None
+
+def _worker_main(worker_id: int, tasks, results, threads: int, handler_kwargs: dict):
+    """The worker process loop, which runs InferenceHandler._infer for each task it receives."""
+
+    import torch
+    torch.set_num_threads(threads)
+
+    if handler_kwargs is None:
+        handler = _inherited_handler
+    else:
+        from scripts.predict import InferenceHandler
+        handler = InferenceHandler(**handler_kwargs)
+
+    handler.cache = None
+    handler.pool = None
+    handler.collect_metrics = False
+    handler.prefilter = None
+    handler.dedup = None
+
+    while True:
+        try:
+            task = tasks.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        task_id, kind, payload = task
+        try:
+            if kind == 'ping':
+                results.send((task_id, True, worker_id))
+            else:
+                sentences, batch_size, force_multilabel = payload
+                results.send((task_id, True, handler._infer(sentences, batch_size, force_multilabel)))
+        except Exception as e:
+            results.send((task_id, False, f'{type(e).__name__}: {e}'))
+
+class InferencePool:
+    """A pool of worker processes that executes the forward passes of an InferenceHandler."""
+
+    def __init__(
+        self,
+        handler,
+        workers: int = POOL_WORKERS,
+        threads_per_worker: int = POOL_THREADS_PER_WORKER,
+        start_method: str = POOL_START_METHOD,
+        health_interval: float = 5.0
+    ):
+        """Constructor for instantiating an InferencePool object and starting its workers.
+
+        Parameters
+        ----------
+        handler : InferenceHandler
+            The loaded handler whose models the workers serve.
+        workers : int, optional
+            The number of worker processes (default is the configured workers).
+        threads_per_worker : int, optional
+            The torch intra-op thread budget of each worker (default is the configured threads_per_worker).
+        start_method : str, optional
+            The multiprocessing start method, 'fork' (shares the loaded weights) or 'spawn' (default is the configured start_method).
+        health_interval : float, optional
+            The interval, in seconds, between worker liveness checks (default is 5.0).
+        """
+
+        if start_method not in mp.get_all_start_methods():
+            logger.warning(f"The '{start_method}' start method is unavailable on this platform, using 'spawn'.")
+            start_method = 'spawn'
+
+        self.handler = handler
+        self.workers = max(workers, 1)
+        self.threads_per_worker = max(threads_per_worker, 1)
+        self.start_method = start_method
+        self.health_interval = health_interval
+
+        self._task_ids = itertools.count()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._procs = [None] * self.workers
+        self._tasks = [None] * self.workers
+        self._results = [None] * self.workers
+        self._restarts = [0] * self.workers
+        for worker_id in range(self.workers):
+            self._start_worker(worker_id)
+
+        self._collector = threading.Thread(target=self._collect, name='InferencePoolCollector', daemon=True)
+        self._collector.start()
+        self._monitor = threading.Thread(target=self._watch, name='InferencePoolMonitor', daemon=True)
+        self._monitor.start()
+
+        logger.info(f'Started inference pool with {self.workers} workers x {self.threads_per_worker} threads ({start_method}).')
+
+    def _handler_kwargs(self) -> dict:
+        """Returns the arguments used by spawned workers to load their own handler."""
+
+        return {
+            'api_token': self.handler.api_token,
+            'max_batch_size': self.handler.max_batch_size,
+            'bin_repo': self.handler.bin_repo,
+            'ml_repo': self.handler.ml_repo,
+            'bin_revision': self.handler.bin_revision,
+            'ml_revision': self.handler.ml_revision,
+            'use_cache': False,
+            'backend': self.handler.backend,
+            'collect_metrics': False,
+            'offline': self.handler.offline,
+            'prefilter': False,
+            'dedup': False,
+            'student': self.handler.student is not None,
+            # Workers only classify sentences the parent has already split, so they never need the punkt data
+            'segmenter': 'regex',
+            'low_memory': self.handler.low_memory
+        }
+
+    def _start_worker(self, worker_id: int, start_method: str = None):
+        """Starts (or restarts) a worker process."""
+
+        global _inherited_handler
+
+        # Each worker gets its own task and result pipes, so a worker that dies mid-write cannot corrupt or lock the others
+        start_method = start_method or self.start_method
+        task_recv, task_send = mp.Pipe(duplex=False)
+        result_recv, result_send = mp.Pipe(duplex=False)
+        handler_kwargs = None if start_method == 'fork' else self._handler_kwargs()
+
+        _inherited_handler = self.handler
+        try:
+            proc = mp.get_context(start_method).Process(
+                target=_worker_main,
+                args=(worker_id, task_recv, result_send, self.threads_per_worker, handler_kwargs),
+                name=f'InferencePoolWorker-{worker_id}',
+                daemon=True
+            )
+            proc.start()
+        finally:
+            _inherited_handler = None
+            task_recv.close()
+            result_send.close()
+
+        for conn in (self._tasks[worker_id], self._results[worker_id]):
+            if conn is not None:
+                conn.close()
+
+        self._procs[worker_id] = proc
+        self._tasks[worker_id] = task_send
+        self._results[worker_id] = result_recv
+
+    def _send(self, worker_id: int, task: tuple):
+        """Sends a task to a worker, leaving it pending for re-dispatch if the worker has died (the lock must be held)."""
+
+        try:
+            self._tasks[worker_id].send(task)
+        except OSError:
+            logger.warning(f'Unable to send a task to inference worker {worker_id}, it will be re-dispatched on restart.')
+
+    def _submit(self, kind: str, payload, worker_id: int = None, retries: int = 1) -> Future:
+        """Sends a task to a worker (the least loaded one by default) and returns a future for its result."""
+
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('The inference pool has been closed.')
+
+            if worker_id is None:
+                load = [0] * self.workers
+                for _, assigned, _, _, _ in self._pending.values():
+                    load[assigned] += 1
+                worker_id = load.index(min(load))
+
+            task_id = next(self._task_ids)
+            self._pending[task_id] = (future, worker_id, kind, payload, retries)
+            self._send(worker_id, (task_id, kind, payload))
+
+        return future
+
+    def _collect(self):
+        """Routes results from the workers to the futures of their tasks."""
+
+        while not self._closed:
+            with self._lock:
+                conns = [conn for conn in self._results if conn is not None and not conn.closed]
+
+            try:
+                ready = wait(conns, timeout=0.5)
+            except (OSError, ValueError):
+                # The monitor closed a dead worker's pipe after the snapshot was taken, so take a new one
+                time.sleep(0.05)
+                continue
+
+            for conn in ready:
+                try:
+                    task_id, ok, payload = conn.recv()
+                except (EOFError, OSError, ValueError):
+                    # The worker has exited, the monitor restarts it and replaces its pipes
+                    time.sleep(0.05)
+                    continue
+
+                with self._lock:
+                    entry = self._pending.pop(task_id, None)
+
+                if entry is not None:
+                    if ok:
+                        entry[0].set_result(payload)
+                    else:
+                        entry[0].set_exception(RuntimeError(f'Inference worker {entry[1]} failed: {payload}'))
+
+    def _watch(self):
+        """Restarts workers that have died, re-dispatching (or failing) their in-flight tasks."""
+
+        while not self._closed:
+            time.sleep(self.health_interval)
+            for worker_id, proc in enumerate(self._procs):
+                if self._closed or proc.is_alive():
+                    continue
+
+                logger.warning(f'Inference worker {worker_id} (pid {proc.pid}) exited with code {proc.exitcode}, restarting.')
+                with self._lock:
+                    self._restarts[worker_id] += 1
+                    try:
+                        self._start_worker(worker_id, 'spawn')
+                        restarted = True
+                    except Exception as e:
+                        logger.error(f'Unable to restart inference worker {worker_id}: {e}')
+                        restarted = False
+
+                    orphaned = [(task_id, entry) for task_id, entry in self._pending.items() if entry[1] == worker_id]
+                    for task_id, (future, _, kind, payload, retries) in orphaned:
+                        if restarted and retries > 0:
+                            self._pending[task_id] = (future, worker_id, kind, payload, retries - 1)
+                            self._send(worker_id, (task_id, kind, payload))
+                        else:
+                            del self._pending[task_id]
+                            future.set_exception(RuntimeError(f'Inference worker {worker_id} crashed while processing the request.'))
+
+    def infer(self, sentences: list[str], batch_size: int, force_multilabel: bool = False) -> list[tuple]:
+        """Shards sentences across the workers and runs InferenceHandler._infer on each shard.
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The sentences to be classified.
+        batch_size : int
+            The maximum number of sentences per forward pass.
+        force_multilabel : bool, optional
+            Whether to run the multilabel regression model over every sentence (default is False).
+
+        Returns
+        -------
+        list[tuple[int, list[float] | None]]
+            The prediction class and category scores of each sentence, in order.
+        """
+
+        if len(sentences) == 0:
+            return []
+
+        num_shards = min(self.workers, math.ceil(len(sentences) / max(batch_size, 1)))
+        shard_size = math.ceil(len(sentences) / num_shards)
+        futures = [
+            self._submit('infer', (sentences[start:start + shard_size], batch_size, force_multilabel))
+            for start in range(0, len(sentences), shard_size)
+        ]
+
+        outcomes = []
+        for future in futures:
+            outcomes += future.result()
+        return outcomes
+
+    def health(self, timeout: float = 5.0) -> list[dict]:
+        """Pings every worker and reports its status.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The maximum time, in seconds, to wait for each worker's reply (default is 5.0).
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            For each worker, its pid, whether it is alive and responsive, its ping latency (ms) and its restart count.
+        """
+
+        pings = []
+        for worker_id in range(self.workers):
+            pings.append((worker_id, time.perf_counter(), self._submit('ping', None, worker_id=worker_id, retries=0)))
+
+        report = []
+        for worker_id, start, future in pings:
+            proc = self._procs[worker_id]
+            entry = {'worker': worker_id, 'pid': proc.pid, 'alive': proc.is_alive(), 'restarts': self._restarts[worker_id]}
+            try:
+                future.result(timeout)
+                entry['responsive'] = True
+                entry['ping_ms'] = (time.perf_counter() - start) * 1000.0
+            except (FutureTimeout, RuntimeError):
+                entry['responsive'] = False
+                entry['ping_ms'] = None
+            report.append(entry)
+
+        return report
+
+    def close(self):
+        """Stops every worker and fails any outstanding tasks."""
+
+        with self._lock:
+            self._closed = True
+            for worker_id in range(self.workers):
+                self._send(worker_id, None)
+            pending = list(self._pending.values())
+            self._pending.clear()
+
+        for proc in self._procs:
+            proc.join(timeout=5.0)
+            if proc.is_alive():
+                proc.terminate()
+
+        self._collector.join()
+        for conn in self._tasks + self._results:
+            conn.close()
+
+        for future, *_ in pending:
+            if not future.done():
+                future.set_exception(RuntimeError('The inference pool has been closed.'))
@@ -2,44 +2,226 @@
 Script file used for performing inference with an existing model.
 """
 
+import json
+import time
 import torch
-import nltk
-from nltk.tokenize import sent_tokenize
+import threading
+import numpy as np
 
-from transformers import (
-    AutoTokenizer,
-    AutoModelForSequenceClassification
-)
+from loguru import logger
 
 from scripts.config import (
     BIN_REPO,
-    ML_REPO
+    ML_REPO,
+    BIN_REVISION,
+    ML_REVISION,
+    MAX_BATCH_SIZE,
+    STREAM_CHUNK_SIZE,
+    SEGMENTER,
+    LOW_MEMORY,
+    CACHE_ENABLED,
+    CACHE_MEMORY_ENTRIES,
+    CACHE_DISK_PATH,
+    CACHE_DISK_ENTRIES,
+    INFERENCE_BACKEND,
+    METRICS_ENABLED,
+    METRICS_ATTACH,
+    OFFLINE_ENABLED,
+    PREFILTER_ENABLED,
+    PREFILTER_PATH,
+    PREFILTER_THRESHOLD,
+    DEDUP_ENABLED,
+    STUDENT_ENABLED,
+    STUDENT_PATH
 )
+from scripts import metrics
+from scripts.cache import ResultCache
+from scripts.backends import create_backend, snapshot_dir_for
+from scripts.snapshots import resolve_local_model
+from scripts.segmenters import create_segmenter
+from scripts.distill import BINARY_OUTPUTS, read_student_manifest
+from scripts.memory import bf16_supported, dedupe_tensors, release_unused, memory_breakdown
+from scripts.results import BIN_LABELS, CATEGORIES, SentenceResults
+
+BIN_LABEL_MAP = dict(enumerate(BIN_LABELS))
 
 class InferenceHandler:
     """A class that handles performing inference using the trained binary classification and multilabel regression models."""
 
-    def __init__(self, api_token: str):
+    def __init__(
+        self, 
+        api_token: str, 
+        max_batch_size: int = MAX_BATCH_SIZE,
+        bin_repo: str = BIN_REPO,
+        ml_repo: str = ML_REPO,
+        bin_revision: str = BIN_REVISION,
+        ml_revision: str = ML_REVISION,
+        use_cache: bool = CACHE_ENABLED,
+        backend: str = INFERENCE_BACKEND,
+        collect_metrics: bool = METRICS_ENABLED,
+        offline: bool = OFFLINE_ENABLED,
+        prefilter: bool = PREFILTER_ENABLED,
+        dedup: bool = DEDUP_ENABLED,
+        student: bool = STUDENT_ENABLED,
+        segmenter: str = SEGMENTER,
+        low_memory: bool = LOW_MEMORY
+    ):
         """Constructor for instantiating an InferenceHandler object.
 
         Parameters
         ----------
         api_token : str
             A Hugging Face token with read/write access privileges to allow exporting the trained models (default is None).
+        max_batch_size : int, optional
+            The maximum number of sentences passed through a model in a single forward pass (default is the configured max_batch_size).
+        bin_repo : str, optional
+            The repository id (or local path) of the binary classification model (default is the configured bin_repo).
+        ml_repo : str, optional
+            The repository id (or local path) of the multilabel regression model (default is the configured ml_repo).
+        bin_revision : str, optional
+            The branch, tag or commit of the binary classification model to load (default is the configured bin_revision, or the latest).
+        ml_revision : str, optional
+            The branch, tag or commit of the multilabel regression model to load (default is the configured ml_revision, or the latest).
+        use_cache : bool, optional
+            Whether to cache sentence-level results in memory and on disk (default is the configured cache enabled setting).
+        backend : str, optional
+            The backend used to execute the models, one of 'eager', 'torchscript' or 'onnx' (default is the configured backend).
+        collect_metrics : bool, optional
+            Whether to record per-stage metrics of every request in the process-wide metrics registry (default is the configured metrics enabled setting).
+        offline : bool, optional
+            Whether to load the models from the pinned local snapshot and any punkt data from the vendored directory, never
+            contacting the Hub (default is the configured offline setting).
+        prefilter : bool, optional
+            Whether to clear confidently benign sentences with the trained n-gram prefilter before the binary classifier
+            (default is the configured prefilter enabled setting).
+        dedup : bool, optional
+            Whether to group near-duplicate sentences and only score one sentence per group, fanning its result out to the
+            others (default is the configured dedup enabled setting).
+        student : bool, optional
+            Whether to load the distilled two-head student model in place of the binary and multilabel models, producing both
+            outputs with a single forward pass (default is the configured student enabled setting).
+        segmenter : str, optional
+            The sentence segmenter used to split input texts, one of 'punkt', 'regex' or 'offsets' (default is the configured segmenter).
+        low_memory : bool, optional
+            Whether to keep the weights in bf16 (where the CPU supports it and the backend is not 'onnx'), store tensors that are
+            identical between the two models once and share an equivalent tokenizer (default is the configured low_memory setting).
         """
 
         self.api_token = api_token
-        self.bin_tokenizer, self.bin_model = self._init_model_and_tokenizer(BIN_REPO)
-        self.ml_regr_tokenizer, self.ml_regr_model = self._init_model_and_tokenizer(ML_REPO)
-        nltk.download('punkt_tab')
-
-    def _init_model_and_tokenizer(self, repo_id: str):
+        self.collect_metrics = collect_metrics
+        self.offline = offline
+        self.max_batch_size = max_batch_size
+        self.bin_repo = bin_repo
+        self.ml_repo = ml_repo
+        self.load_times = {}
+
+        self.low_memory = low_memory
+        self.dtype = torch.float32
+        if low_memory:
+            if backend == 'onnx':
+                logger.warning('The onnx backend runs the fp32 export of the models, so their weights are kept in fp32.')
+            elif not bf16_supported():
+                logger.warning('bf16 is not supported on this CPU, so the weights are kept in fp32.')
+            else:
+                self.dtype = torch.bfloat16
+
+        # The student is a single local model serving as both the binary and the multilabel model
+        self.student = read_student_manifest(STUDENT_PATH) if student else None
+        if self.student is not None:
+            bin_repo = ml_repo = str(STUDENT_PATH)
+            bin_revision = ml_revision = self.student['id']
+            self.bin_repo = self.ml_repo = bin_repo
+
+        # In offline mode the models are loaded from their local snapshot, while the repository ids still key the result cache
+        bin_source, ml_source = bin_repo, ml_repo
+        if offline and self.student is None:
+            bin_source, bin_revision = resolve_local_model('binary', bin_repo, bin_revision)
+            ml_source, ml_revision = resolve_local_model('multilabel', ml_repo, ml_revision)
+
+        start = time.perf_counter()
+        self.bin_tokenizer, self.bin_model = self._init_model_and_tokenizer(str(bin_source), None if offline or self.student is not None else bin_revision)
+        self.load_times['bin_model'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if self.student is not None:
+            self.ml_regr_tokenizer, self.ml_regr_model = self.bin_tokenizer, self.bin_model
+        else:
+            self.ml_regr_tokenizer, self.ml_regr_model = self._init_model_and_tokenizer(str(ml_source), None if offline else ml_revision)
+        self.load_times['ml_model'] = time.perf_counter() - start
+
+        self.deduplicated = {'tensors': 0, 'bytes': 0}
+        if low_memory:
+            if self.student is None:
+                self.deduplicated = dedupe_tensors(self.bin_model, self.ml_regr_model)
+                logger.info(f"Shared {self.deduplicated['tensors']} identical tensors between the models ({self.deduplicated['bytes'] / 2**20:.1f} MiB).")
+            release_unused(self.bin_model)
+            release_unused(self.ml_regr_model)
+
+        self.backend = backend
+        self.bin_snapshot_dir = None if backend == 'eager' else snapshot_dir_for(str(bin_source), bin_revision, api_token)
+        self.ml_snapshot_dir = None if backend == 'eager' else snapshot_dir_for(str(ml_source), ml_revision, api_token)
+
+        start = time.perf_counter()
+        self.bin_backend = create_backend(backend, self.bin_model, self.bin_snapshot_dir)
+        self.ml_backend = self.bin_backend if self.student is not None else create_backend(backend, self.ml_regr_model, self.ml_snapshot_dir)
+        self.load_times['backend'] = time.perf_counter() - start
+        logger.info(f"Using the {backend} inference backend (prepared in {self.load_times['backend']:.2f}s).")
+
+        self.shared_tokenizer = self._tokenizers_equivalent(self.bin_tokenizer, self.ml_regr_tokenizer)
+        self.tokenization_mode = 'shared' if self.shared_tokenizer else 'separate'
+        if low_memory and self.shared_tokenizer:
+            self.ml_regr_tokenizer = self.bin_tokenizer
+        logger.info(f'Tokenization mode: {self.tokenization_mode}.')
+
+        self.bin_revision = getattr(self.bin_model.config, '_commit_hash', None) or bin_revision
+        self.ml_revision = getattr(self.ml_regr_model.config, '_commit_hash', None) or ml_revision
+        # Results differ slightly between backends and weight dtypes, so both are part of the key (and of the cache entries)
+        dtype = str(self.dtype).removeprefix('torch.')
+        self.model_key = f'{bin_repo}@{self.bin_revision}|{ml_repo}@{self.ml_revision}|{backend}|{dtype}'
+
+        self.prefilter = self._init_prefilter() if prefilter else None
+        self.prefilter_counts = {'sentences': 0, 'skipped': 0}
+        self._prefilter_lock = threading.Lock()
+
+        # Near-duplicates receive their representative's result, so they are grouped before (and never stored in) the cache
+        self.dedup = None
+        if dedup:
+            from scripts.dedup import NearDuplicateDetector
+            self.dedup = NearDuplicateDetector()
+            logger.info(f'Near-duplicate detection enabled (threshold {self.dedup.threshold}, {self.dedup.bands} bands of {self.dedup.rows} rows).')
+
+        self.pool = None
+        self.cache = None
+        if use_cache:
+            # Results cleared by the prefilter depend on its weights and threshold, so they are part of the cache key
+            prefilter_key = f'|prefilter@{self.prefilter.digest}' if self.prefilter is not None else ''
+            self.cache = ResultCache(
+                f'{self.model_key}{prefilter_key}',
+                memory_entries=CACHE_MEMORY_ENTRIES,
+                disk_path=CACHE_DISK_PATH,
+                disk_entries=CACHE_DISK_ENTRIES
+            )
+
+        # Only the punkt segmenter loads data (the offsets segmenter splits with the binary model's tokenizer)
+        start = time.perf_counter()
+        self.segmenter = create_segmenter(segmenter, self.bin_tokenizer, offline)
+        self.load_times['segmenter'] = time.perf_counter() - start
+        logger.info(f'Sentence segmenter: {self.segmenter.name}.')
+
+        logger.info(
+            f"Loaded binary model '{bin_repo}' in {self.load_times['bin_model']:.2f}s and "
+            f"multilabel model '{ml_repo}' in {self.load_times['ml_model']:.2f}s."
+        )
+
+    def _init_model_and_tokenizer(self, repo_id: str, revision: str = None):
         """Initializes a model and tokenizer for use in inference using the models path.
 
         Parameters
         ----------
         repo_id : str
             The repository id (i.e., <owner username>/<repository name>).
+        revision : str, optional
+            The branch, tag or commit to load (default is None, which loads the latest).
 
         Returns
         -------
@@ -47,11 +229,159 @@ class InferenceHandler:
             A tuple containing the tokenizer and model objects.
         """
 
-        tokenizer = AutoTokenizer.from_pretrained(repo_id, token=self.api_token)
-        model = AutoModelForSequenceClassification.from_pretrained(repo_id, token=self.api_token)
+        # Deferred, since importing the transformers model classes accounts for several seconds of startup
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        # Offline, only local files are read and the weights must be safetensors, which are memory-mapped rather than unpickled
+        local_kwargs = {'local_files_only': True, 'use_safetensors': True} if self.offline else {}
+        tokenizer = AutoTokenizer.from_pretrained(repo_id, token=self.api_token, revision=revision, **local_kwargs)
+        dtype_kwargs = {'torch_dtype': self.dtype} if self.dtype != torch.float32 else {}
+        model = AutoModelForSequenceClassification.from_pretrained(repo_id, token=self.api_token, revision=revision, **local_kwargs, **dtype_kwargs)
         model.eval()
         return tokenizer, model
 
+    def _init_prefilter(self):
+        """Loads the trained prefilter, returning None (with a warning) if it has not been trained yet.
+
+        Returns
+        -------
+        HashedNgramPrefilter | None
+            The prefilter, configured with the configured threshold.
+        """
+
+        from scripts.prefilter import HashedNgramPrefilter
+
+        if not PREFILTER_PATH.exists():
+            logger.warning(f'No prefilter found at {PREFILTER_PATH} (run `python -m scripts.config train-prefilter`), it is disabled.')
+            return None
+
+        prefilter = HashedNgramPrefilter.load(PREFILTER_PATH, PREFILTER_THRESHOLD)
+        logger.info(f'Loaded the prefilter cascade stage (threshold {prefilter.threshold}).')
+        return prefilter
+
+    def prefilter_stats(self) -> dict:
+        """Returns the number of sentences seen and skipped by the prefilter since the handler was loaded.
+
+        Returns
+        -------
+        dict[str, Any]
+            Whether the prefilter is enabled, its threshold, the sentence and skipped counts, and the skip rate.
+        """
+
+        with self._prefilter_lock:
+            stats = dict(self.prefilter_counts)
+
+        stats['enabled'] = self.prefilter is not None
+        stats['threshold'] = self.prefilter.threshold if self.prefilter is not None else None
+        stats['skip_rate'] = stats['skipped'] / stats['sentences'] if stats['sentences'] > 0 else 0.0
+        return stats
+
+    def memory_breakdown(self) -> dict:
+        """Returns the bytes held by each component of the binary and multilabel models, counting shared tensors once.
+
+        Returns
+        -------
+        dict[str, Any]
+            The breakdown of each model (see scripts.memory.memory_breakdown), the total, whether low-memory mode is on, the
+            tensors deduplicated between the models and whether they share a tokenizer object.
+        """
+
+        breakdown = memory_breakdown({'bin_model': self.bin_model, 'ml_model': self.ml_regr_model})
+        breakdown['low_memory'] = self.low_memory
+        breakdown['deduplicated'] = dict(self.deduplicated)
+        breakdown['tokenizer_shared'] = self.ml_regr_tokenizer is self.bin_tokenizer
+        return breakdown
+
+    @staticmethod
+    def _tokenizer_signature(tokenizer) -> dict:
+        """Builds a comparable description of everything that affects how a tokenizer encodes text.
+
+        Parameters
+        ----------
+        tokenizer : PreTrainedTokenizer | PreTrainedTokenizerFast
+            The tokenizer to describe.
+
+        Returns
+        -------
+        dict[str, Any]
+            The tokenizer class, vocabulary, special tokens and normalization/pre-tokenization settings.
+        """
+
+        signature = {
+            'class': type(tokenizer).__name__,
+            'vocab': tokenizer.get_vocab(),
+            'special_tokens': tokenizer.special_tokens_map,
+            'special_ids': tokenizer.all_special_ids,
+            'model_max_length': tokenizer.model_max_length,
+            'padding_side': tokenizer.padding_side,
+            'truncation_side': tokenizer.truncation_side
+        }
+
+        if tokenizer.is_fast:
+            backend = json.loads(tokenizer.backend_tokenizer.to_str())
+            for key in ('normalizer', 'pre_tokenizer', 'post_processor', 'added_tokens'):
+                signature[key] = backend.get(key)
+        else:
+            for key in ('do_lower_case', 'strip_accents', 'tokenize_chinese_chars', 'do_basic_tokenize'):
+                signature[key] = getattr(tokenizer, key, tokenizer.init_kwargs.get(key))
+
+        return signature
+
+    @classmethod
+    def _tokenizers_equivalent(cls, tokenizer_a, tokenizer_b) -> bool:
+        """Determines whether two tokenizers produce identical encodings, allowing them to share a single encoding pass.
+
+        Parameters
+        ----------
+        tokenizer_a : PreTrainedTokenizer | PreTrainedTokenizerFast
+            The first tokenizer.
+        tokenizer_b : PreTrainedTokenizer | PreTrainedTokenizerFast
+            The second tokenizer.
+
+        Returns
+        -------
+        bool
+            True if the tokenizers have the same vocabulary, special tokens and normalization, otherwise False.
+        """
+
+        try:
+            return cls._tokenizer_signature(tokenizer_a) == cls._tokenizer_signature(tokenizer_b)
+        except Exception as e:
+            logger.warning(f'Unable to compare tokenizers, falling back to separate encoding: {e}')
+            return False
+
+    def attach_pool(self, pool):
+        """Attaches a multi-process inference pool, after which the forward passes are dispatched to the pool's workers.
+
+        Parameters
+        ----------
+        pool : InferencePool | None
+            The pool to dispatch to, or None to run the forward passes in this process again.
+        """
+
+        self.pool = pool
+
+    def warmup(self, text: str = 'This is a warm-up sentence.'):
+        """Performs a forward pass through both models so that the first real request does not pay for lazy initialization.
+
+        Parameters
+        ----------
+        text : str, optional
+            The text used for the warm-up pass (default is a short placeholder sentence).
+
+        Returns
+        -------
+        float
+            The time, in seconds, the warm-up pass took.
+        """
+
+        start = time.perf_counter()
+        self.classify_sentences([text], 1, force_multilabel=True)
+        self.load_times['warmup'] = time.perf_counter() - start
+
+        logger.info(f"Warm-up forward pass completed in {self.load_times['warmup']:.2f}s.")
+        return self.load_times['warmup']
+
     def _encode_binary(self, text: str):
         """Preprocesses and tokenizes the input text for binary classification.
 
@@ -101,10 +431,10 @@ class InferenceHandler:
         """
 
         bin_inputs = self._encode_binary(text)
-        ml_inputs = self._encode_multilabel(text)
+        ml_inputs = bin_inputs if self.shared_tokenizer else self._encode_multilabel(text)
         return bin_inputs, ml_inputs
     
-    def classify_text(self, input: str):
+    def classify_text(self, input: str, max_batch_size: int = None, with_metrics: bool = None):
         """Performs inference on the input text to determine the binary classification and the multilabel regression for the categories.
 
         Determines whether the text is discriminatory. If it is discriminatory, it will then perform regression on the input text to determine the
@@ -114,6 +444,10 @@ class InferenceHandler:
         ----------
         input : str
             The input text to be classified.
+        max_batch_size : int, optional
+            Overrides the maximum number of sentences per forward pass for this call (default is None).
+        with_metrics : bool, optional
+            Whether to attach the per-stage metrics of the request to the result under 'metrics' (default is None, which uses the configured attach_to_results setting).
 
         Returns
         -------
@@ -121,45 +455,392 @@ class InferenceHandler:
             The resulting classification and regression values for each category.
         """
 
+        with_metrics = METRICS_ATTACH if with_metrics is None else with_metrics
         result = {
             'text_input': input,
             'results': []
         }
 
-        sent_res_arr = []
-        sentences = sent_tokenize(input)
-        for sent in sentences:
-            text_prediction, pred_class = self.discriminatory_inference(sent)
-
-            sent_result = {
-                'sentence': sent,
-                'binary_classification': {
-                    'classification': text_prediction,
-                    'prediction_class': pred_class
-                },
-                'multilabel_regression': None
-            }
-
-            if pred_class == 1:
-                ml_results = {
-                    "Gender": None,
-                    "Race": None,
-                    "Sexuality": None,
-                    "Disability": None,
-                    "Religion": None,
-                    "Unspecified": None
-                }
-
-                ml_infer_results = self.category_inference(sent)
-                for idx, key in enumerate(ml_results.keys()):
-                    ml_results[key] = min(max(ml_infer_results[idx], 0.0), 1.0)
-
-                sent_result['multilabel_regression'] = ml_results
-            sent_res_arr.append(sent_result)
-
-        result['results'] = sent_res_arr
+        with metrics.track(self.collect_metrics or with_metrics) as request_metrics:
+            with metrics.stage('sentence_split'):
+                sentences = self.segmenter.split(input)
+            result['results'] = self.classify_sentences(sentences, max_batch_size)
+
+        if with_metrics and request_metrics is not None:
+            result['metrics'] = request_metrics.as_dict()
         return result
-    
+
+    def classify_text_stream(self, input: str, chunk_size: int = None, max_batch_size: int = None, with_metrics: bool = None):
+        """Performs inference on the input text, yielding the per-sentence results in order as soon as each chunk of sentences is classified.
+
+        Concatenating the yielded chunks gives the 'results' entry of classify_text. The complete result, in the same structure
+        as the one returned by classify_text, is the generator's return value (i.e. the value of the StopIteration it raises).
+
+        Parameters
+        ----------
+        input : str
+            The input text to be classified.
+        chunk_size : int, optional
+            The number of sentences classified and yielded at a time (default is the configured stream_chunk_size).
+        max_batch_size : int, optional
+            Overrides the maximum number of sentences per forward pass for this call (default is None).
+        with_metrics : bool, optional
+            Whether to attach the per-stage metrics of the request to the result under 'metrics' (default is None, which uses the configured attach_to_results setting).
+
+        Yields
+        ------
+        list[dict[str, Any]]
+            The results of the next chunk of sentences, in the same format as classify_sentences.
+
+        Returns
+        -------
+        dict[str, Any]
+            The resulting classification and regression values for each category.
+        """
+
+        chunk_size = max(1, chunk_size if chunk_size is not None else STREAM_CHUNK_SIZE)
+        with_metrics = METRICS_ATTACH if with_metrics is None else with_metrics
+        request_metrics = metrics.RequestMetrics() if self.collect_metrics or with_metrics else None
+        result = {
+            'text_input': input,
+            'results': []
+        }
+
+        with metrics.resume(request_metrics), metrics.stage('sentence_split'):
+            sentences = self.segmenter.split(input)
+
+        for start in range(0, len(sentences), chunk_size):
+            with metrics.resume(request_metrics):
+                chunk = self.classify_sentences(sentences[start:start + chunk_size], max_batch_size)
+                if start == 0 and request_metrics is not None:
+                    request_metrics.add_time('first_chunk', time.perf_counter() - request_metrics.started_at)
+            result['results'].extend(chunk)
+            yield chunk
+
+        if request_metrics is not None:
+            metrics.REGISTRY.record(request_metrics)
+            if with_metrics:
+                result['metrics'] = request_metrics.as_dict()
+        return result
+
+    def classify_sentences(self, sentences: list[str], max_batch_size: int = None, force_multilabel: bool = False):
+        """Performs batched inference on a list of sentences.
+
+        All sentences are passed through the binary classifier in padded batches, after which only the sentences classified as
+        discriminatory are passed through the multilabel regression model. When both models share an equivalent tokenizer the
+        sentences are encoded once and the same encodings are fed to both models.
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The sentences to be classified.
+        max_batch_size : int, optional
+            Overrides the maximum number of sentences per forward pass for this call (default is None).
+        force_multilabel : bool, optional
+            Whether to run the multilabel regression model over every sentence regardless of its binary classification (default is False).
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            The per-sentence results, in the same order and format as the 'results' entry returned by classify_text.
+        """
+
+        return self.classify_sentences_compact(sentences, max_batch_size, force_multilabel).to_dicts()
+
+    def classify_sentences_compact(self, sentences: list[str], max_batch_size: int = None, force_multilabel: bool = False) -> SentenceResults:
+        """Performs batched inference on a list of sentences (see classify_sentences), returning the results in columnar form.
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The sentences to be classified.
+        max_batch_size : int, optional
+            Overrides the maximum number of sentences per forward pass for this call (default is None).
+        force_multilabel : bool, optional
+            Whether to run the multilabel regression model over every sentence regardless of its binary classification (default is False).
+
+        Returns
+        -------
+        SentenceResults
+            The prediction class and category scores of each sentence, in order.
+        """
+
+        batch_size = max_batch_size if max_batch_size is not None else self.max_batch_size
+        if len(sentences) == 0:
+            return SentenceResults.concat([])
+
+        with metrics.track(self.collect_metrics):
+            if self.dedup is not None and not force_multilabel:
+                outcomes = self._deduplicated_infer(sentences, batch_size)
+            else:
+                outcomes = self._cached_infer(sentences, batch_size, force_multilabel)
+        return SentenceResults.from_outcomes(sentences, outcomes)
+
+    def _deduplicated_infer(self, sentences: list[str], batch_size: int):
+        """Groups near-duplicate sentences, running _cached_infer over one representative per group.
+
+        In audit mode, a sample of the duplicates that are not exact copies of their representative is scored as well (without
+        the cache) and compared with the result fanned out to them (which is still the result returned, so that the output does
+        not depend on the sample).
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The sentences to be classified.
+        batch_size : int
+            The maximum number of sentences per forward pass.
+
+        Returns
+        -------
+        list[tuple[int, list[float] | None]]
+            The prediction class and category scores of each sentence (those of its representative for duplicates), in order.
+        """
+
+        with metrics.stage('dedup'):
+            reps = self.dedup.group(sentences)
+        unique = np.flatnonzero(reps == np.arange(len(sentences))).tolist()
+
+        num_skipped = len(sentences) - len(unique)
+        self.dedup.record(sentences, reps)
+        metrics.count('sentences', num_skipped)
+        metrics.count('dedup_skipped', num_skipped)
+        if self.collect_metrics:
+            metrics.REGISTRY.inc('dedup_sentences_total', len(sentences))
+            metrics.REGISTRY.inc('dedup_skipped_total', num_skipped)
+
+        rep_outcomes = dict(zip(unique, self._cached_infer([sentences[idx] for idx in unique], batch_size)))
+        outcomes = [rep_outcomes[rep] for rep in reps.tolist()]
+
+        # The audit sample bypasses the cache, which could hold the representative's result for a near-identical sentence
+        audited = self.dedup.audit_sample(sentences, reps)
+        if len(audited) > 0:
+            with metrics.stage('dedup_audit'):
+                scored = self._infer([sentences[idx] for idx in audited], batch_size)
+            self.dedup.record_audit([outcomes[idx] for idx in audited], scored)
+
+        return outcomes
+
+    def score_texts(self, texts: list[str], max_batch_size: int = None):
+        """Scores whole texts (without splitting them into sentences) with both models in padded batches.
+
+        Unlike classify_sentences, the multilabel regression model is run over every text and the binary model's probability is
+        returned rather than its prediction class. The prefilter, cache and pool are not used. With the student model, both outputs
+        come from a single forward pass.
+
+        Parameters
+        ----------
+        texts : list[str]
+            The texts to be scored.
+        max_batch_size : int, optional
+            Overrides the maximum number of texts per forward pass for this call (default is None).
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            The float32 probability that each text is discriminatory, with shape (len(texts),), and the float32 clamped category
+            scores, with shape (len(texts), len(CATEGORIES)).
+        """
+
+        if len(texts) == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros((0, len(CATEGORIES)), dtype=np.float32)
+
+        batch_size = max_batch_size if max_batch_size is not None else self.max_batch_size
+        with metrics.track(self.collect_metrics):
+            metrics.count('sentences', len(texts))
+            with metrics.stage('tokenize'):
+                bin_encodings = self._encode_batch(self.bin_tokenizer, texts)
+            with metrics.stage('student_forward' if self.student is not None else 'binary_forward'):
+                bin_logits = self._batched_logits(self.bin_tokenizer, self.bin_backend, bin_encodings, range(len(texts)), batch_size)
+
+            if self.student is not None:
+                bin_logits, ml_logits = bin_logits[:, :BINARY_OUTPUTS], bin_logits[:, BINARY_OUTPUTS:]
+            else:
+                if self.shared_tokenizer:
+                    ml_tokenizer, ml_encodings = self.bin_tokenizer, bin_encodings
+                else:
+                    with metrics.stage('tokenize'):
+                        ml_tokenizer, ml_encodings = self.ml_regr_tokenizer, self._encode_batch(self.ml_regr_tokenizer, texts)
+                with metrics.stage('multilabel_forward'):
+                    ml_logits = self._batched_logits(ml_tokenizer, self.ml_backend, ml_encodings, range(len(texts)), batch_size)
+
+        probs = torch.nn.functional.softmax(bin_logits.float(), dim=-1)[:, 1]
+        return probs.numpy().astype(np.float32), ml_logits.float().clamp(0.0, 1.0).numpy().astype(np.float32)
+
+    def _cached_infer(self, sentences: list[str], batch_size: int, force_multilabel: bool = False):
+        """Looks sentences up in the result cache, running _infer over the unique sentences that are not cached.
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The sentences to be classified.
+        batch_size : int
+            The maximum number of sentences per forward pass.
+        force_multilabel : bool, optional
+            Whether to bypass the cache and run the multilabel regression model over every sentence (default is False).
+
+        Returns
+        -------
+        list[tuple[int, list[float] | None]]
+            The prediction class and category scores of each sentence, in order.
+        """
+
+        metrics.count('sentences', len(sentences))
+        if self.cache is None or force_multilabel:
+            return self._infer(sentences, batch_size, force_multilabel)
+
+        with metrics.stage('cache_lookup'):
+            keys = [self.cache.key(sent) for sent in sentences]
+            outcomes = self.cache.get_many(keys)
+
+        misses = {}
+        for key, sent in zip(keys, sentences):
+            if key not in outcomes:
+                misses.setdefault(key, sent)
+        metrics.count('cache_misses', len(misses))
+
+        if len(misses) > 0:
+            computed = dict(zip(misses.keys(), self._infer(list(misses.values()), batch_size)))
+            with metrics.stage('cache_store'):
+                self.cache.put_many(computed)
+            outcomes.update(computed)
+
+        return [outcomes[key] for key in keys]
+
+    def _infer(self, sentences: list[str], batch_size: int, force_multilabel: bool = False):
+        """Runs the batched binary and multilabel forward passes over a list of sentences.
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The sentences to be classified.
+        batch_size : int
+            The maximum number of sentences per forward pass.
+        force_multilabel : bool, optional
+            Whether to run the multilabel regression model over every sentence regardless of its binary classification (default is False).
+
+        Returns
+        -------
+        list[tuple[int, list[float] | None]]
+            The prediction class of each sentence and, for discriminatory sentences, the clamped category scores.
+        """
+
+        if self.prefilter is None or force_multilabel:
+            return self._forward(sentences, batch_size, force_multilabel)
+
+        with metrics.stage('prefilter'):
+            cleared = self.prefilter.clears(sentences).tolist()
+
+        num_cleared = sum(cleared)
+        with self._prefilter_lock:
+            self.prefilter_counts['sentences'] += len(sentences)
+            self.prefilter_counts['skipped'] += num_cleared
+        metrics.count('prefilter_skipped', num_cleared)
+        if self.collect_metrics:
+            metrics.REGISTRY.inc('prefilter_sentences_total', len(sentences))
+            metrics.REGISTRY.inc('prefilter_skipped_total', num_cleared)
+
+        remaining = [sent for sent, skip in zip(sentences, cleared) if not skip]
+        outcomes = iter(self._forward(remaining, batch_size) if len(remaining) > 0 else [])
+        return [(0, None) if skip else next(outcomes) for skip in cleared]
+
+    def _forward(self, sentences: list[str], batch_size: int, force_multilabel: bool = False):
+        """Runs the batched binary and multilabel forward passes, in this process or on the attached pool (see _infer)."""
+
+        if self.pool is not None:
+            with metrics.stage('pool_infer'):
+                return self.pool.infer(sentences, batch_size, force_multilabel)
+
+        with metrics.stage('tokenize'):
+            bin_encodings = self._encode_batch(self.bin_tokenizer, sentences)
+
+        # The student's binary and category heads share one pass, so its category scores are kept for the flagged sentences
+        if self.student is not None:
+            with metrics.stage('student_forward'):
+                logits = self._batched_logits(self.bin_tokenizer, self.bin_backend, bin_encodings, range(len(sentences)), batch_size)
+            pred_classes = torch.argmax(logits[:, :BINARY_OUTPUTS], dim=-1).tolist()
+            ml_scores = logits[:, BINARY_OUTPUTS:].clamp(0.0, 1.0).tolist()
+            return [(pred_class, ml_scores[idx] if pred_class == 1 else None) for idx, pred_class in enumerate(pred_classes)]
+
+        with metrics.stage('binary_forward'):
+            bin_logits = self._batched_logits(self.bin_tokenizer, self.bin_backend, bin_encodings, range(len(sentences)), batch_size)
+        pred_classes = torch.argmax(torch.nn.functional.softmax(bin_logits, dim=-1), dim=-1).tolist()
+
+        flagged = [idx for idx, pred_class in enumerate(pred_classes) if pred_class == 1 or force_multilabel]
+        ml_scores = {}
+        if len(flagged) > 0:
+            if self.shared_tokenizer:
+                with metrics.stage('multilabel_forward'):
+                    ml_logits = self._batched_logits(self.bin_tokenizer, self.ml_backend, bin_encodings, flagged, batch_size)
+            else:
+                with metrics.stage('tokenize'):
+                    ml_encodings = self._encode_batch(self.ml_regr_tokenizer, [sentences[idx] for idx in flagged])
+                with metrics.stage('multilabel_forward'):
+                    ml_logits = self._batched_logits(self.ml_regr_tokenizer, self.ml_backend, ml_encodings, range(len(flagged)), batch_size)
+            ml_scores = dict(zip(flagged, ml_logits.clamp(0.0, 1.0).tolist()))
+
+        return [(pred_class, ml_scores[idx] if pred_class == 1 else None) for idx, pred_class in enumerate(pred_classes)]
+
+    def _encode_batch(self, tokenizer, texts: list[str]):
+        """Tokenizes a list of texts without padding, so that the encodings can be padded per batch.
+
+        Parameters
+        ----------
+        tokenizer : PreTrainedTokenizer | PreTrainedTokenizerFast
+            The tokenizer to encode the texts with.
+        texts : list[str]
+            The texts to be tokenized.
+
+        Returns
+        -------
+        BatchEncoding
+            The unpadded encodings of each text.
+        """
+
+        return tokenizer(texts, truncation=True, max_length=512)
+
+    def _batched_logits(self, tokenizer, backend, encodings, indices, batch_size: int):
+        """Runs a model backend over a subset of pre-computed encodings in padded batches of at most batch_size items.
+
+        Items are sorted by token length before batching so that each batch is padded to a similar length, and the
+        resulting logits are returned in the order of the given indices.
+
+        Parameters
+        ----------
+        tokenizer : PreTrainedTokenizer | PreTrainedTokenizerFast
+            The tokenizer used to pad the encodings.
+        backend : InferenceBackend
+            The backend of the model to perform inference with.
+        encodings : BatchEncoding
+            The unpadded encodings, as returned by _encode_batch.
+        indices : Iterable[int]
+            The positions within the encodings to perform inference on.
+        batch_size : int
+            The maximum number of items per forward pass.
+
+        Returns
+        -------
+        torch.Tensor
+            The logits for each index, with shape (len(indices), num_labels).
+        """
+
+        indices = list(indices)
+        batch_size = max(batch_size, 1)
+        lengths = [len(encodings['input_ids'][idx]) for idx in indices]
+        order = sorted(range(len(indices)), key=lengths.__getitem__)
+
+        logits = [None] * len(indices)
+        for start in range(0, len(order), batch_size):
+            batch_pos = order[start:start + batch_size]
+            features = [{key: encodings[key][indices[pos]] for key in encodings.keys()} for pos in batch_pos]
+            batch = tokenizer.pad(features, padding=True, return_tensors="pt")
+            batch_logits = backend.logits(batch)
+            metrics.record_batch(len(batch_pos), sum(lengths[pos] for pos in batch_pos), batch['input_ids'].numel())
+
+            for row, pos in enumerate(batch_pos):
+                logits[pos] = batch_logits[row]
+
+        return torch.stack(logits)
+
     def discriminatory_inference(self, text: str):
         """Performs inference on the input text to determine the binary classification.
 
@@ -176,13 +857,13 @@ class InferenceHandler:
 
         bin_inputs = self._encode_binary(text)
 
-        with torch.no_grad():
-            bin_logits = self.bin_model(**bin_inputs).logits
+        bin_logits = self.bin_backend.logits(bin_inputs)
+        if self.student is not None:
+            bin_logits = bin_logits[..., :BINARY_OUTPUTS]
 
         probs = torch.nn.functional.softmax(bin_logits, dim=-1)
         pred_class = torch.argmax(probs).item()
-        bin_label_map = {0: "Non-Discriminatory", 1: "Discriminatory"}
-        bin_text_pred = bin_label_map[pred_class]
+        bin_text_pred = BIN_LABEL_MAP[pred_class]
 
         return bin_text_pred, pred_class
     
@@ -197,18 +878,13 @@ class InferenceHandler:
         Returns
         -------
         list[float]
-            A tuple consisting of the string classification (Discriminatory or Non-Discriminatory) and the numeric prediction class (1 or 0).
+            The regression value of each category, clamped to be non-negative.
         """
 
-        ml_inputs = self._encode_multilabel(text)
-
-        with torch.no_grad():
-            ml_outputs = self.ml_regr_model(**ml_inputs).logits
-        
-        ml_op_list = ml_outputs.squeeze().tolist()
+        ml_inputs = self._encode_binary(text) if self.shared_tokenizer else self._encode_multilabel(text)
 
-        results = []
-        for item in ml_op_list:
-            results.append(max(0.0, item))
+        ml_outputs = self.ml_backend.logits(ml_inputs)
+        if self.student is not None:
+            ml_outputs = ml_outputs[..., BINARY_OUTPUTS:]
 
-        return results
\ No newline at end of file
+        return ml_outputs.squeeze().clamp(min=0.0).tolist()
\ No newline at end of file
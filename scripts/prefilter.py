@@ -0,0 +1,459 @@
+"""
+Script file providing a cheap first-stage prefilter that clears confidently benign sentences before the BERT binary classifier.
+
+The prefilter is a logistic regression over hashed word and character n-grams. It is trained with numpy on the master dataset in
+seconds on a CPU. At inference time, sentences whose predicted probability of being discriminatory is below the configured
+threshold are classified as non-discriminatory without running BERT. Every other sentence continues through the models as
+before. The threshold trades recall for compute, and evaluate_cascade reports both on a held-out split.
+"""
+
+import re
+import zlib
+import hashlib
+import numpy as np
+
+from pathlib import Path
+from loguru import logger
+
+from scripts.config import PREFILTER_THRESHOLD
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+# Thresholds evaluated by default when reporting recall lost versus compute saved
+DEFAULT_THRESHOLDS = [0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5]
+
+class HashedNgramPrefilter:
+    """A logistic regression over hashed word and character n-grams, used to clear confidently benign sentences."""
+
+    def __init__(
+        self,
+        num_features: int = 2 ** 18,
+        word_ngrams: int = 2,
+        char_ngrams: tuple = (3, 5),
+        threshold: float = PREFILTER_THRESHOLD,
+        weights: np.ndarray = None,
+        bias: float = 0.0
+    ):
+        """Constructor for instantiating a HashedNgramPrefilter object.
+
+        Parameters
+        ----------
+        num_features : int, optional
+            The number of hashed feature buckets (default is 2 ** 18).
+        word_ngrams : int, optional
+            The longest word n-gram used as a feature (default is 2).
+        char_ngrams : tuple[int, int], optional
+            The shortest and longest character n-grams used as features (default is (3, 5)).
+        threshold : float, optional
+            The probability below which a sentence is cleared as benign (default is the configured threshold).
+        weights : np.ndarray, optional
+            The trained feature weights (default is None, which initializes them to zero).
+        bias : float, optional
+            The trained bias (default is 0.0).
+        """
+
+        self.num_features = num_features
+        self.word_ngrams = word_ngrams
+        self.char_ngrams = tuple(char_ngrams)
+        self.threshold = threshold
+        self.weights = weights if weights is not None else np.zeros(num_features, dtype=np.float32)
+        self.bias = float(bias)
+
+    def _features(self, text: str) -> tuple[np.ndarray, np.ndarray]:
+        """Computes the L2-normalized hashed n-gram counts of a text, as (feature indices, values)."""
+
+        tokens = _TOKEN.findall(text.lower())
+        grams = [' '.join(tokens[i:i + n]) for n in range(1, self.word_ngrams + 1) for i in range(len(tokens) - n + 1)]
+
+        joined = f" {' '.join(tokens)} "
+        low, high = self.char_ngrams
+        grams += ['#' + joined[i:i + n] for n in range(low, high + 1) for i in range(len(joined) - n + 1)]
+
+        counts = {}
+        for gram in grams:
+            idx = zlib.crc32(gram.encode('utf-8')) % self.num_features
+            counts[idx] = counts.get(idx, 0.0) + 1.0
+
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        if len(values) > 0:
+            values /= np.linalg.norm(values)
+        return indices, values
+
+    def _matrix(self, texts: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Featurizes texts into a CSR-style sparse matrix, as (row ids, feature indices, values)."""
+
+        rows, indices, values = [], [], []
+        for row, text in enumerate(texts):
+            idx, vals = self._features(text)
+            rows.append(np.full(len(idx), row, dtype=np.int64))
+            indices.append(idx)
+            values.append(vals)
+
+        if len(texts) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return np.concatenate(rows), np.concatenate(indices), np.concatenate(values)
+
+    def _logits(self, rows: np.ndarray, indices: np.ndarray, values: np.ndarray, num_rows: int) -> np.ndarray:
+        """Computes the logit of each row of a sparse feature matrix."""
+
+        return np.bincount(rows, weights=self.weights[indices] * values, minlength=num_rows) + self.bias
+
+    def predict_proba(self, texts: list[str]) -> np.ndarray:
+        """Predicts the probability that each text is discriminatory.
+
+        Parameters
+        ----------
+        texts : list[str]
+            The texts to score.
+
+        Returns
+        -------
+        np.ndarray
+            The probability of each text, with shape (len(texts),).
+        """
+
+        rows, indices, values = self._matrix(texts)
+        return 1.0 / (1.0 + np.exp(-self._logits(rows, indices, values, len(texts))))
+
+    def clears(self, texts: list[str], threshold: float = None) -> np.ndarray:
+        """Determines which texts the prefilter is confident enough are benign to skip the binary classifier.
+
+        Parameters
+        ----------
+        texts : list[str]
+            The texts to check.
+        threshold : float, optional
+            Overrides the probability below which a text is cleared (default is None).
+
+        Returns
+        -------
+        np.ndarray
+            A boolean mask that is True for each cleared text.
+        """
+
+        return self.predict_proba(texts) < (self.threshold if threshold is None else threshold)
+
+    def fit(self, texts: list[str], labels, epochs: int = 5, learning_rate: float = 0.5, l2: float = 1e-6, batch_size: int = 256, seed: int = 0):
+        """Trains the model with mini-batch AdaGrad on the (class-balanced) logistic loss.
+
+        Parameters
+        ----------
+        texts : list[str]
+            The training texts.
+        labels : array-like
+            The binary label of each text (1 for discriminatory).
+        epochs : int, optional
+            The number of passes over the training data (default is 5).
+        learning_rate : float, optional
+            The AdaGrad learning rate (default is 0.5).
+        l2 : float, optional
+            The L2 regularization strength (default is 1e-6).
+        batch_size : int, optional
+            The number of texts per update (default is 256).
+        seed : int, optional
+            The seed used to shuffle the training data (default is 0).
+
+        Returns
+        -------
+        HashedNgramPrefilter
+            The trained model (self).
+        """
+
+        labels = np.asarray(labels, dtype=np.float64)
+        features = [self._features(text) for text in texts]
+        positives = max(labels.sum(), 1.0)
+        negatives = max(len(labels) - labels.sum(), 1.0)
+        sample_weights = np.where(labels == 1, len(labels) / (2 * positives), len(labels) / (2 * negatives))
+
+        weights = self.weights.astype(np.float64)
+        accumulated = np.full(self.num_features, 1e-8)
+        bias, bias_accumulated = self.bias, 1e-8
+        rng = np.random.default_rng(seed)
+
+        for epoch in range(epochs):
+            order = rng.permutation(len(texts))
+            loss = 0.0
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                rows = np.concatenate([np.full(len(features[i][0]), row, dtype=np.int64) for row, i in enumerate(batch)])
+                indices = np.concatenate([features[i][0] for i in batch])
+                values = np.concatenate([features[i][1] for i in batch]).astype(np.float64)
+
+                logits = np.bincount(rows, weights=weights[indices] * values, minlength=len(batch)) + bias
+                probs = 1.0 / (1.0 + np.exp(-logits))
+                errors = (probs - labels[batch]) * sample_weights[batch] / len(batch)
+                loss += float(np.sum(sample_weights[batch] * np.logaddexp(0.0, np.where(labels[batch] == 1, -logits, logits))))
+
+                gradient = np.zeros(self.num_features)
+                np.add.at(gradient, indices, values * errors[rows])
+                touched = np.unique(indices)
+                gradient[touched] += l2 * weights[touched]
+
+                accumulated[touched] += gradient[touched] ** 2
+                weights[touched] -= learning_rate * gradient[touched] / np.sqrt(accumulated[touched])
+                bias_gradient = errors.sum()
+                bias_accumulated += bias_gradient ** 2
+                bias -= learning_rate * bias_gradient / np.sqrt(bias_accumulated)
+
+            logger.info(f'Prefilter epoch {epoch + 1}/{epochs}: loss={loss / len(texts):.4f}')
+
+        self.weights = weights.astype(np.float32)
+        self.bias = float(bias)
+        return self
+
+    @property
+    def digest(self) -> str:
+        """A short hash identifying the trained weights and threshold (used to key cached results)."""
+
+        hasher = hashlib.sha1(self.weights.tobytes())
+        hasher.update(f'{self.bias}:{self.threshold}:{self.word_ngrams}:{self.char_ngrams}'.encode('utf-8'))
+        return hasher.hexdigest()[:12]
+
+    def save(self, path: Path):
+        """Saves the model to a .npz file.
+
+        Parameters
+        ----------
+        path : Path
+            The destination file.
+        """
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=np.float64(self.bias),
+            num_features=np.int64(self.num_features),
+            word_ngrams=np.int64(self.word_ngrams),
+            char_ngrams=np.asarray(self.char_ngrams, dtype=np.int64)
+        )
+
+    @classmethod
+    def load(cls, path: Path, threshold: float = PREFILTER_THRESHOLD):
+        """Loads a model saved with save.
+
+        Parameters
+        ----------
+        path : Path
+            The .npz file to load.
+        threshold : float, optional
+            The probability below which a sentence is cleared as benign (default is the configured threshold).
+
+        Returns
+        -------
+        HashedNgramPrefilter
+            The loaded model.
+        """
+
+        with np.load(path) as data:
+            return cls(
+                num_features=int(data['num_features']),
+                word_ngrams=int(data['word_ngrams']),
+                char_ngrams=tuple(int(n) for n in data['char_ngrams']),
+                threshold=threshold,
+                weights=data['weights'],
+                bias=float(data['bias'])
+            )
+
+def split_indices(num_rows: int, test_size: float = 0.2, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """Randomly splits row indices into a training and a held-out set.
+
+    Parameters
+    ----------
+    num_rows : int
+        The number of rows to split.
+    test_size : float, optional
+        The fraction of rows held out (default is 0.2).
+    seed : int, optional
+        The seed of the split (default is 0).
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray]
+        The training and held-out row indices.
+    """
+
+    order = np.random.default_rng(seed).permutation(num_rows)
+    num_test = int(round(num_rows * test_size))
+    return order[num_test:], order[:num_test]
+
+def segment_rows(texts: list[str], labels, indices, segment=None) -> tuple[list[str], np.ndarray, np.ndarray]:
+    """Splits the given rows into the sentences the prefilter scores at runtime, each labelled with its row's label.
+
+    Parameters
+    ----------
+    texts : list[str]
+        The labelled texts.
+    labels : array-like
+        The binary label of each text.
+    indices : array-like
+        The indices of the rows to split.
+    segment : Callable[[str], list[str]], optional
+        The sentence segmenter used at runtime (default is None, which keeps each row whole).
+
+    Returns
+    -------
+    tuple[list[str], np.ndarray, np.ndarray]
+        The sentences, their labels and the group of each sentence (the position of its row among the rows that have at least one
+        sentence).
+    """
+
+    labels = np.asarray(labels)
+    sentences, sentence_labels, groups = [], [], []
+    for idx in indices:
+        parts = segment(texts[idx]) if segment is not None else [texts[idx]]
+        if len(parts) == 0:
+            continue
+        group = groups[-1] + 1 if len(groups) > 0 else 0
+        sentences += parts
+        sentence_labels += [labels[idx]] * len(parts)
+        groups += [group] * len(parts)
+
+    return sentences, np.asarray(sentence_labels, dtype=labels.dtype), np.asarray(groups, dtype=np.int64)
+
+def evaluate_cascade(
+    prefilter: HashedNgramPrefilter,
+    texts: list[str],
+    labels,
+    thresholds: list[float] = DEFAULT_THRESHOLDS,
+    reference=None,
+    groups=None
+) -> list[dict]:
+    """Reports the recall lost versus the compute saved by the prefilter at several thresholds.
+
+    When the texts are the sentences of labelled rows (see segment_rows), the compute saved is the fraction of sentences cleared,
+    as at runtime, while the recall lost against the labels is measured per row: a discriminatory row is lost when every one of
+    its sentences is cleared, since it can then no longer be flagged.
+
+    Parameters
+    ----------
+    prefilter : HashedNgramPrefilter
+        The trained prefilter.
+    texts : list[str]
+        The held-out texts (or sentences).
+    labels : array-like
+        The true binary label of each text (or of each sentence's row).
+    thresholds : list[float], optional
+        The thresholds to evaluate (default is DEFAULT_THRESHOLDS).
+    reference : array-like, optional
+        The BERT binary classifier's prediction class for each text, to also report the recall lost relative to the full model (default is None).
+    groups : array-like, optional
+        The row each text belongs to (default is None, which treats every text as its own row).
+
+    Returns
+    -------
+    list[dict[str, float]]
+        For each threshold, the fraction of texts that skip BERT (compute saved) and the fraction of discriminatory rows that
+        are wrongly cleared (recall lost), relative to the labels and, if given, the fraction of the texts flagged by BERT that
+        are cleared.
+    """
+
+    labels = np.asarray(labels).astype(bool)
+    probs = prefilter.predict_proba(texts)
+    reference = np.asarray(reference).astype(bool) if reference is not None else None
+
+    # A row is only cleared when its most suspicious sentence is
+    groups = np.arange(len(texts)) if groups is None else np.asarray(groups, dtype=np.int64)
+    num_rows = int(groups.max()) + 1 if len(groups) > 0 else 0
+    row_labels = np.zeros(num_rows, dtype=bool)
+    np.logical_or.at(row_labels, groups, labels)
+    row_probs = np.full(num_rows, -np.inf)
+    np.maximum.at(row_probs, groups, probs)
+
+    report = []
+    for threshold in thresholds:
+        cleared = probs < threshold
+        cleared_rows = row_probs < threshold
+        entry = {
+            'threshold': threshold,
+            'skip_rate': float(cleared.mean()) if len(cleared) > 0 else 0.0,
+            'recall_lost': float((cleared_rows & row_labels).sum() / max(row_labels.sum(), 1)),
+            'cleared_positives': int((cleared_rows & row_labels).sum())
+        }
+        if reference is not None:
+            entry['model_recall_lost'] = float((cleared & reference).sum() / max(reference.sum(), 1))
+        report.append(entry)
+
+    return report
+
+def recommend_threshold(report: list[dict], max_recall_lost: float = 0.01) -> float | None:
+    """Picks the threshold that saves the most compute while losing at most max_recall_lost recall.
+
+    Parameters
+    ----------
+    report : list[dict[str, float]]
+        The report returned by evaluate_cascade.
+    max_recall_lost : float, optional
+        The largest acceptable fraction of discriminatory texts cleared (default is 0.01).
+
+    Returns
+    -------
+    float | None
+        The recommended threshold, or None if no threshold meets the recall budget.
+    """
+
+    key = 'model_recall_lost' if len(report) > 0 and 'model_recall_lost' in report[0] else 'recall_lost'
+    eligible = [entry for entry in report if entry[key] <= max_recall_lost]
+    return max(eligible, key=lambda entry: entry['skip_rate'])['threshold'] if len(eligible) > 0 else None
+
+def train_prefilter(
+    texts: list[str],
+    labels,
+    test_size: float = 0.2,
+    seed: int = 0,
+    epochs: int = 5,
+    thresholds: list[float] = DEFAULT_THRESHOLDS,
+    reference_fn=None,
+    segment=None
+) -> tuple[HashedNgramPrefilter, dict]:
+    """Trains a prefilter on a random split of labelled texts and evaluates the cascade on the held-out remainder.
+
+    The rows are split before they are segmented, so no sentence of a held-out row is trained on. Each sentence is labelled with
+    its row's label, which errs on the side of not clearing the benign sentences of discriminatory rows.
+
+    Parameters
+    ----------
+    texts : list[str]
+        The labelled texts (e.g. the master dataset).
+    labels : array-like
+        The binary label of each text (1 for discriminatory).
+    test_size : float, optional
+        The fraction of texts held out for evaluation (default is 0.2).
+    seed : int, optional
+        The seed of the split and of the training order (default is 0).
+    epochs : int, optional
+        The number of training epochs (default is 5).
+    thresholds : list[float], optional
+        The thresholds to evaluate (default is DEFAULT_THRESHOLDS).
+    reference_fn : Callable[[list[str]], list[int]], optional
+        A function returning the BERT binary classifier's prediction class for each held-out text (or sentence), used to also
+        report the recall lost relative to the full model (default is None).
+    segment : Callable[[str], list[str]], optional
+        The sentence segmenter used at runtime, to train and evaluate on the sentences the prefilter scores at runtime rather
+        than on whole texts (default is None).
+
+    Returns
+    -------
+    tuple[HashedNgramPrefilter, dict[str, Any]]
+        The trained prefilter and the evaluation report (split sizes, held-out positives and the per-threshold evaluation).
+    """
+
+    labels = np.asarray(labels).astype(np.int64)
+    train_idx, test_idx = split_indices(len(texts), test_size, seed)
+
+    train_texts, train_labels, _ = segment_rows(texts, labels, train_idx, segment)
+    prefilter = HashedNgramPrefilter().fit(train_texts, train_labels, epochs=epochs, seed=seed)
+
+    test_texts, test_labels, groups = segment_rows(texts, labels, test_idx, segment)
+    reference = reference_fn(test_texts) if reference_fn is not None else None
+    report = {
+        'train_size': len(train_idx),
+        'test_size': len(test_idx),
+        'train_sentences': len(train_texts),
+        'test_sentences': len(test_texts),
+        'test_positives': int(labels[test_idx].sum()),
+        'thresholds': evaluate_cascade(prefilter, test_texts, test_labels, thresholds, reference, groups)
+    }
+    return prefilter, report
@@ -0,0 +1,145 @@
+"""
+Script file providing a process-wide registry of loaded InferenceHandler instances.
+
+Handlers are loaded lazily on first request and shared by every caller in the process (i.e., every Streamlit session and rerun),
+keyed by the repositories and revisions of the models they serve.
+"""
+
+import threading
+
+from typing import TYPE_CHECKING
+from loguru import logger
+
+from scripts.config import (
+    BIN_REPO,
+    ML_REPO,
+    BIN_REVISION,
+    ML_REVISION
+)
+
+# The handler module (and with it torch and transformers) is only imported once a handler is first loaded
+if TYPE_CHECKING:
+    from scripts.predict import InferenceHandler
+
+_handlers = {}
+_lock = threading.Lock()
+
+def get_inference_handler(
+    api_token: str = None,
+    bin_repo: str = BIN_REPO,
+    ml_repo: str = ML_REPO,
+    bin_revision: str = BIN_REVISION,
+    ml_revision: str = ML_REVISION,
+    warmup: bool = True,
+    reload: bool = False
+) -> 'InferenceHandler':
+    """Retrieves the shared InferenceHandler for the given repositories and revisions, loading it if it does not exist yet.
+
+    Parameters
+    ----------
+    api_token : str, optional
+        The Hugging Face token used when the models need to be loaded (default is None).
+    bin_repo : str, optional
+        The repository id of the binary classification model (default is the configured bin_repo).
+    ml_repo : str, optional
+        The repository id of the multilabel regression model (default is the configured ml_repo).
+    bin_revision : str, optional
+        The revision of the binary classification model (default is the configured bin_revision).
+    ml_revision : str, optional
+        The revision of the multilabel regression model (default is the configured ml_revision).
+    warmup : bool, optional
+        Whether to perform a warm-up forward pass after loading (default is True).
+    reload : bool, optional
+        Whether to load a new handler even if one is registered, replacing it only once the new one has loaded (default is False).
+
+    Returns
+    -------
+    InferenceHandler
+        The shared InferenceHandler instance.
+    """
+
+    key = (bin_repo, bin_revision, ml_repo, ml_revision)
+    handler = _handlers.get(key)
+    if handler is not None and not reload:
+        return handler
+
+    with _lock:
+        handler = _handlers.get(key) if not reload else None
+        if handler is None:
+            logger.info(f'Loading inference handler for {key}...')
+            from scripts.predict import InferenceHandler
+            handler = InferenceHandler(
+                api_token,
+                bin_repo=bin_repo,
+                ml_repo=ml_repo,
+                bin_revision=bin_revision,
+                ml_revision=ml_revision
+            )
+
+            if warmup:
+                handler.warmup()
+
+            _handlers[key] = handler
+            load_times = ', '.join(f'{name}={secs:.2f}s' for name, secs in handler.load_times.items())
+            logger.success(f'Inference handler loaded ({load_times}).')
+
+    return handler
+
+def register_inference_handler(
+    handler: 'InferenceHandler',
+    bin_repo: str = BIN_REPO,
+    ml_repo: str = ML_REPO,
+    bin_revision: str = BIN_REVISION,
+    ml_revision: str = ML_REVISION
+):
+    """Registers an already loaded handler as the shared handler of the given repositories and revisions.
+
+    This allows stand-in models (e.g. the tiny models of the load test) to serve the app in place of the configured ones.
+
+    Parameters
+    ----------
+    handler : InferenceHandler
+        The handler to serve.
+    bin_repo : str, optional
+        The repository id of the binary classification model (default is the configured bin_repo).
+    ml_repo : str, optional
+        The repository id of the multilabel regression model (default is the configured ml_repo).
+    bin_revision : str, optional
+        The revision of the binary classification model (default is the configured bin_revision).
+    ml_revision : str, optional
+        The revision of the multilabel regression model (default is the configured ml_revision).
+    """
+
+    with _lock:
+        _handlers[(bin_repo, bin_revision, ml_repo, ml_revision)] = handler
+
+def loaded_handlers() -> dict:
+    """Returns a snapshot of the currently loaded handlers.
+
+    Returns
+    -------
+    dict[tuple, InferenceHandler]
+        A mapping of (bin_repo, bin_revision, ml_repo, ml_revision) keys to their loaded handlers.
+    """
+
+    return dict(_handlers)
+
+def release_inference_handler(handler: 'InferenceHandler'):
+    """Removes a handler from the registry (if it is still the registered one), releasing it once no caller holds a reference.
+
+    Parameters
+    ----------
+    handler : InferenceHandler
+        The handler to remove.
+    """
+
+    with _lock:
+        for key, registered in list(_handlers.items()):
+            if registered is handler:
+                del _handlers[key]
+
+def clear_registry():
+    """Removes all loaded handlers from the registry, releasing them once no caller holds a reference."""
+
+    with _lock:
+        _handlers.clear()
@@ -0,0 +1,283 @@
+"""
+Script file providing the hot-swapping of the loaded models when the repositories in config.toml change.
+
+A ModelReloader holds the active generation of models (an InferenceHandler and the scheduler batching its requests). A background
+thread watches config.toml and, when its repositories or revisions change (or a reload is requested), loads the new models while
+the active generation keeps serving, then swaps the generation under a lock. Each request acquires a generation once and uses it
+throughout, so no request sees a mix of old and new models. A replaced generation is released (its scheduler and pool closed and
+its handler dropped from the registry) as soon as the last request using it finishes.
+"""
+
+import gc
+import time
+import threading
+
+from contextlib import contextmanager
+from loguru import logger
+
+from scripts import metrics
+from scripts.config import (
+    ROOT,
+    POOL_ENABLED,
+    SCHEDULER_ENABLED,
+    RELOAD_POLL_INTERVAL,
+    read_repositories
+)
+
+CONFIG_PATH = ROOT / 'config.toml'
+
+class ModelGeneration:
+    """A loaded set of models, with the number of requests currently using it."""
+
+    def __init__(self, handler, scheduler, repositories: dict, load_seconds: float):
+        self.handler = handler
+        self.scheduler = scheduler
+        self.repositories = repositories
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.active = 0
+        self.retired = False
+
+    @property
+    def classifier(self):
+        """The object requests are sent to (the scheduler if there is one, otherwise the handler)."""
+
+        return self.scheduler if self.scheduler is not None else self.handler
+
+    @property
+    def model_key(self) -> str:
+        """The repositories and revisions of the generation's models."""
+
+        return self.handler.model_key
+
+def load_generation(repositories: dict, api_token: str = None, reload: bool = False) -> tuple:
+    """Loads the handler of a set of repositories from the registry, with the configured pool and scheduler.
+
+    Parameters
+    ----------
+    repositories : dict[str, str]
+        The bin_repo, ml_repo, bin_revision and ml_revision to load.
+    api_token : str, optional
+        The Hugging Face token used to download the models (default is None).
+    reload : bool, optional
+        Whether to load new models even if the registry already holds them, e.g. to pick up a new latest revision (default is
+        False). The registered handler is only replaced once the new one has loaded.
+
+    Returns
+    -------
+    tuple[InferenceHandler, BatchScheduler | None]
+        The handler and, if the scheduler is enabled, the scheduler batching its requests.
+    """
+
+    from scripts.registry import get_inference_handler
+    from scripts.scheduler import BatchScheduler
+
+    handler = get_inference_handler(api_token, warmup=not POOL_ENABLED, reload=reload, **repositories)
+    if POOL_ENABLED and handler.pool is None:
+        from scripts.pool import InferencePool
+        handler.attach_pool(InferencePool(handler))
+    return handler, BatchScheduler(handler) if SCHEDULER_ENABLED else None
+
+class ModelReloader:
+    """Serves the active generation of models and swaps in a new one when the configured repositories change."""
+
+    def __init__(self, api_token: str = None, poll_interval: float = RELOAD_POLL_INTERVAL, loader=load_generation):
+        """Constructor for instantiating a ModelReloader object, which loads the configured models before returning.
+
+        Parameters
+        ----------
+        api_token : str, optional
+            The Hugging Face token used to download the models (default is None).
+        poll_interval : float, optional
+            The number of seconds between checks of config.toml, where 0 only reloads when requested (default is the configured
+            poll_interval).
+        loader : Callable[[dict, str, bool], tuple], optional
+            The function loading the handler and scheduler of a set of repositories, bypassing the registry when its last
+            argument is True (default is load_generation).
+        """
+
+        self.api_token = api_token
+        self.poll_interval = poll_interval
+        self.loader = loader
+
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._requested = threading.Event()
+        self._stopped = threading.Event()
+
+        self._config_mtime = self._read_mtime()
+        self._generation = self._load(read_repositories())
+        self._retired = []
+        self._stats = {'reloads': 0, 'failed_reloads': 0, 'last_swap_seconds': None, 'last_error': None}
+
+        self._watcher = threading.Thread(target=self._watch, name='ModelReloader', daemon=True)
+        self._watcher.start()
+
+    @staticmethod
+    def _read_mtime() -> float | None:
+        try:
+            return CONFIG_PATH.stat().st_mtime
+        except OSError:
+            return None
+
+    def _load(self, repositories: dict, reload: bool = False) -> ModelGeneration:
+        """Loads a new generation of models (without making it active)."""
+
+        start = time.perf_counter()
+        handler, scheduler = self.loader(repositories, self.api_token, reload)
+        load_seconds = time.perf_counter() - start
+        if handler.collect_metrics:
+            metrics.REGISTRY.observe('model_load_seconds', load_seconds)
+        return ModelGeneration(handler, scheduler, repositories, load_seconds)
+
+    def current(self) -> ModelGeneration:
+        """Returns the active generation (use acquire to keep it alive for the duration of a request)."""
+
+        return self._generation
+
+    @contextmanager
+    def acquire(self):
+        """Pins the active generation for the duration of a request, so it is not released while the request uses it.
+
+        Yields
+        ------
+        ModelGeneration
+            The generation to use for the whole request.
+        """
+
+        with self._lock:
+            generation = self._generation
+            generation.active += 1
+        try:
+            yield generation
+        finally:
+            with self._lock:
+                generation.active -= 1
+                release = generation.retired and generation.active == 0
+            if release:
+                self._release(generation)
+
+    def request_reload(self):
+        """Asks the background thread to reload the models now, even if the repositories did not change."""
+
+        self._requested.set()
+
+    def reload(self, force: bool = False) -> bool:
+        """Loads the configured repositories and swaps them in if they differ from the active generation's.
+
+        The active generation keeps serving while the new models load. Only one reload runs at a time.
+
+        Parameters
+        ----------
+        force : bool, optional
+            Whether to reload even if the repositories did not change, e.g. to pick up a new latest revision (default is False).
+
+        Returns
+        -------
+        bool
+            Whether a new generation was swapped in.
+        """
+
+        with self._reload_lock:
+            repositories = read_repositories()
+            if not force and repositories == self._generation.repositories:
+                return False
+
+            # A forced reload loads new models rather than being served the active handler from the registry, which keeps
+            # holding the active handler until the new one has loaded, so a failed reload leaves the registry untouched
+            logger.info(f'Loading models for {repositories} in the background...')
+            try:
+                generation = self._load(repositories, reload=force)
+            except Exception as e:
+                with self._lock:
+                    self._stats['failed_reloads'] += 1
+                    self._stats['last_error'] = f'{type(e).__name__}: {e}'
+                logger.error(f'Failed to load the new models, the current models keep serving: {e}')
+                return False
+
+            start = time.perf_counter()
+            with self._lock:
+                previous, self._generation = self._generation, generation
+                previous.retired = True
+                release = previous.active == 0
+                if not release:
+                    self._retired.append(previous)
+                swap_seconds = time.perf_counter() - start
+                self._stats['reloads'] += 1
+                self._stats['last_swap_seconds'] = swap_seconds
+                self._stats['last_error'] = None
+
+            if generation.handler.collect_metrics:
+                metrics.REGISTRY.observe('model_swap_seconds', swap_seconds)
+                metrics.REGISTRY.inc('model_reloads_total')
+            logger.success(f'Swapped to {generation.model_key} (loaded in {generation.load_seconds:.2f}s, swapped in {swap_seconds * 1000:.3f}ms).')
+
+            if release:
+                self._release(previous)
+            return True
+
+    def _release(self, generation: ModelGeneration):
+        """Closes a retired generation's scheduler and pool and drops its handler from the registry, freeing its weights."""
+
+        from scripts.registry import release_inference_handler
+
+        with self._lock:
+            if generation in self._retired:
+                self._retired.remove(generation)
+
+        if generation.scheduler is not None:
+            generation.scheduler.close()
+        if generation.handler is not self._generation.handler:
+            if generation.handler.pool is not None:
+                generation.handler.pool.close()
+            release_inference_handler(generation.handler)
+
+        logger.info(f'Released the models of {generation.model_key}.')
+        generation.handler = generation.scheduler = None
+        gc.collect()
+
+    def _watch(self):
+        """The watcher loop, which reloads when config.toml is modified or a reload is requested."""
+
+        while not self._stopped.is_set():
+            requested = self._requested.wait(self.poll_interval if self.poll_interval > 0 else None)
+            if self._stopped.is_set():
+                return
+            self._requested.clear()
+
+            mtime = self._read_mtime()
+            if requested or mtime != self._config_mtime:
+                self._config_mtime = mtime
+                try:
+                    self.reload(force=requested)
+                except Exception as e:
+                    logger.error(f'Model reload failed: {e}')
+
+    def stats(self) -> dict:
+        """Returns the active revision, the load and swap times and the reload counters.
+
+        Returns
+        -------
+        dict[str, Any]
+            The active model key and repositories, when and how fast the active generation was loaded, the time of the last swap,
+            the number of reloads (and failures, with the last error) and the number of retired generations still in use.
+        """
+
+        with self._lock:
+            generation = self._generation
+            return {
+                'active_revision': generation.model_key,
+                'repositories': dict(generation.repositories),
+                'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(generation.loaded_at)),
+                'load_seconds': generation.load_seconds,
+                'active_requests': generation.active,
+                'retired_in_use': len(self._retired),
+                **self._stats
+            }
+
+    def close(self):
+        """Stops the watcher thread."""
+
+        self._stopped.set()
+        self._requested.set()
+        self._watcher.join()
@@ -0,0 +1,323 @@
+"""
+Script file providing the rendering of classification results in the Streamlit app.
+
+Results with up to the configured number of sentences are rendered as a breakdown with one expander per sentence. Larger
+results are virtualized: a summary table lists the flagged sentences, and the breakdown is shown one page at a time as a single
+HTML chunk of collapsible sentences (rendered in a fragment, so changing the page does not rerun the whole app).
+"""
+
+import html
+import zlib
+import streamlit as st
+import pandas as pd
+
+from htbuilder import span, div, p, details, summary
+from annotated_text import annotation
+
+from scripts.config import RENDER_VIRTUALIZE_AFTER, RENDER_PAGE_SIZE
+
+LABEL_COLORS = {
+    'Gender': '#4A90E2',
+    'Race': '#E67E22',
+    'Sexuality': '#3B9C5A',
+    'Disability': '#8B5E3C',
+    'Religion': '#A347BA',
+    'Unspecified': '#A0A0A0'
+}
+
+CLASS_COLORS = {0: '#21C354', 1: '#FF4B4B'}
+
+def category_annotations(ml_regr: dict) -> list:
+    """Creates the annotations of the categories that apply to a sentence.
+
+    Parameters
+    ----------
+    ml_regr : dict[str, float]
+        The category scores of the sentence.
+
+    Returns
+    -------
+    list
+        One annotation, labelled with its score as a percentage, per category with a score above 0.
+    """
+
+    at_list = []
+    for entry in ml_regr.keys():
+        val = ml_regr[entry]
+        if val > 0.0:
+            perc = val * 100
+            at_list.append(annotation(body=entry, label=f'{perc:.2f}%', background=LABEL_COLORS[entry]))
+    return at_list
+
+def sentence_details(result: dict) -> dict:
+    """Formats a sentence's result for display.
+
+    Parameters
+    ----------
+    result : dict
+        The result of a single sentence.
+
+    Returns
+    -------
+    dict[str, Any]
+        The sentence, its formatted classification, whether it is discriminatory and the annotations of the categories that apply to it.
+    """
+
+    bin_class = result['binary_classification']['classification']
+    pred_class = result['binary_classification']['prediction_class']
+    ml_regr = result['multilabel_regression']
+
+    sent_res = {
+        'sentence': result['sentence'],
+        'classification': f':red[{bin_class}]' if pred_class else f':green[{bin_class}]',
+        'discriminatory': pred_class == 1,
+        'annotated_categories': []
+    }
+
+    if pred_class == 1:
+        sent_res['annotated_categories'] = category_annotations(ml_regr)
+    return sent_res
+
+def render_annotations(annotated_categories: list):
+    """Renders the category annotations of a sentence on a single line.
+
+    Parameters
+    ----------
+    annotated_categories : list
+        The annotations of the categories that apply to the sentence.
+    """
+
+    st.markdown(
+        div(
+            span(' ' if idx != 0 else '')[
+                item
+            ] for idx, item in enumerate(annotated_categories)
+        ),
+        unsafe_allow_html=True
+    )
+    st.markdown('\n')
+
+def render_sentence(idx: int, sent: dict):
+    """Renders a sentence of the breakdown in its own expander.
+
+    Parameters
+    ----------
+    idx : int
+        The position of the sentence in the input.
+    sent : dict
+        The sentence details, as returned by sentence_details.
+    """
+
+    with st.expander(label=f'Sentence #{idx+1}', icon='🔴' if len(sent['annotated_categories']) > 0 else '🟢', expanded=True):
+        st.markdown('<hr style="margin: 0.5em 0 0 0;">', unsafe_allow_html=True)
+        st.markdown(
+            f"<p style='text-align: center; font-weight: bold; font-style: italic; font-size: large;'>\"{sent['sentence']}\"</p>",
+            unsafe_allow_html=True
+        )
+        st.markdown('<hr style="margin: 0 0 0.5em 0;">', unsafe_allow_html=True)
+
+        classification = sent['classification']
+        st.markdown(f'##### Classification - {classification}')
+
+        if len(sent['annotated_categories']) > 0:
+            render_annotations(sent['annotated_categories'])
+
+def flagged_summary(results: list[dict]) -> pd.DataFrame:
+    """Tabulates the flagged sentences of a result and their category scores.
+
+    Parameters
+    ----------
+    results : list[dict[str, Any]]
+        The per-sentence results.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per discriminatory sentence with its position, the sentence and its category scores.
+    """
+
+    rows = [
+        {'#': idx + 1, 'Sentence': result['sentence'], **result['multilabel_regression']}
+        for idx, result in enumerate(results)
+        if result['binary_classification']['prediction_class'] == 1
+    ]
+    return pd.DataFrame(rows, columns=['#', 'Sentence', *LABEL_COLORS])
+
+def results_page_html(results: list[dict], indices: list[int]) -> str:
+    """Builds the breakdown of a page of sentences as a single HTML chunk, with each sentence in a collapsible block.
+
+    Discriminatory sentences are expanded and show their category annotations, while the others are collapsed.
+
+    Parameters
+    ----------
+    results : list[dict[str, Any]]
+        The per-sentence results.
+    indices : list[int]
+        The positions of the sentences on the page.
+
+    Returns
+    -------
+    str
+        The HTML of the page.
+    """
+
+    blocks = []
+    for idx in indices:
+        result = results[idx]
+        pred_class = result['binary_classification']['prediction_class']
+        attrs = {'open': True} if pred_class == 1 else {}
+
+        body = [
+            p(style='text-align: center; font-weight: bold; font-style: italic; margin: 0.25em 0;')[f"\"{html.escape(result['sentence'])}\""],
+            p(style='margin: 0.25em 0;')[
+                'Classification - ',
+                span(style=f'color: {CLASS_COLORS[pred_class]}; font-weight: bold;')[result['binary_classification']['classification']]
+            ]
+        ]
+        if pred_class == 1:
+            body.append(div(span(' ' if pos != 0 else '')[item] for pos, item in enumerate(category_annotations(result['multilabel_regression']))))
+
+        blocks.append(details(style='border-bottom: 1px solid rgba(128, 128, 128, 0.2); padding: 0.25em 0;', **attrs)[
+            summary[f"{'🔴' if pred_class == 1 else '🟢'} Sentence #{idx+1}"],
+            *body
+        ])
+
+    return str(div(*blocks))
+
+@st.fragment
+def render_result_pages(results: list[dict], key: str, page_size: int = RENDER_PAGE_SIZE):
+    """Renders the sentence breakdown of a large result one page at a time, as a single HTML chunk per page.
+
+    Being a fragment, changing the page or the filter only reruns this function.
+
+    Parameters
+    ----------
+    results : list[dict[str, Any]]
+        The per-sentence results.
+    key : str
+        A key unique to the result, used for its widgets.
+    page_size : int, optional
+        The number of sentences per page (default is the configured page_size).
+    """
+
+    only_flagged = st.toggle('Only show discriminatory sentences', key=f'{key}_flagged')
+    indices = [
+        idx for idx, result in enumerate(results)
+        if not only_flagged or result['binary_classification']['prediction_class'] == 1
+    ]
+
+    page = 1
+    num_pages = max(1, -(-len(indices) // page_size))
+    if num_pages > 1:
+        page = st.number_input(f'Page (of {num_pages})', min_value=1, max_value=num_pages, value=1, key=f'{key}_page_{only_flagged}')
+    st.markdown(results_page_html(results, indices[(page - 1) * page_size:page * page_size]), unsafe_allow_html=True)
+
+def render_large_results(results: list[dict], key: str):
+    """Renders the summary table of the flagged sentences of a large result, followed by its paginated breakdown.
+
+    Parameters
+    ----------
+    results : list[dict[str, Any]]
+        The per-sentence results.
+    key : str
+        A key unique to the result, used for its widgets.
+    """
+
+    summary_df = flagged_summary(results)
+    st.markdown(f'##### Sentence Breakdown: {len(summary_df)} of {len(results)} sentences flagged')
+    if len(summary_df) > 0:
+        st.dataframe(summary_df, hide_index=True)
+    render_result_pages(results, key)
+
+def build_result_tree(parent_elem, results: dict, stream=None, virtualize_after: int = RENDER_VIRTUALIZE_AFTER) -> dict:
+    """Renders the results of performing inference on an input, optionally rendering them incrementally as they are streamed.
+
+    While streaming, each chunk of sentences is added to the sentence breakdown as soon as it is classified. Once the stream
+    ends the view is finalized, so that it is the same as the one rendered from the complete results. When the number of
+    sentences exceeds virtualize_after, the per-sentence breakdown is replaced by a progress line and, once the stream ends, by
+    the summary table and paginated breakdown of render_large_results.
+
+    Parameters
+    ----------
+    parent_elem : DeltaGenerator
+        The Streamlit UI element to post the data to.
+    results : dict
+        The resulting data from performing inference. When stream is given only its 'text_input' is used.
+    stream : Generator, optional
+        A generator yielding chunks of per-sentence results and returning the complete results, such as the one returned by
+        InferenceHandler.classify_text_stream (default is None).
+    virtualize_after : int, optional
+        The largest number of sentences rendered with one expander each (default is the configured virtualize_after).
+
+    Returns
+    -------
+    dict
+        The complete results that were rendered.
+    """
+
+    with parent_elem:
+        header = st.empty()
+        header.markdown('### Results - Processing...')
+        with st.container(border=True):
+            st.markdown('<hr style="margin: 0.5em 0 0 0;">', unsafe_allow_html=True)
+            st.markdown(
+                f"<p style='text-align: center; font-weight: bold; font-style: italic; font-size: large;'>\"{results['text_input']}\"</p>",
+                unsafe_allow_html=True
+            )
+            st.markdown('<hr style="margin: 0 0 0.5em 0;">', unsafe_allow_html=True)
+            breakdown = st.empty()
+            large_view = st.empty()
+
+    if stream is None:
+        stream = iter([results['results']])
+
+    key = f"results_{zlib.crc32(results['text_input'].encode('utf-8'))}"
+    sent_results = []
+    sent_details = []
+    breakdown_box = None
+    progress = None
+    while True:
+        try:
+            chunk = next(stream)
+        except StopIteration as stop:
+            results = stop.value if stop.value is not None else results
+            break
+
+        if breakdown_box is None:
+            breakdown_box = breakdown.container()
+            breakdown_box.markdown('##### Sentence Breakdown:')
+
+        sent_results.extend(chunk)
+        if progress is None and len(sent_results) > virtualize_after:
+            breakdown.empty()
+            progress = large_view
+
+        if progress is not None:
+            progress.markdown(f'##### Sentence Breakdown: {len(sent_results)} sentences classified...')
+        else:
+            with breakdown_box:
+                for result in chunk:
+                    sent = sentence_details(result)
+                    render_sentence(len(sent_details), sent)
+                    sent_details.append(sent)
+        header.markdown(f'### Results - Processing... ({len(sent_results)} sentences classified)')
+
+    discriminatory_sentiment = any(result['binary_classification']['prediction_class'] == 1 for result in sent_results)
+    result_hdr = ':red[Detected Discriminatory Sentiment]' if discriminatory_sentiment else ':green[No Discriminatory Sentiment Detected]'
+    header.markdown(f'### Results - {result_hdr}')
+
+    if progress is not None:
+        with large_view.container():
+            render_large_results(sent_results, key)
+        return results
+
+    if not discriminatory_sentiment or len(sent_details) <= 1:
+        breakdown.empty()
+    if discriminatory_sentiment and len(sent_details) == 1:
+        with breakdown.container():
+            sent = sent_details[0]
+            st.markdown(f"#### Classification - {sent['classification']}")
+            if len(sent['annotated_categories']) > 0:
+                render_annotations(sent['annotated_categories'])
+
+    return results
@@ -0,0 +1,178 @@
+"""
+Script file providing the compact, columnar representation of sentence-level classification results.
+
+A SentenceResults holds the sentences, an int8 vector of prediction classes and a float32 matrix of clamped category scores (NaN
+for sentences that are not discriminatory) instead of one nested dict per sentence. The score matrix is column-major, so each
+category column is contiguous and is exported to Arrow (and from there to Parquet) and pandas without copying its values. The
+dict view produced by to_dicts (and by iterating or indexing) is the schema returned by InferenceHandler.classify_sentences.
+"""
+
+import numpy as np
+
+BIN_LABELS = ['Non-Discriminatory', 'Discriminatory']
+CATEGORIES = ['Gender', 'Race', 'Sexuality', 'Disability', 'Religion', 'Unspecified']
+
+class SentenceResults:
+    """The columnar results of a list of classified sentences."""
+
+    __slots__ = ('sentences', 'classes', 'scores')
+
+    def __init__(self, sentences: list[str], classes: np.ndarray, scores: np.ndarray):
+        """Constructor for instantiating a SentenceResults object.
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The classified sentences.
+        classes : np.ndarray
+            The prediction class of each sentence, with shape (len(sentences),).
+        scores : np.ndarray
+            The category scores of each sentence, with shape (len(sentences), len(CATEGORIES)) and NaN rows for sentences that
+            are not discriminatory.
+        """
+
+        self.sentences = list(sentences)
+        self.classes = np.asarray(classes, dtype=np.int8)
+        self.scores = np.asfortranarray(scores, dtype=np.float32)
+
+    @classmethod
+    def from_outcomes(cls, sentences: list[str], outcomes: list[tuple]):
+        """Builds the results from the (prediction class, category scores) outcome of each sentence.
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The classified sentences.
+        outcomes : list[tuple[int, list[float] | None]]
+            The prediction class and, for discriminatory sentences, the category scores of each sentence, as produced by the
+            inference path (and stored in the result cache).
+
+        Returns
+        -------
+        SentenceResults
+            The results, with the category scores clamped to [0, 1].
+        """
+
+        classes = np.fromiter((pred_class for pred_class, _ in outcomes), dtype=np.int8, count=len(outcomes))
+        scores = np.full((len(outcomes), len(CATEGORIES)), np.nan, dtype=np.float32, order='F')
+
+        flagged = np.flatnonzero(classes == 1)
+        if len(flagged) > 0:
+            scores[flagged] = np.asarray([outcomes[idx][1] for idx in flagged], dtype=np.float32)
+            np.clip(scores, 0.0, 1.0, out=scores)
+        return cls(sentences, classes, scores)
+
+    @classmethod
+    def concat(cls, parts: list):
+        """Concatenates several results, in order."""
+
+        if len(parts) == 0:
+            return cls([], np.zeros(0, dtype=np.int8), np.zeros((0, len(CATEGORIES)), dtype=np.float32))
+        return cls(
+            [sent for part in parts for sent in part.sentences],
+            np.concatenate([part.classes for part in parts]),
+            np.concatenate([part.scores for part in parts])
+        )
+
+    def __len__(self) -> int:
+        return len(self.sentences)
+
+    def __getitem__(self, idx: int) -> dict:
+        """Returns the dict view of a single sentence's result."""
+
+        pred_class = int(self.classes[idx])
+        return {
+            'sentence': self.sentences[idx],
+            'binary_classification': {
+                'classification': BIN_LABELS[pred_class],
+                'prediction_class': pred_class
+            },
+            'multilabel_regression': dict(zip(CATEGORIES, self.scores[idx].tolist())) if pred_class == 1 else None
+        }
+
+    def __iter__(self):
+        return iter(self.to_dicts())
+
+    @property
+    def discriminatory(self) -> np.ndarray:
+        """Whether each sentence was classified as discriminatory."""
+
+        return self.classes == 1
+
+    @property
+    def nbytes(self) -> int:
+        """The memory used by the class vector and score matrix, in bytes (excluding the sentences)."""
+
+        return self.classes.nbytes + self.scores.nbytes
+
+    def to_dicts(self) -> list[dict]:
+        """Returns the results as one dict per sentence, in the schema returned by InferenceHandler.classify_sentences.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            The sentence, binary classification and (for discriminatory sentences) category scores of each sentence.
+        """
+
+        results = []
+        for sentence, pred_class, scores in zip(self.sentences, self.classes.tolist(), self.scores.tolist()):
+            results.append({
+                'sentence': sentence,
+                'binary_classification': {
+                    'classification': BIN_LABELS[pred_class],
+                    'prediction_class': pred_class
+                },
+                'multilabel_regression': dict(zip(CATEGORIES, scores)) if pred_class == 1 else None
+            })
+        return results
+
+    def to_arrow(self, **columns):
+        """Exports the results as an Arrow table, reusing the class vector and the score columns' buffers.
+
+        Parameters
+        ----------
+        **columns : Sequence
+            Additional leading columns (e.g. document ids), each with one value per sentence.
+
+        Returns
+        -------
+        pa.Table
+            The given columns followed by the sentence, the dictionary-encoded classification, the prediction class and one
+            float32 column per category (null for sentences that are not discriminatory).
+        """
+
+        import pyarrow as pa
+
+        mask = ~self.discriminatory
+        arrays = {name: pa.array(values) for name, values in columns.items()}
+        arrays['sentence'] = pa.array(self.sentences, type=pa.string())
+        arrays['classification'] = pa.DictionaryArray.from_arrays(pa.array(self.classes), pa.array(BIN_LABELS))
+        arrays['prediction_class'] = pa.array(self.classes)
+        for col, cat in enumerate(CATEGORIES):
+            arrays[cat] = pa.array(self.scores[:, col], mask=mask)
+        return pa.table(arrays)
+
+    def to_pandas(self, **columns):
+        """Exports the results as a DataFrame, reusing the class vector and the score columns where pandas allows it.
+
+        Parameters
+        ----------
+        **columns : Sequence
+            Additional leading columns (e.g. document ids), each with one value per sentence.
+
+        Returns
+        -------
+        pd.DataFrame
+            The given columns followed by the sentence, the categorical classification, the prediction class and one float32
+            column per category (NaN for sentences that are not discriminatory).
+        """
+
+        import pandas as pd
+
+        data = dict(columns)
+        data['sentence'] = self.sentences
+        data['classification'] = pd.Categorical.from_codes(self.classes, BIN_LABELS)
+        data['prediction_class'] = self.classes
+        for col, cat in enumerate(CATEGORIES):
+            data[cat] = self.scores[:, col]
+        return pd.DataFrame(data, copy=False)
@@ -0,0 +1,384 @@
+"""
+Script file providing a micro-batching scheduler that sits in front of an InferenceHandler.
+
+Concurrent callers (e.g., the script threads of several Streamlit sessions) submit sentences to a shared queue. A single worker
+thread collects the queued sentences for up to max_wait_ms or until max_batch_sentences are waiting, groups them into buckets of
+similar word count (a cheap proxy for their token length, so sentences are only tokenized once, by the handler, and only on a
+cache miss) to minimize padding, performs one forward pass per bucket and routes the results back to each caller's future.
+"""
+
+import time
+import asyncio
+import threading
+
+from collections import deque
+from concurrent.futures import Future
+from loguru import logger
+
+from scripts import metrics
+from scripts.config import (
+    METRICS_ATTACH,
+    STREAM_CHUNK_SIZE,
+    SCHEDULER_MAX_WAIT_MS,
+    SCHEDULER_MAX_BATCH_SENTENCES,
+    SCHEDULER_MAX_PENDING_SENTENCES,
+    SCHEDULER_BUCKET_WIDTH
+)
+
+class SchedulerFull(Exception):
+    """Raised when a request cannot be queued because the scheduler has reached its pending sentence limit."""
+
+class SchedulerClosed(Exception):
+    """Raised when a request is submitted to, or still pending in, a scheduler that has been closed."""
+
+class _Request:
+    """A single caller's queued sentences and the future its results are delivered to."""
+
+    __slots__ = ('sentences', 'future', 'enqueued_at', 'with_metrics', 'metrics')
+
+    def __init__(self, sentences: list[str], with_metrics: bool = False):
+        self.sentences = sentences
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.with_metrics = with_metrics
+        self.metrics = None
+
+class BatchScheduler:
+    """A request queue that batches sentences from concurrent callers into shared forward passes."""
+
+    def __init__(
+        self,
+        handler,
+        max_wait_ms: float = SCHEDULER_MAX_WAIT_MS,
+        max_batch_sentences: int = SCHEDULER_MAX_BATCH_SENTENCES,
+        max_pending_sentences: int = SCHEDULER_MAX_PENDING_SENTENCES,
+        bucket_width: int = SCHEDULER_BUCKET_WIDTH
+    ):
+        """Constructor for instantiating a BatchScheduler object and starting its worker thread.
+
+        Parameters
+        ----------
+        handler : InferenceHandler
+            The handler used to perform inference.
+        max_wait_ms : float, optional
+            The maximum time, in milliseconds, the oldest queued request waits for more sentences before a batch is run (default is the configured max_wait_ms).
+        max_batch_sentences : int, optional
+            The number of queued sentences that triggers a batch immediately, and the maximum collected per batch (default is the configured max_batch_sentences).
+        max_pending_sentences : int, optional
+            The maximum number of queued sentences before submissions block or are rejected (default is the configured max_pending_sentences).
+        bucket_width : int, optional
+            The width, in words, of the length buckets sentences are grouped into (default is the configured bucket_width).
+        """
+
+        self.handler = handler
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_sentences = max_batch_sentences
+        self.max_pending_sentences = max_pending_sentences
+        self.bucket_width = max(bucket_width, 1)
+
+        self._queue = deque()
+        self._pending_sentences = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        self._stats = {
+            'requests': 0,
+            'sentences': 0,
+            'rejected': 0,
+            'batches': 0,
+            'forward_passes': 0,
+            'batch_sizes': {},
+            'max_queue_depth': 0,
+            'total_wait': 0.0
+        }
+
+        self._worker = threading.Thread(target=self._run, name='BatchScheduler', daemon=True)
+        self._worker.start()
+
+    def submit(self, sentences: list[str], block: bool = True, timeout: float = None) -> Future:
+        """Queues sentences for classification from any thread.
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The sentences to be classified.
+        block : bool, optional
+            Whether to wait for room in the queue when the pending sentence limit is reached (default is True).
+        timeout : float, optional
+            The maximum time, in seconds, to wait for room in the queue when blocking (default is None, which waits indefinitely).
+
+        Returns
+        -------
+        Future
+            A future resolving to the per-sentence results, in the same format as InferenceHandler.classify_sentences.
+
+        Raises
+        ------
+        SchedulerFull
+            If the queue has no room and block is False, or no room became available within the timeout.
+        SchedulerClosed
+            If the scheduler has been closed.
+        """
+
+        return self._enqueue(sentences, block, timeout).future
+
+    def _enqueue(self, sentences: list[str], block: bool = True, timeout: float = None, with_metrics: bool = False) -> _Request:
+        """Queues sentences for classification, returning the queued request (see submit)."""
+
+        request = _Request(list(sentences), with_metrics)
+        if len(request.sentences) == 0:
+            request.future.set_result([])
+            return request
+
+        with self._cond:
+            deadline = None if timeout is None else time.perf_counter() + timeout
+            while not self._closed and not self._has_room(len(request.sentences)):
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if not block or (remaining is not None and remaining <= 0):
+                    self._stats['rejected'] += 1
+                    raise SchedulerFull(f'{self._pending_sentences} sentences are already pending.')
+                self._cond.wait(remaining)
+
+            if self._closed:
+                raise SchedulerClosed('The scheduler has been closed.')
+
+            self._queue.append(request)
+            self._pending_sentences += len(request.sentences)
+            self._stats['requests'] += 1
+            self._stats['sentences'] += len(request.sentences)
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], self._pending_sentences)
+            self._cond.notify_all()
+
+        return request
+
+    async def submit_async(self, sentences: list[str]) -> list[dict]:
+        """Queues sentences for classification from a coroutine and awaits the results.
+
+        Parameters
+        ----------
+        sentences : list[str]
+            The sentences to be classified.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            The per-sentence results, in the same format as InferenceHandler.classify_sentences.
+        """
+
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, self.submit, sentences)
+        return await asyncio.wrap_future(future)
+
+    def classify_text(self, input: str, timeout: float = None, with_metrics: bool = None) -> dict:
+        """Classifies text through the scheduler, returning the same result structure as InferenceHandler.classify_text.
+
+        Parameters
+        ----------
+        input : str
+            The input text to be classified.
+        timeout : float, optional
+            The maximum time, in seconds, to wait for queueing and for the results (default is None, which waits indefinitely).
+        with_metrics : bool, optional
+            Whether to attach the request's queue wait and the per-stage metrics of the batch it was processed in to the result
+            under 'metrics' (default is None, which uses the configured attach_to_results setting).
+
+        Returns
+        -------
+        dict[str, Any]
+            The resulting classification and regression values for each sentence.
+        """
+
+        with_metrics = METRICS_ATTACH if with_metrics is None else with_metrics
+
+        start = time.perf_counter()
+        sentences = self.handler.segmenter.split(input)
+        split_time = time.perf_counter() - start
+
+        request = self._enqueue(sentences, timeout=timeout, with_metrics=with_metrics)
+        result = {
+            'text_input': input,
+            'results': request.future.result(timeout)
+        }
+
+        if with_metrics and request.metrics is not None:
+            result['metrics'] = request.metrics
+            result['metrics']['stages_ms']['sentence_split'] = split_time * 1000.0
+            result['metrics']['total_ms'] = (time.perf_counter() - start) * 1000.0
+        return result
+
+    def classify_text_stream(self, input: str, chunk_size: int = None, timeout: float = None):
+        """Classifies text through the scheduler, yielding the per-sentence results in order as each chunk of sentences is classified.
+
+        Every chunk is queued up front so that later chunks are batched while earlier ones are being rendered. The complete result,
+        in the same structure as the one returned by classify_text (without 'metrics'), is the generator's return value.
+
+        Parameters
+        ----------
+        input : str
+            The input text to be classified.
+        chunk_size : int, optional
+            The number of sentences queued and yielded at a time (default is the configured stream_chunk_size).
+        timeout : float, optional
+            The maximum time, in seconds, to wait for queueing and for each chunk's results (default is None, which waits indefinitely).
+
+        Yields
+        ------
+        list[dict[str, Any]]
+            The results of the next chunk of sentences, in the same format as InferenceHandler.classify_sentences.
+
+        Returns
+        -------
+        dict[str, Any]
+            The resulting classification and regression values for each sentence.
+        """
+
+        chunk_size = max(1, chunk_size if chunk_size is not None else STREAM_CHUNK_SIZE)
+        sentences = self.handler.segmenter.split(input)
+        futures = [self.submit(sentences[start:start + chunk_size], timeout=timeout) for start in range(0, len(sentences), chunk_size)]
+
+        result = {
+            'text_input': input,
+            'results': []
+        }
+        for future in futures:
+            chunk = future.result(timeout)
+            result['results'].extend(chunk)
+            yield chunk
+        return result
+
+    async def classify_text_async(self, input: str) -> dict:
+        """Coroutine variant of classify_text.
+
+        Parameters
+        ----------
+        input : str
+            The input text to be classified.
+
+        Returns
+        -------
+        dict[str, Any]
+            The resulting classification and regression values for each sentence.
+        """
+
+        return {
+            'text_input': input,
+            'results': await self.submit_async(self.handler.segmenter.split(input))
+        }
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the queue-depth and batch-size statistics.
+
+        Returns
+        -------
+        dict[str, Any]
+            The current queue depth, request/sentence/batch counts, the batch size histogram and the mean batch size and queue wait.
+        """
+
+        with self._cond:
+            stats = dict(self._stats)
+            stats['batch_sizes'] = dict(self._stats['batch_sizes'])
+            stats['queue_depth'] = self._pending_sentences
+            stats['queued_requests'] = len(self._queue)
+
+        processed = stats['sentences'] - stats['queue_depth']
+        stats['mean_batch_size'] = processed / stats['batches'] if stats['batches'] > 0 else 0.0
+        stats['mean_wait_ms'] = 1000.0 * stats.pop('total_wait') / max(stats['requests'] - stats['queued_requests'], 1)
+        return stats
+
+    def close(self):
+        """Stops the worker thread, failing any requests that are still queued."""
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+
+        while len(self._queue) > 0:
+            self._queue.popleft().future.set_exception(SchedulerClosed('The scheduler has been closed.'))
+
+    def _has_room(self, num_sentences: int) -> bool:
+        """Determines whether a request of num_sentences can be queued (an oversized request is admitted into an empty queue)."""
+
+        return self._pending_sentences == 0 or self._pending_sentences + num_sentences <= self.max_pending_sentences
+
+    def _next_batch(self) -> list[_Request]:
+        """Waits until a batch is due and removes its requests from the queue, returning None once closed."""
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    return None
+
+                if len(self._queue) > 0:
+                    due = self._queue[0].enqueued_at + self.max_wait
+                    remaining = due - time.perf_counter()
+                    if self._pending_sentences >= self.max_batch_sentences or remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait()
+
+            batch = [self._queue.popleft()]
+            collected = len(batch[0].sentences)
+            while len(self._queue) > 0 and collected + len(self._queue[0].sentences) <= self.max_batch_sentences:
+                batch.append(self._queue.popleft())
+                collected += len(batch[-1].sentences)
+
+            now = time.perf_counter()
+            self._pending_sentences -= collected
+            self._stats['batches'] += 1
+            self._stats['batch_sizes'][collected] = self._stats['batch_sizes'].get(collected, 0) + 1
+            self._stats['total_wait'] += sum(now - request.enqueued_at for request in batch)
+            self._cond.notify_all()
+
+        return batch
+
+    def _run(self):
+        """The worker loop, which runs one forward pass per length bucket of each collected batch."""
+
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            try:
+                started = time.perf_counter()
+                sentences = [sent for request in batch for sent in request.sentences]
+                with metrics.track(self.handler.collect_metrics or any(request.with_metrics for request in batch)) as batch_metrics:
+                    if batch_metrics is not None:
+                        for request in batch:
+                            metrics.REGISTRY.observe('stage_seconds', started - request.enqueued_at, stage='queue_wait')
+
+                    with metrics.stage('bucketing'):
+                        buckets = {}
+                        for idx, sent in enumerate(sentences):
+                            buckets.setdefault(len(sent.split()) // self.bucket_width, []).append(idx)
+
+                    # A bucket is run in a single forward pass, unless it is larger than the handler's max_batch_size (e.g. an
+                    # oversized request admitted into an empty queue), which bounds the memory of a forward pass
+                    results = [None] * len(sentences)
+                    forward_passes = 0
+                    for indices in buckets.values():
+                        batch_size = min(len(indices), self.handler.max_batch_size)
+                        bucket_results = self.handler.classify_sentences([sentences[idx] for idx in indices], max_batch_size=batch_size)
+                        for idx, sent_result in zip(indices, bucket_results):
+                            results[idx] = sent_result
+                        forward_passes += -(-len(indices) // batch_size)
+
+                with self._cond:
+                    self._stats['forward_passes'] += forward_passes
+
+                offset = 0
+                for request in batch:
+                    if request.with_metrics and batch_metrics is not None:
+                        request.metrics = batch_metrics.as_dict()
+                        request.metrics['stages_ms']['queue_wait'] = (started - request.enqueued_at) * 1000.0
+                        request.metrics['batch_requests'] = len(batch)
+                        request.metrics['batch_sentences'] = len(sentences)
+                    request.future.set_result(results[offset:offset + len(request.sentences)])
+                    offset += len(request.sentences)
+            except Exception as e:
+                logger.error(f'Batch of {len(batch)} requests failed: {e}')
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
@@ -0,0 +1,169 @@
+"""
+Script file used for building and reading a precomputed index of model scores over the master dataset.
+
+Every row of the dataset is scored as a whole text by the binary and multilabel models, and the binary probability and category
+scores are stored in a Parquet file keyed by the models' revisions, with one row per hash of the row's text. Rebuilding the index
+only scores texts whose hash is not in it yet, so re-runs after the dataset changes only score new or changed rows. Reading the
+index requires no models, so the Datasets tab can show and filter the scores without any inference.
+"""
+
+import time
+import hashlib
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from loguru import logger
+
+from scripts.config import SCORE_INDEX_DIR
+
+HASH_COLUMN = 'row_hash'
+PROBABILITY_COLUMN = 'binary_probability'
+MODEL_KEY_METADATA = b'nlpinitiative.model_key'
+
+def row_hash(text: str) -> str:
+    """Hashes the text of a dataset row.
+
+    Parameters
+    ----------
+    text : str
+        The text of the row.
+
+    Returns
+    -------
+    str
+        The hex digest identifying the text.
+    """
+
+    return hashlib.sha1(str(text).encode('utf-8')).hexdigest()
+
+def index_path(model_key: str, index_dir: Path = SCORE_INDEX_DIR) -> Path:
+    """Returns the path of the score index of a pair of model revisions.
+
+    Parameters
+    ----------
+    model_key : str
+        The binary and multilabel model revisions, backend and weight dtype, as given by InferenceHandler.model_key.
+    index_dir : Path, optional
+        The directory holding the indexes (default is the configured score index dir).
+
+    Returns
+    -------
+    Path
+        The path of the Parquet file.
+    """
+
+    return Path(index_dir) / f"scores-{hashlib.sha1(model_key.encode('utf-8')).hexdigest()[:16]}.parquet"
+
+def load_score_index(model_key: str, index_dir: Path = SCORE_INDEX_DIR) -> pd.DataFrame | None:
+    """Reads the score index of a pair of model revisions.
+
+    Parameters
+    ----------
+    model_key : str
+        The binary and multilabel model revisions, backend and weight dtype, as given by InferenceHandler.model_key.
+    index_dir : Path, optional
+        The directory holding the indexes (default is the configured score index dir).
+
+    Returns
+    -------
+    pd.DataFrame | None
+        The binary probability and category scores of each text, indexed by row hash, or None if no index was built.
+    """
+
+    path = index_path(model_key, index_dir)
+    if not path.exists():
+        return None
+    return pd.read_parquet(path).set_index(HASH_COLUMN)
+
+def build_score_index(handler, texts: list[str], index_dir: Path = SCORE_INDEX_DIR, batch_size: int = None, chunk_size: int = 1024) -> dict:
+    """Scores the texts that are not in the handler's score index yet and writes the updated index.
+
+    Hashes that no longer occur in texts are dropped from the index, so it always mirrors the current dataset.
+
+    Parameters
+    ----------
+    handler : InferenceHandler
+        The handler whose models score the texts.
+    texts : list[str]
+        The texts of every row of the dataset.
+    index_dir : Path, optional
+        The directory holding the indexes (default is the configured score index dir).
+    batch_size : int, optional
+        The maximum number of texts per forward pass (default is None, which uses the handler's max_batch_size).
+    chunk_size : int, optional
+        The number of texts scored between progress updates (default is 1024).
+
+    Returns
+    -------
+    dict[str, Any]
+        The path of the index, the number of unique texts, how many were scored and reused, and the time taken.
+    """
+
+    from scripts.predict import CATEGORIES
+
+    start = time.perf_counter()
+    texts_by_hash = {}
+    for text in texts:
+        texts_by_hash.setdefault(row_hash(text), str(text))
+
+    existing = load_score_index(handler.model_key, index_dir)
+    missing = [key for key in texts_by_hash if existing is None or key not in existing.index]
+    logger.info(f'{len(texts_by_hash)} unique texts, {len(texts_by_hash) - len(missing)} already scored, {len(missing)} to score...')
+
+    probs, scores = [], []
+    for offset in range(0, len(missing), chunk_size):
+        chunk_probs, chunk_scores = handler.score_texts([texts_by_hash[key] for key in missing[offset:offset + chunk_size]], batch_size)
+        probs.append(chunk_probs)
+        scores.append(chunk_scores)
+        logger.info(f'Scored {min(offset + chunk_size, len(missing))}/{len(missing)} texts.')
+
+    scored = pd.DataFrame(
+        np.concatenate(scores) if len(scores) > 0 else np.zeros((0, len(CATEGORIES)), dtype=np.float32),
+        columns=CATEGORIES,
+        index=pd.Index(missing, name=HASH_COLUMN)
+    )
+    scored.insert(0, PROBABILITY_COLUMN, np.concatenate(probs) if len(probs) > 0 else np.zeros(0, dtype=np.float32))
+
+    index = scored if existing is None else pd.concat([existing[existing.index.isin(list(texts_by_hash))], scored])
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(index.reset_index(), preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), MODEL_KEY_METADATA: handler.model_key.encode('utf-8')})
+
+    path = index_path(handler.model_key, index_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.tmp')
+    pq.write_table(table, tmp_path)
+    tmp_path.replace(path)
+
+    return {
+        'path': str(path),
+        'texts': len(texts_by_hash),
+        'scored': len(missing),
+        'reused': len(texts_by_hash) - len(missing),
+        'seconds': time.perf_counter() - start
+    }
+
+def join_scores(df: pd.DataFrame, text_column: str, index: pd.DataFrame) -> pd.DataFrame:
+    """Adds the indexed scores of each row to a dataset.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataset.
+    text_column : str
+        The column holding the text of each row.
+    index : pd.DataFrame
+        The score index, as returned by load_score_index.
+
+    Returns
+    -------
+    pd.DataFrame
+        The dataset with the binary probability and category score columns (NaN for rows that are not indexed).
+    """
+
+    hashes = df[text_column].map(row_hash)
+    return pd.concat([df, index.reindex(hashes.values).set_index(df.index)], axis=1)
@@ -0,0 +1,305 @@
+"""
+Script file providing the interchangeable sentence segmenters used to split input texts before classification.
+
+Three segmenters are available: NLTK's punkt (the reference, which loads its data on startup and splits in pure Python), a
+rule-based splitter built on a single compiled regular expression, and a splitter that places the boundaries using the offset
+mapping of the binary model's fast tokenizer. Every segmenter takes a text and returns its sentences as stripped substrings, so
+they can be swapped without changing the inference code. compare_segmenters measures each one's throughput and its agreement
+with punkt.
+"""
+
+import re
+import time
+
+from abc import ABC, abstractmethod
+
+
+SEGMENTERS = ['punkt', 'regex', 'offsets']
+
+# Words that are commonly followed by a period without ending the sentence (compared in lowercase, without the final period)
+ABBREVIATIONS = frozenset([
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'sr', 'jr', 'st', 'mt', 'rev', 'gen', 'col', 'lt', 'sgt', 'capt', 'gov', 'sen', 'rep',
+    'vs', 'etc', 'e.g', 'i.e', 'cf', 'al', 'approx', 'inc', 'ltd', 'co', 'corp', 'no', 'nos', 'fig', 'vol', 'pp', 'dept', 'est',
+    'jan', 'feb', 'mar', 'apr', 'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec', 'u.s', 'u.k', 'a.m', 'p.m'
+])
+
+# The abbreviations that are also common words (or often end a sentence), which are only taken as abbreviations when the next
+# word starts with a lowercase letter or a digit (e.g. "No. 5" or "et al. found", but not "They said no. Then")
+AMBIGUOUS_ABBREVIATIONS = frozenset(['no', 'nos', 'co', 'est', 'mar', 'sep', 'al', 'gen', 'col', 'rep', 'rev', 'sen', 'fig', 'vol'])
+
+TERMINALS = '.!?…'
+CLOSERS = '"\'”’)]'
+
+# A run of sentence-ending punctuation, optionally followed by closing quotes or brackets, then whitespace. The character after
+# it is captured so that ellipses continuing the sentence can be told apart from the end of a sentence.
+_BOUNDARY = re.compile(rf'([{TERMINALS}]+)[{re.escape(CLOSERS)}]*\s+(?=(\S))')
+
+# The longest word (in characters) that is looked up among the abbreviations
+_MAX_WORD = 16
+
+def _ends_sentence(word: str, terminal: str, following: str) -> bool:
+    """Determines whether a word followed by sentence-ending punctuation ends the sentence.
+
+    Parameters
+    ----------
+    word : str
+        The word before the punctuation (without it).
+    terminal : str
+        The run of sentence-ending punctuation.
+    following : str
+        The first character after the whitespace that follows the punctuation.
+
+    Returns
+    -------
+    bool
+        False if the punctuation is an ellipsis followed by a lowercase letter, or a single period after a known abbreviation or
+        a single capital letter (an initial). Ambiguous abbreviations only continue the sentence before a lowercase letter or a
+        digit.
+    """
+
+    if (terminal.startswith('..') or '…' in terminal) and following.islower():
+        return False
+    if terminal != '.':
+        return True
+    word = word.lstrip('"\'“‘([')
+    if len(word) == 1 and word.isupper():
+        return False
+    word = word.lower()
+    if word in AMBIGUOUS_ABBREVIATIONS:
+        return not (following.islower() or following.isdigit())
+    return word not in ABBREVIATIONS
+
+def _spans_to_sentences(text: str, starts: list[int]) -> list[str]:
+    """Cuts a text at the given sentence start offsets, returning the non-empty stripped sentences."""
+
+    bounds = [0] + starts + [len(text)]
+    sentences = [text[start:end].strip() for start, end in zip(bounds, bounds[1:])]
+    return [sent for sent in sentences if len(sent) > 0]
+
+class Segmenter(ABC):
+    """Base class for the sentence segmenters."""
+
+    name = None
+
+    @abstractmethod
+    def split(self, text: str) -> list[str]:
+        """Splits a text into sentences.
+
+        Parameters
+        ----------
+        text : str
+            The text to be split.
+
+        Returns
+        -------
+        list[str]
+            The sentences, in order, with surrounding whitespace removed.
+        """
+
+class PunktSegmenter(Segmenter):
+    """Splits texts with NLTK's sent_tokenize (the punkt model)."""
+
+    name = 'punkt'
+
+    def __init__(self, offline: bool = False):
+        """Constructor for instantiating a PunktSegmenter object.
+
+        Parameters
+        ----------
+        offline : bool, optional
+            Whether the punkt data must be read from the vendored directory rather than downloaded (default is False).
+        """
+
+        from nltk.tokenize import sent_tokenize
+        from scripts.snapshots import ensure_punkt
+
+        ensure_punkt(offline)
+        self._sent_tokenize = sent_tokenize
+
+    def split(self, text: str) -> list[str]:
+        return self._sent_tokenize(text)
+
+class RegexSegmenter(Segmenter):
+    """Splits texts after runs of sentence-ending punctuation that are followed by whitespace, except after abbreviations and initials."""
+
+    name = 'regex'
+
+    def split(self, text: str) -> list[str]:
+        starts = []
+        for match in _BOUNDARY.finditer(text):
+            terminal, following = match.group(1), match.group(2)
+
+            # The word before the punctuation only matters for single periods, so it is only looked up for those
+            word = ''
+            if terminal == '.':
+                preceding = text[max(0, match.start() - _MAX_WORD):match.start()].split()
+                word = preceding[-1] if len(preceding) > 0 else ''
+            if _ends_sentence(word, terminal, following):
+                starts.append(match.end())
+        return _spans_to_sentences(text, starts)
+
+class OffsetSegmenter(Segmenter):
+    """Splits texts at the sentence-ending punctuation tokens of a fast tokenizer, using its offset mapping to locate them.
+
+    The tokenizer's pre-tokenization decides what counts as punctuation, so the boundaries follow the same character classes
+    the models were trained with.
+    """
+
+    name = 'offsets'
+
+    def __init__(self, tokenizer):
+        """Constructor for instantiating an OffsetSegmenter object.
+
+        Parameters
+        ----------
+        tokenizer : PreTrainedTokenizerFast
+            The tokenizer whose offset mapping is used.
+
+        Raises
+        ------
+        ValueError
+            If the tokenizer is not a fast tokenizer, as only those return offset mappings.
+        """
+
+        if not getattr(tokenizer, 'is_fast', False):
+            raise ValueError('The offsets segmenter requires a fast tokenizer.')
+        self.tokenizer = tokenizer
+
+    def split(self, text: str) -> list[str]:
+        offsets = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)['offset_mapping']
+
+        starts = []
+        idx = 0
+        while idx < len(offsets):
+            start, end = offsets[idx]
+            if end - start == 0 or text[start] not in TERMINALS:
+                idx += 1
+                continue
+
+            # A run of terminal and closing tokens ends the sentence if whitespace follows it and it is not an abbreviation's period
+            run_start, run_end = idx, idx
+            while run_end + 1 < len(offsets) and offsets[run_end + 1][0] == offsets[run_end][1] and text[offsets[run_end + 1][0]] in TERMINALS + CLOSERS:
+                run_end += 1
+            idx = run_end + 1
+            if idx >= len(offsets) or offsets[idx][0] == offsets[run_end][1]:
+                continue
+
+            terminal = text[start:offsets[run_end][1]].rstrip(CLOSERS)
+            word_start = start
+            while run_start > 0 and offsets[run_start - 1][1] == word_start:
+                run_start -= 1
+                word_start = offsets[run_start][0]
+            if _ends_sentence(text[word_start:start], terminal, text[offsets[idx][0]]):
+                starts.append(offsets[idx][0])
+
+        return _spans_to_sentences(text, starts)
+
+def create_segmenter(name: str, tokenizer=None, offline: bool = False) -> Segmenter:
+    """Creates a sentence segmenter.
+
+    Parameters
+    ----------
+    name : str
+        The name of the segmenter (one of SEGMENTERS).
+    tokenizer : PreTrainedTokenizerFast, optional
+        The tokenizer used by the offsets segmenter (default is None).
+    offline : bool, optional
+        Whether the punkt segmenter must read its data from the vendored directory (default is False).
+
+    Returns
+    -------
+    Segmenter
+        The segmenter.
+
+    Raises
+    ------
+    ValueError
+        If the segmenter is unknown, or is the offsets segmenter and no fast tokenizer is given.
+    """
+
+    if name == 'punkt':
+        return PunktSegmenter(offline)
+    if name == 'regex':
+        return RegexSegmenter()
+    if name == 'offsets':
+        if tokenizer is None:
+            raise ValueError('The offsets segmenter requires a tokenizer.')
+        return OffsetSegmenter(tokenizer)
+    raise ValueError(f"Unknown segmenter '{name}' (expected one of {', '.join(SEGMENTERS)}).")
+
+def _sentence_starts(text: str, sentences: list[str]) -> set[int]:
+    """Locates the start offset of every sentence after the first, as the boundaries a segmenter placed in the text."""
+
+    starts, pos = set(), 0
+    for idx, sent in enumerate(sentences):
+        found = text.find(sent, pos)
+        if found < 0:
+            continue
+        if idx > 0:
+            starts.add(found)
+        pos = found + len(sent)
+    return starts
+
+def compare_segmenters(segmenters: list[Segmenter], texts: list[str], reference: Segmenter = None, repeats: int = 3) -> dict:
+    """Measures the throughput of each segmenter and its agreement with a reference segmenter (usually punkt).
+
+    Parameters
+    ----------
+    segmenters : list[Segmenter]
+        The segmenters to compare.
+    texts : list[str]
+        The texts to split.
+    reference : Segmenter, optional
+        The segmenter the others are compared with (default is None, which only measures throughput).
+    repeats : int, optional
+        The number of timed passes over the texts, of which the fastest is reported (default is 3).
+
+    Returns
+    -------
+    dict[str, Any]
+        For each segmenter, its texts, sentences and megabytes per second and, against the reference, the fraction of texts
+        split identically and the precision, recall and F1 of its sentence boundaries.
+    """
+
+    num_bytes = sum(len(text.encode('utf-8')) for text in texts)
+    expected = [reference.split(text) for text in texts] if reference is not None else None
+
+    report = {'texts': len(texts), 'bytes': num_bytes, 'reference': reference.name if reference is not None else None, 'segmenters': {}}
+    for segmenter in segmenters:
+        times = []
+        for _ in range(max(1, repeats)):
+            start = time.perf_counter()
+            split = [segmenter.split(text) for text in texts]
+            times.append(time.perf_counter() - start)
+
+        seconds = max(min(times), 1e-9)
+        num_sentences = sum(len(sents) for sents in split)
+        entry = {
+            'sentences': num_sentences,
+            'seconds': seconds,
+            'texts_per_second': len(texts) / seconds,
+            'sentences_per_second': num_sentences / seconds,
+            'mb_per_second': num_bytes / 2**20 / seconds
+        }
+
+        if expected is not None:
+            matched = predicted = actual = identical = 0
+            for text, sents, ref_sents in zip(texts, split, expected):
+                starts, ref_starts = _sentence_starts(text, sents), _sentence_starts(text, ref_sents)
+                matched += len(starts & ref_starts)
+                predicted += len(starts)
+                actual += len(ref_starts)
+                identical += int(sents == ref_sents)
+
+            precision = matched / predicted if predicted > 0 else 1.0
+            recall = matched / actual if actual > 0 else 1.0
+            entry.update({
+                'text_agreement': identical / len(texts) if len(texts) > 0 else None,
+                'boundary_precision': precision,
+                'boundary_recall': recall,
+                'boundary_f1': 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+            })
+
+        report['segmenters'][segmenter.name] = entry
+
+    return report
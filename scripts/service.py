@@ -0,0 +1,477 @@
+"""
+Script file providing a standalone HTTP inference service around an InferenceHandler, and a pooled client for it.
+
+The service holds the models in a single process, so Streamlit replicas configured with its url stay light. It accepts JSON
+requests on keep-alive (HTTP/1.1) connections, rejects bodies larger than max_body_bytes and batches of more than max_batch_texts
+texts, and answers 503 when more than max_concurrency requests are already being processed. Endpoints:
+
+ - `POST /classify` with `{"text": ...}` returns the result of classify_text.
+ - `POST /classify/batch` with `{"texts": [...]}` returns `{"results": [...]}`, one classify_text result per text.
+ - `POST /classify/stream` with `{"text": ...}` streams newline-delimited JSON, one `{"results": [...]}` line per chunk of
+   sentences followed by `{"done": true}`.
+ - `GET /health`, `GET /stats` and `GET /metrics` report the loaded models, the service counters and the Prometheus metrics.
+"""
+
+import sys
+import json
+import queue
+import threading
+import http.client
+
+from urllib.parse import urlsplit
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from loguru import logger
+
+from scripts.metrics import REGISTRY
+from scripts.scheduler import BatchScheduler
+from scripts.config import (
+    SCHEDULER_ENABLED,
+    SERVICE_HOST,
+    SERVICE_PORT,
+    SERVICE_MAX_BODY_BYTES,
+    SERVICE_MAX_BATCH_TEXTS,
+    SERVICE_MAX_CONCURRENCY,
+    SERVICE_QUEUE_TIMEOUT,
+    SERVICE_URL,
+    SERVICE_CLIENT_POOL_SIZE,
+    SERVICE_TIMEOUT
+)
+
+class ServiceError(Exception):
+    """Raised by ServiceClient when the service answers with an error."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+        self.message = message
+
+class _ServiceRequestHandler(BaseHTTPRequestHandler):
+    """Handles the requests of an InferenceService (available as self.server.service)."""
+
+    protocol_version = 'HTTP/1.1'
+    timeout = 120
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 503:
+            self.send_header('Retry-After', '1')
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str):
+        self.server.service.count(f'status_{status}')
+        self._send_json(status, {'error': message})
+
+    def _read_json(self) -> dict | None:
+        """Reads the JSON request body, answering with an error (and returning None) if it is missing, too large or invalid."""
+
+        length = self.headers.get('Content-Length')
+        if length is None or not length.isdigit():
+            self.close_connection = True
+            self._send_error(411, 'A Content-Length header is required.')
+            return None
+
+        if int(length) > self.server.service.max_body_bytes:
+            # The body is not read, so the connection cannot be reused
+            self.close_connection = True
+            self._send_error(413, f'The request body exceeds {self.server.service.max_body_bytes} bytes.')
+            return None
+
+        try:
+            payload = json.loads(self.rfile.read(int(length)))
+        except ValueError as e:
+            self._send_error(400, f'Invalid JSON: {e}')
+            return None
+
+        if not isinstance(payload, dict):
+            self._send_error(400, 'The request body must be a JSON object.')
+            return None
+        return payload
+
+    def do_GET(self):
+        service = self.server.service
+        path = self.path.split('?')[0]
+        if path == '/health':
+            self._send_json(200, {'status': 'ok', 'model_key': service.handler.model_key})
+        elif path == '/stats':
+            self._send_json(200, service.stats())
+        elif path == '/metrics':
+            body = REGISTRY.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_error(404, f'Unknown endpoint {path}.')
+
+    def do_POST(self):
+        service = self.server.service
+        path = self.path.split('?')[0]
+        if path not in ('/classify', '/classify/batch', '/classify/stream'):
+            self.close_connection = True
+            self._send_error(404, f'Unknown endpoint {path}.')
+            return
+
+        payload = self._read_json()
+        if payload is None:
+            return
+
+        if path == '/classify/batch':
+            texts = payload.get('texts')
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                self._send_error(400, "'texts' must be a list of strings.")
+                return
+            if len(texts) > service.max_batch_texts:
+                self._send_error(413, f'A batch may hold at most {service.max_batch_texts} texts.')
+                return
+        elif not isinstance(payload.get('text'), str):
+            self._send_error(400, "'text' must be a string.")
+            return
+
+        with service.slot() as acquired:
+            if not acquired:
+                self._send_error(503, 'Too many concurrent requests.')
+                return
+
+            try:
+                if path == '/classify':
+                    self._send_json(200, service.classify_text(payload['text']))
+                elif path == '/classify/batch':
+                    self._send_json(200, {'results': service.classify_texts(payload['texts'])})
+                else:
+                    self._stream(service, payload['text'])
+            except Exception as e:
+                logger.exception(f'Failed to handle {path}: {e}')
+                self.close_connection = True
+                self._send_error(500, str(e))
+
+    def _stream(self, service, text: str):
+        """Writes the chunks of a streamed classification as newline-delimited JSON using chunked transfer encoding."""
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_line(payload: dict):
+            data = (json.dumps(payload) + '\n').encode('utf-8')
+            self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+            self.wfile.flush()
+
+        try:
+            for chunk in service.classifier.classify_text_stream(text):
+                write_line({'results': chunk})
+            write_line({'done': True})
+        except ConnectionError:
+            # The client stopped reading the stream
+            self.close_connection = True
+            return
+        except Exception as e:
+            # The status line has already been sent, so the error is reported in the stream
+            logger.exception(f'Failed to stream a classification: {e}')
+            write_line({'error': str(e)})
+        self.wfile.write(b'0\r\n\r\n')
+
+class _ServiceHTTPServer(ThreadingHTTPServer):
+    """A threading HTTP server that does not report clients dropping their connections as errors."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+class InferenceService:
+    """A local HTTP server exposing an InferenceHandler (through a BatchScheduler, if enabled) to other processes."""
+
+    def __init__(
+        self,
+        handler,
+        host: str = SERVICE_HOST,
+        port: int = SERVICE_PORT,
+        max_body_bytes: int = SERVICE_MAX_BODY_BYTES,
+        max_batch_texts: int = SERVICE_MAX_BATCH_TEXTS,
+        max_concurrency: int = SERVICE_MAX_CONCURRENCY,
+        queue_timeout: float = SERVICE_QUEUE_TIMEOUT,
+        use_scheduler: bool = SCHEDULER_ENABLED
+    ):
+        """Constructor for instantiating an InferenceService object (the server is bound, but not started).
+
+        Parameters
+        ----------
+        handler : InferenceHandler
+            The handler performing inference.
+        host : str, optional
+            The address to bind to (default is the configured host).
+        port : int, optional
+            The port to listen on, where 0 picks a free port (default is the configured port).
+        max_body_bytes : int, optional
+            The largest accepted request body, in bytes (default is the configured max_body_bytes).
+        max_batch_texts : int, optional
+            The largest number of texts accepted by the batch endpoint (default is the configured max_batch_texts).
+        max_concurrency : int, optional
+            The number of requests processed at once (default is the configured max_concurrency).
+        queue_timeout : float, optional
+            How long, in seconds, a request waits for a free slot before being rejected with 503 (default is the configured queue_timeout).
+        use_scheduler : bool, optional
+            Whether to batch concurrent requests with a BatchScheduler (default is the configured scheduler enabled setting).
+        """
+
+        self.handler = handler
+        self.scheduler = BatchScheduler(handler) if use_scheduler else None
+        self.classifier = self.scheduler if self.scheduler is not None else handler
+        self.max_body_bytes = max_body_bytes
+        self.max_batch_texts = max_batch_texts
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+
+        self.counters = {'requests': 0, 'in_flight': 0}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self.server = _ServiceHTTPServer((host, port), _ServiceRequestHandler)
+        self.server.service = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """The base URL the service is reachable at."""
+
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count(self, name: str, value: int = 1):
+        """Increments a service counter."""
+
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def slot(self):
+        """Waits up to queue_timeout for one of the max_concurrency processing slots, yielding whether one was acquired."""
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            yield False
+            return
+
+        self.count('requests')
+        self.count('in_flight')
+        try:
+            yield True
+        finally:
+            self.count('in_flight', -1)
+            self._slots.release()
+
+    def classify_text(self, text: str) -> dict:
+        """Classifies a single text, returning the result of classify_text."""
+
+        return self.classifier.classify_text(text)
+
+    def classify_texts(self, texts: list[str]) -> list[dict]:
+        """Classifies several texts with a single batched call, returning one classify_text result per text."""
+
+        split = [self.handler.segmenter.split(text) for text in texts]
+        sentences = [sent for sents in split for sent in sents]
+        if self.scheduler is not None:
+            sent_results = self.scheduler.submit(sentences).result()
+        else:
+            sent_results = self.handler.classify_sentences(sentences)
+
+        results, offset = [], 0
+        for text, sents in zip(texts, split):
+            results.append({'text_input': text, 'results': sent_results[offset:offset + len(sents)]})
+            offset += len(sents)
+        return results
+
+    def stats(self) -> dict:
+        """Returns the service counters, with the scheduler and cache statistics if they are enabled."""
+
+        with self._lock:
+            stats = {'model_key': self.handler.model_key, 'max_concurrency': self.max_concurrency, **self.counters}
+        if self.scheduler is not None:
+            stats['scheduler'] = self.scheduler.stats()
+        if self.handler.cache is not None:
+            stats['cache'] = self.handler.cache.stats()
+        return stats
+
+    def start(self):
+        """Serves requests on a background thread."""
+
+        self._thread = threading.Thread(target=self.server.serve_forever, name='InferenceService', daemon=True)
+        self._thread.start()
+        logger.info(f'Serving inference at {self.url}.')
+        return self
+
+    def serve_forever(self):
+        """Serves requests on the calling thread until interrupted."""
+
+        logger.info(f'Serving inference at {self.url}.')
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        """Stops the server and the scheduler."""
+
+        if self._thread is not None:
+            self.server.shutdown()
+            self._thread = None
+        self.server.server_close()
+        if self.scheduler is not None:
+            self.scheduler.close()
+
+class ServiceClient:
+    """A thread-safe client of an InferenceService, reusing a pool of keep-alive connections."""
+
+    def __init__(self, url: str = SERVICE_URL, pool_size: int = SERVICE_CLIENT_POOL_SIZE, timeout: float = SERVICE_TIMEOUT):
+        """Constructor for instantiating a ServiceClient object.
+
+        Parameters
+        ----------
+        url : str, optional
+            The base URL of the service (default is the configured url).
+        pool_size : int, optional
+            The maximum number of idle connections kept open (default is the configured client_pool_size).
+        timeout : float, optional
+            The socket timeout of each request, in seconds (default is the configured timeout).
+        """
+
+        parts = urlsplit(url)
+        self.url = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=max(1, pool_size))
+        self._model_key = None
+
+    @contextmanager
+    def _connection(self):
+        """Borrows an idle connection (or opens a new one), returning it to the pool only if it was left in a reusable state."""
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+        reusable = False
+        try:
+            yield conn
+            reusable = True
+        finally:
+            if reusable:
+                try:
+                    self._idle.put_nowait(conn)
+                    return
+                except queue.Full:
+                    pass
+            conn.close()
+
+    def _request(self, method: str, path: str, payload: dict = None) -> dict:
+        """Sends a request and decodes its JSON response, retrying once if a pooled connection was closed by the server."""
+
+        body = None if payload is None else json.dumps(payload).encode('utf-8')
+        headers = {} if body is None else {'Content-Type': 'application/json'}
+        for attempt in range(2):
+            try:
+                with self._connection() as conn:
+                    conn.request(method, path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    data = response.read()
+                    if response.will_close:
+                        conn.close()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Classification has no side effects, so a request on a stale keep-alive connection is safe to resend
+                if attempt == 1:
+                    raise
+
+        content = json.loads(data) if len(data) > 0 else {}
+        if response.status != 200:
+            raise ServiceError(response.status, content.get('error', response.reason))
+        return content
+
+    def health(self) -> dict:
+        """Returns the service's health status and the model key of its loaded models."""
+
+        return self._request('GET', '/health')
+
+    def stats(self) -> dict:
+        """Returns the service counters and, if enabled, its scheduler and cache statistics."""
+
+        return self._request('GET', '/stats')
+
+    @property
+    def model_key(self) -> str:
+        """The binary and multilabel model revisions loaded by the service (see InferenceHandler.model_key)."""
+
+        if self._model_key is None:
+            self._model_key = self.health()['model_key']
+        return self._model_key
+
+    def classify_text(self, input: str) -> dict:
+        """Classifies a text, returning the same result as InferenceHandler.classify_text."""
+
+        return self._request('POST', '/classify', {'text': input})
+
+    def classify_texts(self, inputs: list[str]) -> list[dict]:
+        """Classifies several texts in a single request, returning one classify_text result per text."""
+
+        return self._request('POST', '/classify/batch', {'texts': inputs})['results']
+
+    def classify_text_stream(self, input: str):
+        """Classifies a text, yielding the per-sentence results of each chunk as the service streams them (see InferenceHandler.classify_text_stream).
+
+        Parameters
+        ----------
+        input : str
+            The input text to be classified.
+
+        Yields
+        ------
+        list[dict[str, Any]]
+            The results of the next chunk of sentences.
+
+        Returns
+        -------
+        dict[str, Any]
+            The resulting classification and regression values for each sentence.
+
+        Raises
+        ------
+        ServiceError
+            If the service rejects the request or fails while streaming.
+        """
+
+        result = {'text_input': input, 'results': []}
+        with self._connection() as conn:
+            conn.request('POST', '/classify/stream', body=json.dumps({'text': input}).encode('utf-8'), headers={'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            if response.status != 200:
+                data = response.read()
+                raise ServiceError(response.status, json.loads(data).get('error', response.reason) if len(data) > 0 else response.reason)
+
+            # A generator closed before the stream ends raises GeneratorExit here, so the half-read connection is not reused
+            for line in response:
+                payload = json.loads(line)
+                if 'error' in payload:
+                    response.read()
+                    raise ServiceError(500, payload['error'])
+                if payload.get('done'):
+                    response.read()
+                    break
+                result['results'].extend(payload['results'])
+                yield payload['results']
+        return result
@@ -0,0 +1,191 @@
+"""
+Script file used for creating and resolving pinned local snapshots of the models and the punkt sentence tokenizer data.
+
+A snapshot is created once, with network access, by `python -m scripts.config snapshot`. It downloads the safetensors weights,
+configs and tokenizer files of both models at their configured (or latest) revisions into the models directory, and records the
+resolved commit hashes in a manifest. It also downloads the punkt data into the vendored nltk_data directory. In offline mode
+the InferenceHandler loads exclusively from these directories (memory-mapping the safetensors weights) and never contacts the
+Hub or the NLTK download server.
+"""
+
+import os
+import json
+
+from pathlib import Path
+from loguru import logger
+
+from scripts.config import (
+    OFFLINE_MODELS_DIR,
+    NLTK_DATA_DIR
+)
+
+MODEL_KINDS = ['binary', 'multilabel']
+MODEL_FILES = ['*.json', '*.safetensors', '*.txt', '*.model']
+MANIFEST_NAME = 'snapshot.json'
+PUNKT_RESOURCE = 'tokenizers/punkt_tab'
+
+def read_manifest(models_dir: Path = OFFLINE_MODELS_DIR) -> dict:
+    """Reads the manifest of a local snapshot.
+
+    Parameters
+    ----------
+    models_dir : Path, optional
+        The directory holding the snapshot (default is the configured models_dir).
+
+    Returns
+    -------
+    dict[str, dict[str, str]]
+        The repository id and pinned revision of each model kind, or an empty dict if no snapshot exists.
+    """
+
+    path = Path(models_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {}
+
+    with open(path) as f:
+        return json.load(f)
+
+def resolve_local_model(kind: str, repo_id: str, revision: str = None, models_dir: Path = OFFLINE_MODELS_DIR) -> tuple[Path, str]:
+    """Resolves the local snapshot directory of a model for offline loading.
+
+    Parameters
+    ----------
+    kind : str
+        The model kind, 'binary' or 'multilabel'.
+    repo_id : str
+        The repository id (or local path) of the model.
+    revision : str, optional
+        The revision the snapshot must have been pinned to (default is None, which accepts any revision).
+    models_dir : Path, optional
+        The directory holding the snapshot (default is the configured models_dir).
+
+    Returns
+    -------
+    tuple[Path, str | None]
+        The local directory of the model and its pinned revision.
+
+    Raises
+    ------
+    FileNotFoundError
+        If no snapshot of the model exists.
+    ValueError
+        If the snapshot was taken from a different repository or revision.
+    """
+
+    if os.path.isdir(repo_id):
+        return Path(repo_id), revision
+
+    entry = read_manifest(models_dir).get(kind)
+    path = Path(models_dir) / kind
+    if entry is None or not (path / 'config.json').exists():
+        raise FileNotFoundError(f'No local snapshot of the {kind} model in {models_dir} (run `python -m scripts.config snapshot` first).')
+
+    if entry['repo_id'] != repo_id or (revision is not None and revision != entry['revision']):
+        raise ValueError(
+            f"The local {kind} snapshot is {entry['repo_id']}@{entry['revision']}, but {repo_id}@{revision or 'latest'} is configured "
+            '(re-run `python -m scripts.config snapshot`).'
+        )
+
+    return path, entry['revision']
+
+def ensure_punkt(offline: bool, nltk_dir: Path = NLTK_DATA_DIR):
+    """Ensures the punkt data used by sent_tokenize is available, checking the vendored directory before any download.
+
+    Parameters
+    ----------
+    offline : bool
+        Whether downloading the data is forbidden.
+    nltk_dir : Path, optional
+        The vendored nltk_data directory (default is the configured nltk_data).
+
+    Raises
+    ------
+    LookupError
+        If the data is missing and offline is True.
+    """
+
+    import nltk
+
+    if str(nltk_dir) not in nltk.data.path:
+        nltk.data.path.insert(0, str(nltk_dir))
+
+    try:
+        nltk.data.find(PUNKT_RESOURCE)
+    except LookupError:
+        if offline:
+            raise LookupError(f'The punkt data is not vendored in {nltk_dir} (run `python -m scripts.config snapshot` first).')
+        nltk.download('punkt_tab')
+
+def _download_model(repo_id: str, revision: str, dest: Path, api_token: str = None):
+    """Downloads a model's files into dest, converting its weights to safetensors if the repository only has pickled weights."""
+
+    from huggingface_hub import snapshot_download
+
+    snapshot_download(repo_id=repo_id, revision=revision, token=api_token, local_dir=dest, allow_patterns=MODEL_FILES)
+    if any(dest.glob('*.safetensors')):
+        return
+
+    logger.info(f'{repo_id} has no safetensors weights, converting them...')
+    from transformers import AutoModelForSequenceClassification
+
+    snapshot_download(repo_id=repo_id, revision=revision, token=api_token, local_dir=dest, allow_patterns=['*.bin'])
+    model = AutoModelForSequenceClassification.from_pretrained(dest)
+    model.save_pretrained(dest, safe_serialization=True)
+    for path in dest.glob('*.bin'):
+        path.unlink()
+
+def create_snapshot(
+    api_token: str,
+    bin_repo: str,
+    ml_repo: str,
+    bin_revision: str = None,
+    ml_revision: str = None,
+    models_dir: Path = OFFLINE_MODELS_DIR,
+    nltk_dir: Path = NLTK_DATA_DIR
+) -> dict:
+    """Downloads both models and the punkt data into local directories for offline startup.
+
+    Parameters
+    ----------
+    api_token : str
+        The Hugging Face token used for the downloads.
+    bin_repo : str
+        The repository id of the binary classification model.
+    ml_repo : str
+        The repository id of the multilabel regression model.
+    bin_revision : str, optional
+        The revision of the binary classification model (default is None, which pins the latest).
+    ml_revision : str, optional
+        The revision of the multilabel regression model (default is None, which pins the latest).
+    models_dir : Path, optional
+        The directory the models are written to (default is the configured models_dir).
+    nltk_dir : Path, optional
+        The directory the punkt data is written to (default is the configured nltk_data).
+
+    Returns
+    -------
+    dict[str, dict[str, str]]
+        The snapshot manifest, i.e. the repository id and pinned commit hash of each model kind.
+    """
+
+    from huggingface_hub import HfApi
+
+    models_dir = Path(models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = {}
+    for kind, repo_id, revision in zip(MODEL_KINDS, (bin_repo, ml_repo), (bin_revision, ml_revision)):
+        sha = HfApi().model_info(repo_id, revision=revision, token=api_token).sha
+        logger.info(f'Downloading {repo_id}@{sha} to {models_dir / kind}...')
+        _download_model(repo_id, sha, models_dir / kind, api_token)
+        manifest[kind] = {'repo_id': repo_id, 'revision': sha}
+
+    with open(models_dir / MANIFEST_NAME, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    import nltk
+    if not nltk.download('punkt_tab', download_dir=str(nltk_dir)):
+        raise RuntimeError(f'Unable to download the punkt data to {nltk_dir}.')
+
+    logger.success(f'Snapshot created in {models_dir} and {nltk_dir}.')
+    return manifest
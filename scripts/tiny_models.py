@@ -0,0 +1,118 @@
+"""
+Script file used for building tiny, randomly initialized stand-ins for the binary classification and multilabel regression models.
+
+The stand-ins share the architecture, tokenizer type and label layout of the real models but are small enough to be built and
+run locally in seconds, without network access or the real HF repositories. They are used by the benchmark and load-testing
+tools, and are never meant to produce meaningful predictions.
+"""
+
+import random
+
+from pathlib import Path
+from loguru import logger
+
+# Word list used for the stand-in vocabulary and for generating synthetic text
+WORDS = (
+    'the a an and or but if of to in on at by for with from as is are was were be been being have has had do does did '
+    'not no all some any each every many few more most other such only own same so than too very can will just should '
+    'now people person women men children family community group official officials government policy law vote school '
+    'church religion faith race culture gender sexuality disability health news report statement city state country '
+    'said says told believe think know want need make made take give go come see look find use work call try ask '
+    'good bad new old great small large long little right wrong true false public private local national international '
+    'they them their we us our you your he she him her his it its this that these those who which what when where why how'
+).split()
+
+def synthetic_sentence(rng: random.Random, min_words: int = 4, max_words: int = 24) -> str:
+    """Generates a random sentence from the stand-in word list.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random number generator to draw words from.
+    min_words : int, optional
+        The minimum number of words in the sentence (default is 4).
+    max_words : int, optional
+        The maximum number of words in the sentence (default is 24).
+
+    Returns
+    -------
+    str
+        The capitalized, period-terminated sentence.
+    """
+
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    return ' '.join(words).capitalize() + '.'
+
+def synthetic_document(rng: random.Random, num_sentences: int) -> str:
+    """Generates a random document consisting of num_sentences synthetic sentences.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The random number generator to draw words from.
+    num_sentences : int
+        The number of sentences in the document.
+
+    Returns
+    -------
+    str
+        The document text.
+    """
+
+    return ' '.join(synthetic_sentence(rng) for _ in range(num_sentences))
+
+def build_tiny_checkpoints(dest: Path, seed: int = 0, hidden_size: int = 64, num_layers: int = 2, overwrite: bool = False) -> tuple[Path, Path]:
+    """Builds tiny BERT binary classification and multilabel regression checkpoints that share one tokenizer.
+
+    Parameters
+    ----------
+    dest : Path
+        The directory the 'binary' and 'multilabel' checkpoint directories are written to.
+    seed : int, optional
+        The seed used to initialize the weights (default is 0).
+    hidden_size : int, optional
+        The hidden size of the encoders (default is 64).
+    num_layers : int, optional
+        The number of encoder layers (default is 2).
+    overwrite : bool, optional
+        Whether to rebuild the checkpoints if they already exist (default is False).
+
+    Returns
+    -------
+    tuple[Path, Path]
+        The paths of the binary classification and multilabel regression checkpoints.
+    """
+
+    import torch
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    dest = Path(dest)
+    bin_path = dest / 'binary'
+    ml_path = dest / 'multilabel'
+    if not overwrite and (bin_path / 'config.json').exists() and (ml_path / 'config.json').exists():
+        return bin_path, ml_path
+
+    dest.mkdir(parents=True, exist_ok=True)
+    vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + sorted(set(WORDS)) + list('abcdefghijklmnopqrstuvwxyz0123456789.,!?\'"-')
+    with open(dest / 'vocab.txt', 'w') as f:
+        f.write('\n'.join(vocab))
+    tokenizer = BertTokenizerFast(str(dest / 'vocab.txt'), do_lower_case=True)
+
+    for path, num_labels, problem_type in ((bin_path, 2, 'single_label_classification'), (ml_path, 6, 'regression')):
+        torch.manual_seed(seed + num_labels)
+        config = BertConfig(
+            vocab_size=len(vocab),
+            hidden_size=hidden_size,
+            num_hidden_layers=num_layers,
+            num_attention_heads=max(hidden_size // 32, 1),
+            intermediate_size=hidden_size * 4,
+            max_position_embeddings=512,
+            num_labels=num_labels,
+            problem_type=problem_type
+        )
+        model = BertForSequenceClassification(config)
+        model.save_pretrained(path, safe_serialization=True)
+        tokenizer.save_pretrained(path)
+
+    logger.info(f'Built tiny stand-in checkpoints in {dest}.')
+    return bin_path, ml_path
@@ -167,13 +167,13 @@ set() {
     else
         case $1 in
             bin_repo)
-                python ./scripts/config.py -b "$2"
+                python -m scripts.config set -b "$2"
                 ;;
             ml_repo)
-                python ./scripts/config.py -m "$2"
+                python -m scripts.config set -m "$2"
                 ;;
             ds_repo)
-                python ./scripts/config.py -d "$2"
+                python -m scripts.config set -d "$2"
                 ;;
             *)
                 log_error "Invalid set option."
@@ -186,6 +186,19 @@ set() {
     fi
 }
 
+# ============================
+# ===   Bulk Classification  ==
+# ============================
+classify() {
+    cd "$PROJECT_ROOT" || return 1
+
+    if [[ $# -lt 2 ]]; then
+        log_error "Classify Command Requires an Input and Output Path."
+    else
+        python -m scripts.config classify "$@"
+    fi
+}
+
 # ============================
 # ===    Running the App   ===
 # ============================
@@ -226,6 +239,9 @@ help() {
     echo "      set bin_repo <repo ID>          - Sets the binary model's repo ID in the pyproject.toml file."
     echo "      set ml_repo <repo ID>           - Sets the multilabel model's repo ID in the pyproject.toml file."
     echo "      set ds_repo <repo ID>           - Sets the dataset repo ID in the pyproject.toml file."
+    echo "==========================================="
+    echo "  Bulk classification:"
+    echo "      classify <input> <output> [options]    - Classifies a CSV/JSONL/text file of documents into JSONL or Parquet."
 }
 
 log_info "Loading setup.sh script..."
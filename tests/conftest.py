@@ -0,0 +1,64 @@
+"""
+Shared fixtures of the test suite, built on the tiny stand-in models of scripts/tiny_models.py, so no network access or real
+model checkpoints are needed.
+"""
+
+import random
+import pytest
+import torch
+
+from scripts.tiny_models import build_tiny_checkpoints, synthetic_sentence
+
+def load_handler(checkpoints, **kwargs):
+    """Loads an InferenceHandler over the tiny checkpoints, with every optional stage disabled unless given."""
+
+    from scripts.predict import InferenceHandler
+
+    bin_path, ml_path = checkpoints
+    options = {
+        'use_cache': False,
+        'backend': 'eager',
+        'prefilter': False,
+        'dedup': False,
+        'student': False,
+        'low_memory': False,
+        'segmenter': 'regex',
+        **kwargs
+    }
+    return InferenceHandler(None, bin_repo=str(bin_path), ml_repo=str(ml_path), **options)
+
+@pytest.fixture(scope='session')
+def checkpoints(tmp_path_factory):
+    """The paths of the tiny binary and multilabel checkpoints, whose binary classifier flags about half of the sentences.
+
+    The randomly initialized classifier flags almost no sentence, so its bias is shifted by the median logit margin over a
+    sample of synthetic sentences, which makes both classes (and so the multilabel stage) occur.
+    """
+
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    bin_path, ml_path = build_tiny_checkpoints(tmp_path_factory.mktemp('models'), seed=0)
+
+    rng = random.Random(1)
+    sample = [synthetic_sentence(rng, 1, 40) for _ in range(64)]
+    tokenizer = AutoTokenizer.from_pretrained(bin_path)
+    model = AutoModelForSequenceClassification.from_pretrained(bin_path).eval()
+    with torch.no_grad():
+        logits = model(**tokenizer(sample, padding=True, return_tensors='pt')).logits
+        model.classifier.bias[1] -= (logits[:, 1] - logits[:, 0]).median()
+    model.save_pretrained(bin_path, safe_serialization=True)
+
+    return bin_path, ml_path
+
+@pytest.fixture(scope='session')
+def handler(checkpoints):
+    """A handler over the tiny checkpoints running the eager backend in fp32."""
+
+    return load_handler(checkpoints)
+
+@pytest.fixture
+def sentences():
+    """Synthetic sentences of 1 to 60 words, so that each batch mixes short and long (padded) sentences."""
+
+    rng = random.Random(0)
+    return [synthetic_sentence(rng, 1, 60) for _ in range(40)]
@@ -0,0 +1,62 @@
+import torch
+import pytest
+import importlib.util
+
+from conftest import load_handler
+from test_predict import assert_same_results
+from scripts.backends import EagerBackend, InferenceBackend, create_backend, compare_backends
+
+BACKENDS = [
+    'torchscript',
+    pytest.param('onnx', marks=pytest.mark.skipif(importlib.util.find_spec('onnxruntime') is None, reason='onnxruntime is not installed'))
+]
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backend_logits_match_eager(handler, sentences, backend):
+    report = compare_backends(handler, backends=[backend], sentences=sentences, repeats=1)
+    assert report[backend]['passed'], report[backend]
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_backend_results_match_eager(checkpoints, handler, sentences, backend):
+    other = load_handler(checkpoints, backend=backend)
+    assert other.model_key != handler.model_key
+    assert_same_results(other.classify_sentences(sentences), handler.classify_sentences(sentences), atol=1e-4)
+
+def test_backend_handles_batch_shapes(handler, sentences):
+    backend = create_backend('torchscript', handler.bin_model)
+    for batch in (sentences[:1], sentences[:5], sentences):
+        encoded = handler.bin_tokenizer(batch, padding=True, truncation=True, max_length=512, return_tensors='pt')
+        assert (backend.logits(encoded) - EagerBackend(handler.bin_model).logits(encoded)).abs().max().item() < 1e-4
+
+def test_unknown_backend(handler):
+    with pytest.raises(ValueError):
+        create_backend('tensorrt', handler.bin_model)
+
+@pytest.mark.skipif(importlib.util.find_spec('onnxruntime') is None, reason='onnxruntime is not installed')
+def test_onnx_export_follows_weights(checkpoints, handler, sentences, tmp_path):
+    import shutil
+    from transformers import AutoModelForSequenceClassification
+
+    model_dir = tmp_path / 'binary'
+    shutil.copytree(checkpoints[0], model_dir)
+    encoded = handler.bin_tokenizer(sentences, padding=True, return_tensors='pt')
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir).eval()
+    first = create_backend('onnx', model, model_dir)
+
+    with torch.no_grad():
+        model.classifier.bias.add_(1.0)
+    model.save_pretrained(model_dir, safe_serialization=True)
+    second = create_backend('onnx', model, model_dir)
+
+    assert second.onnx_path != first.onnx_path
+    assert not first.onnx_path.exists()
+    assert (second.logits(encoded) - EagerBackend(model).logits(encoded)).abs().max().item() < 1e-4
+    assert create_backend('onnx', model, model_dir).onnx_path == second.onnx_path
+
+def test_backends_must_implement_logits(handler):
+    class Incomplete(InferenceBackend):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete(handler.bin_model)
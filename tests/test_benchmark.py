@@ -0,0 +1,46 @@
+import pytest
+
+from scripts import benchmark
+from scripts.benchmark import _RatioBackend, _summarize, compare_to_baseline, run_benchmarks
+
+@pytest.mark.parametrize('ratio', [0.0, 1.0])
+def test_ratio_backend_forces_classes(handler, sentences, ratio):
+    bin_backend = handler.bin_backend
+    handler.bin_backend = _RatioBackend(bin_backend, ratio)
+    try:
+        results = handler.classify_sentences(sentences)
+    finally:
+        handler.bin_backend = bin_backend
+
+    assert all(result['binary_classification']['prediction_class'] == int(ratio) for result in results)
+
+def test_summarize():
+    summary = _summarize([0.001, 0.002, 0.003, 0.004], items=10)
+
+    assert summary['runs'] == 4
+    assert summary['p50_ms'] == pytest.approx(3.0)
+    assert summary['mean_ms'] == pytest.approx(2.5)
+    assert summary['throughput_per_s'] == pytest.approx(10 / 0.0025)
+
+def test_compare_to_baseline_flags_regressions():
+    baseline = {'measurements': {'a': {'p50_ms': 10.0}, 'b': {'p50_ms': 10.0}, 'cold_start': {'total_s': 2.0}, 'gone': {'p50_ms': 1.0}}}
+    results = {'measurements': {'a': {'p50_ms': 11.0}, 'b': {'p50_ms': 13.0}, 'cold_start': {'total_s': 1.0}, 'new': {'p50_ms': 1.0}}}
+
+    comparison = {entry['measurement']: entry for entry in compare_to_baseline(results, baseline, tolerance=0.2)}
+
+    assert set(comparison) == {'a', 'b', 'cold_start'}
+    assert not comparison['a']['regressed']
+    assert comparison['b']['regressed'] and comparison['b']['change'] == pytest.approx(0.3)
+    assert comparison['cold_start']['metric'] == 'total_s' and not comparison['cold_start']['regressed']
+
+def test_run_benchmarks(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, 'BENCHMARK_DIR', tmp_path)
+    results = run_benchmarks(doc_sizes=[1, 5], ratios=[0.0, 1.0], repeats=2, cold_start=False, render=False)
+
+    measurements = results['measurements']
+    for size in (1, 5):
+        for stage in ('tokenize', 'binary_forward', 'multilabel_forward', 'segment_regex', 'segment_offsets'):
+            assert measurements[f'{stage}/sentences={size}']['runs'] == 2
+        for ratio in (0.0, 1.0):
+            assert measurements[f'classify_text/sentences={size}/ratio={ratio}']['p50_ms'] > 0
+    assert results['peak_rss_mb'] > 0
@@ -0,0 +1,86 @@
+import json
+import pytest
+import numpy as np
+import pyarrow.parquet as pq
+
+import scripts.bulk as bulk
+from scripts.bulk import _JsonlWriter
+from scripts.results import CATEGORIES, SentenceResults
+
+def test_jsonl_scores_are_written_as_their_shortest_repr(tmp_path):
+    scores = np.full((2, len(CATEGORIES)), np.nan, dtype=np.float32)
+    scores[0] = 0.3
+    results = SentenceResults(['first', 'second'], np.array([1, 0]), scores)
+
+    writer = _JsonlWriter(tmp_path / 'results.jsonl', {})
+    writer.write_chunk(0, results.to_arrow(doc_id=[0, 0]))
+    writer.close()
+
+    lines = (tmp_path / 'results.jsonl').read_text().splitlines()
+    assert '"Gender": 0.3,' in lines[0]
+    assert json.loads(lines[1])['Gender'] is None
+    assert [json.loads(line)['prediction_class'] for line in lines] == [1, 0]
+
+def write_corpus(path, sentences, num_docs=23):
+    path.write_text('\n'.join(' '.join(sentences[idx % len(sentences):idx % len(sentences) + 3]) for idx in range(num_docs)) + '\n')
+    return path
+
+def interrupt_after(monkeypatch, num_chunks):
+    """Makes classify_documents fail once num_chunks chunks have been classified."""
+
+    calls = []
+    classify = bulk.classify_documents
+    def interrupted(*args, **kwargs):
+        if len(calls) == num_chunks:
+            raise KeyboardInterrupt
+        calls.append(1)
+        return classify(*args, **kwargs)
+    monkeypatch.setattr(bulk, 'classify_documents', interrupted)
+
+def read_output(path, output_format):
+    if output_format == 'jsonl':
+        return path.read_text()
+    return pq.read_table(path).to_pylist()
+
+@pytest.mark.parametrize('output_format', ['jsonl', 'parquet'])
+def test_resumed_run_matches_an_uninterrupted_run(handler, sentences, tmp_path, monkeypatch, output_format):
+    corpus = write_corpus(tmp_path / 'corpus.txt', sentences)
+    expected = tmp_path / f'expected.{output_format}'
+    bulk.classify_file(handler, corpus, expected, output_format, chunk_size=5)
+
+    output = tmp_path / f'resumed.{output_format}'
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 2)
+        with pytest.raises(KeyboardInterrupt):
+            bulk.classify_file(handler, corpus, output, output_format, chunk_size=5)
+    assert json.loads(bulk._checkpoint_path(output).read_text())['chunks_completed'] == 2
+
+    checkpoint = bulk.classify_file(handler, corpus, output, output_format, chunk_size=5)
+    assert checkpoint['documents_completed'] == 23 and checkpoint['chunks_completed'] == 5
+    assert read_output(output, output_format) == read_output(expected, output_format)
+
+@pytest.mark.parametrize('change', ['input', 'model'])
+def test_changed_run_starts_over(handler, sentences, tmp_path, monkeypatch, change):
+    corpus = write_corpus(tmp_path / 'corpus.txt', sentences)
+    output = tmp_path / 'results.jsonl'
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 2)
+        with pytest.raises(KeyboardInterrupt):
+            bulk.classify_file(handler, corpus, output, chunk_size=5)
+
+    if change == 'input':
+        write_corpus(corpus, sentences[1:], num_docs=12)
+    else:
+        monkeypatch.setattr(handler, 'model_key', handler.model_key + '-changed')
+
+    chunks = []
+    classify = bulk.classify_documents
+    monkeypatch.setattr(bulk, 'classify_documents', lambda *args: chunks.append(1) or classify(*args))
+    checkpoint = bulk.classify_file(handler, corpus, output, chunk_size=5)
+    assert len(chunks) == checkpoint['chunks_completed']
+    assert checkpoint['model_key'] == handler.model_key
+
+    expected = tmp_path / 'expected.jsonl'
+    bulk.classify_file(handler, corpus, expected, chunk_size=5)
+    assert checkpoint['documents_completed'] == (12 if change == 'input' else 23)
+    assert output.read_text() == expected.read_text()
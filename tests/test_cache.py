@@ -0,0 +1,63 @@
+import itertools
+
+import scripts.cache as cache_module
+from conftest import load_handler
+from scripts.cache import ResultCache
+
+def test_hits_return_the_uncached_results(handler, checkpoints, sentences, tmp_path):
+    expected = handler.classify_sentences(sentences)
+
+    cached = load_handler(checkpoints)
+    cached.cache = ResultCache(cached.model_key, disk_path=tmp_path / 'cache.db')
+    assert cached.classify_sentences(sentences) == expected
+    assert cached.classify_sentences(sentences) == expected
+    assert cached.cache.stats()['memory_hits'] == len(set(sentences))
+
+    # A new cache over the same store is served from disk
+    cached.cache = ResultCache(cached.model_key, disk_path=tmp_path / 'cache.db')
+    assert cached.classify_sentences(sentences) == expected
+    assert cached.cache.stats()['disk_hits'] == len(set(sentences))
+
+def test_memory_tier_evicts_the_least_recently_used():
+    cache = ResultCache('model', memory_entries=2)
+    cache.put_many({'a': (0, None), 'b': (0, None)})
+    cache.get_many(['a'])
+    cache.put_many({'c': (1, [0.5] * 6)})
+
+    assert set(cache.get_many(['a', 'b', 'c'])) == {'a', 'c'}
+    assert cache.stats()['evictions'] == 1
+
+def test_disk_tier_evicts_the_least_recently_used(tmp_path, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(cache_module.time, 'time', lambda: float(next(clock)))
+
+    cache = ResultCache('model', memory_entries=1, disk_path=tmp_path / 'cache.db', disk_entries=10)
+    for idx in range(10):
+        cache.put_many({f'key-{idx}': (0, None)})
+    cache.get_many(['key-0'])
+    cache.put_many({'key-10': (0, None)})
+
+    # The oldest entry that was not read again is evicted
+    assert cache.stats()['disk_entries'] == 10
+    assert set(cache.get_many([f'key-{idx}' for idx in range(11)])) == {f'key-{idx}' for idx in range(11)} - {'key-1'}
+
+    cache.put_many({f'new-{idx}': (0, None) for idx in range(25)})
+    assert cache.stats()['disk_entries'] == 10
+
+    # The tracked count matches the store when it is reopened
+    reopened = ResultCache('model', disk_path=tmp_path / 'cache.db', disk_entries=10)
+    assert reopened._disk_count == cache._disk_count == 10
+
+def test_entries_are_separate_per_model_key(tmp_path):
+    first = ResultCache('first', disk_path=tmp_path / 'cache.db')
+    second = ResultCache('second', disk_path=tmp_path / 'cache.db')
+    assert first.key('A sentence.') != second.key('A sentence.')
+
+    first.put_many({'shared': (1, [0.1] * 6)})
+    assert second.get_many(['shared']) == {}
+    assert first.get_many(['shared']) == {'shared': (1, [0.1] * 6)}
+
+    second.put_many({'other': (0, None)})
+    second.clear()
+    assert ResultCache('first', disk_path=tmp_path / 'cache.db').get_many(['shared']) == {'shared': (1, [0.1] * 6)}
+    assert first.stats()['disk_entries'] == 1 and second.stats()['disk_entries'] == 0
@@ -0,0 +1,69 @@
+import pytest
+import pandas as pd
+
+import scripts.datasets as datasets
+from scripts.datasets import MASTER_DATASET, ArrowDataset, DatasetCatalog, load_master_dataset
+
+@pytest.fixture
+def snapshot(tmp_path):
+    """A snapshot directory, named after its revision as snapshot_download names them, holding a 25-row master dataset."""
+
+    snapshot = tmp_path / 'snapshots' / 'abc123'
+    (snapshot / MASTER_DATASET).parent.mkdir(parents=True)
+    pd.DataFrame({
+        'TEXT': [f'Sentence number {idx}.' for idx in range(25)],
+        'DISCRIMINATORY': [idx % 2 for idx in range(25)]
+    }).to_csv(snapshot / MASTER_DATASET, index=False)
+    return snapshot
+
+def test_csv_is_converted_once_per_revision(snapshot, tmp_path, monkeypatch):
+    conversions = []
+    convert = ArrowDataset._convert
+    monkeypatch.setattr(ArrowDataset, '_convert', lambda self: conversions.append(self.csv_path) or convert(self))
+
+    cache_dir = tmp_path / 'cache'
+    first = DatasetCatalog(snapshot, cache_dir).master()
+    assert first.to_pandas().equals(pd.read_csv(snapshot / MASTER_DATASET))
+    assert first.stats['converted'] and first.arrow_path.parent.parent == cache_dir / 'abc123'
+
+    # A new catalog of the same revision reuses the converted file
+    second = DatasetCatalog(snapshot, cache_dir).master()
+    assert second.num_rows == 25 and not second.stats['converted']
+    assert len(conversions) == 1
+
+    # Another revision is converted again
+    other = tmp_path / 'snapshots' / 'def456'
+    (other / MASTER_DATASET).parent.mkdir(parents=True)
+    (other / MASTER_DATASET).write_bytes((snapshot / MASTER_DATASET).read_bytes())
+    third = DatasetCatalog(other, cache_dir).master()
+    third.load()
+    assert third.stats['converted'] and len(conversions) == 2
+
+def test_pages_are_indexed_by_position(snapshot, tmp_path):
+    ds = DatasetCatalog(snapshot, tmp_path / 'cache').master()
+    assert ds.num_pages(10) == 3
+
+    page = ds.page(2, 10)
+    assert list(page.index) == list(range(10, 20))
+    assert page['TEXT'].tolist() == [f'Sentence number {idx}.' for idx in range(10, 20)]
+
+    last = ds.page(3, 10)
+    assert list(last.index) == list(range(20, 25))
+
+def test_datasets_are_loaded_lazily(snapshot, tmp_path):
+    catalog = DatasetCatalog(snapshot, tmp_path / 'cache')
+    ds = catalog.master()
+    assert not ds.loaded and not ds.arrow_path.exists()
+    assert catalog.dataset(MASTER_DATASET) is ds
+
+    ds.page(1, 5)
+    assert ds.loaded and ds.arrow_path.exists()
+
+def test_missing_master_dataset(tmp_path, monkeypatch):
+    snapshot = tmp_path / 'snapshots' / 'empty'
+    snapshot.mkdir(parents=True)
+    monkeypatch.setattr(datasets, 'dataset_snapshot', lambda api_token=None: snapshot)
+
+    assert DatasetCatalog(snapshot, tmp_path / 'cache').master() is None
+    with pytest.raises(FileNotFoundError, match='master dataset'):
+        load_master_dataset()
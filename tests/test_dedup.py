@@ -0,0 +1,65 @@
+import numpy as np
+
+from conftest import load_handler
+from scripts.cache import ResultCache
+from scripts.dedup import NearDuplicateDetector
+
+def test_grouping_threshold():
+    detector = NearDuplicateDetector(threshold=0.8, num_perm=128)
+    base = 'the quick brown fox jumps over the lazy dog near the river bank today'
+    sentences = [
+        base,
+        base.upper() + '!',
+        base.replace('today', 'todays'),
+        'an entirely different sentence about the weather in the mountains'
+    ]
+    reps = detector.group(sentences)
+
+    # Equal once normalized, a one-character edit of a long sentence, and an unrelated sentence
+    assert reps.tolist() == [0, 0, 0, 3]
+    assert NearDuplicateDetector(threshold=0.99, num_perm=128).group(sentences).tolist() == [0, 0, 2, 3]
+
+def test_duplicates_only_match_representatives():
+    detector = NearDuplicateDetector(threshold=0.8, num_perm=128)
+    words = 'alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima'.split()
+
+    # Each sentence is a small edit of the previous one, so a chain through duplicates would drift from the first sentence
+    chain = [' '.join(words)]
+    for idx in range(6):
+        edited = list(chain[-1].split())
+        edited[idx] = edited[idx] + 'x'
+        chain.append(' '.join(edited))
+    reps = detector.group(chain)
+
+    assert all(reps[rep] == rep for rep in reps.tolist())
+    for idx, rep in enumerate(reps.tolist()):
+        if rep != idx:
+            sim = float(np.mean(detector.signature(chain[idx]) == detector.signature(chain[rep])))
+            assert sim >= detector.threshold
+
+def test_audit_sample_skips_exact_copies():
+    detector = NearDuplicateDetector(audit_rate=1.0)
+    sentences = ['X.', 'X.', 'X!']
+    reps = detector.group(sentences)
+    assert reps.tolist() == [0, 0, 0]
+    assert detector.audit_sample(sentences, reps) == [2]
+
+def test_audit_scores_duplicates_without_the_cache(checkpoints):
+    handler = load_handler(checkpoints, dedup=True)
+    handler.dedup = NearDuplicateDetector(audit_rate=1.0)
+    handler.cache = ResultCache(handler.model_key)
+
+    calls = []
+    infer = handler._infer
+    def counting_infer(sentences, *args, **kwargs):
+        calls.append(list(sentences))
+        return infer(sentences, *args, **kwargs)
+    handler._infer = counting_infer
+
+    handler.classify_sentences(['X.', 'X.', 'X!'])
+    stats = handler.dedup.stats()
+
+    # The representative is scored once, then only the near duplicate is audited with its own forward pass
+    assert calls == [['X.'], ['X!']]
+    assert stats['audited'] == 1
+    assert stats['exact_duplicates'] == 1 and stats['near_duplicates'] == 1
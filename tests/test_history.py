@@ -0,0 +1,35 @@
+from scripts.history import HistoryStore
+from scripts.results import CATEGORIES
+
+def make_result(text: str) -> dict:
+    return {
+        'text_input': text,
+        'results': [
+            {
+                'sentence': 'Ünïcödé sentence 😀',
+                'binary_classification': {'classification': 'Discriminatory', 'prediction_class': 1},
+                'multilabel_regression': dict(zip(CATEGORIES, [0.25] * len(CATEGORIES)))
+            },
+            {
+                'sentence': 'x' * 500,
+                'binary_classification': {'classification': 'Non-Discriminatory', 'prediction_class': 0},
+                'multilabel_regression': None
+            }
+        ]
+    }
+
+def test_spilled_entries_round_trip(tmp_path):
+    history = HistoryStore(CATEGORIES, max_entries=1, spill_dir=tmp_path)
+    history.append(make_result('first'))
+    history.append(make_result('second'))
+
+    spilled = history.get(0)
+    assert spilled.to_result() == make_result('first')
+    assert history.last() == make_result('second')
+
+def test_sentences_are_not_padded_to_the_longest():
+    history = HistoryStore(CATEGORIES, spill_dir=None)
+    history.append(make_result('text'))
+    entry = history.get(0)
+    assert entry.results.sentences == [sent['sentence'] for sent in make_result('text')['results']]
+    assert entry.nbytes < 2 * 4 * 500
@@ -0,0 +1,63 @@
+import copy
+import pytest
+import torch
+
+from conftest import load_handler
+from scripts.memory import bf16_supported, check_drift, dedupe_tensors, memory_breakdown
+
+requires_bf16 = pytest.mark.skipif(not bf16_supported(), reason='bf16 is not supported on this CPU')
+
+@pytest.fixture(scope='module')
+def low_memory_handler(checkpoints):
+    return load_handler(checkpoints, low_memory=True)
+
+def test_dedupe_tensors_shares_identical_tensors(handler, sentences):
+    source = handler.bin_model
+    target = copy.deepcopy(source)
+    encoded = handler.bin_tokenizer(sentences, padding=True, return_tensors='pt')
+    with torch.no_grad():
+        expected = target(**encoded).logits
+
+    before = memory_breakdown({'source': source, 'target': target})
+    deduplicated = dedupe_tensors(source, target)
+    after = memory_breakdown({'source': source, 'target': target})
+
+    # Every parameter and buffer (including the non-persistent ones, which are not in the state dict) is shared
+    assert deduplicated['tensors'] >= len(target.state_dict()) and deduplicated['bytes'] > 0
+    assert after['total_bytes'] == before['total_bytes'] - deduplicated['bytes']
+    assert after['target']['shared_bytes'] == deduplicated['bytes']
+    with torch.no_grad():
+        assert torch.equal(target(**encoded).logits, expected)
+
+def test_dedupe_tensors_keeps_different_tensors(handler):
+    target = copy.deepcopy(handler.bin_model)
+    with torch.no_grad():
+        target.classifier.weight.add_(1.0)
+
+    dedupe_tensors(handler.bin_model, target)
+    assert target.classifier.weight is not handler.bin_model.classifier.weight
+    assert target.bert.embeddings.word_embeddings.weight is handler.bin_model.bert.embeddings.word_embeddings.weight
+
+@requires_bf16
+def test_low_memory_keeps_bf16_weights(handler, low_memory_handler):
+    breakdown = low_memory_handler.memory_breakdown()
+
+    assert low_memory_handler.bin_model.dtype == torch.bfloat16
+    assert breakdown['bin_model']['dtype'] == 'bfloat16'
+    assert breakdown['tokenizer_shared']
+    assert breakdown['total_bytes'] < handler.memory_breakdown()['total_bytes'] / 1.9
+    assert not any(param.requires_grad for param in low_memory_handler.bin_model.parameters())
+
+@requires_bf16
+def test_low_memory_results_are_keyed_apart(handler, low_memory_handler):
+    assert low_memory_handler.model_key.endswith('|bfloat16')
+    assert handler.model_key.endswith('|float32')
+
+@requires_bf16
+def test_low_memory_drift_within_tolerance(handler, low_memory_handler, sentences):
+    # The centred stand-in classifier scores every sentence close to 0.5, so prediction flips are expected and not checked
+    report = check_drift(handler, low_memory_handler, sentences, atol=0.05, max_flips=len(sentences))
+
+    assert report['passed']
+    assert report['max_probability_drift'] <= 0.05
+    assert report['max_score_drift'] <= 0.05
@@ -0,0 +1,126 @@
+import threading
+import pytest
+
+from scripts import metrics
+from scripts.metrics import Histogram, MetricsRegistry
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = MetricsRegistry()
+    monkeypatch.setattr(metrics, 'REGISTRY', registry)
+    return registry
+
+def test_histogram_bucket_boundaries():
+    histogram = Histogram((1, 2, 4))
+    for value in (0.5, 1, 1.5, 2, 4, 4.5):
+        histogram.observe(value)
+
+    # A value equal to a bound falls in that bound's bucket (Prometheus buckets are "less than or equal")
+    assert histogram.counts == [2, 2, 1, 1]
+    assert histogram.count == 6 and histogram.sum == pytest.approx(13.5)
+    assert histogram.quantile(0.3) == 1
+    assert histogram.quantile(0.5) == 2
+    assert histogram.quantile(1.0) == 4
+    assert Histogram((1, 2)).quantile(0.5) == 0.0
+
+def test_registry_keeps_labelled_series_apart(registry):
+    registry.observe('stage_seconds', 0.01, stage='tokenize')
+    registry.observe('stage_seconds', 0.02, stage='tokenize')
+    registry.observe('stage_seconds', 0.5, stage='binary')
+    registry.inc('tokens_total', 10, stage='binary')
+    registry.inc('tokens_total', 5, stage='binary')
+    registry.inc('requests_total')
+
+    snapshot = registry.snapshot()
+    histograms = {h['stage']: h for h in snapshot['histograms']}
+    assert histograms['tokenize']['count'] == 2 and histograms['tokenize']['sum'] == pytest.approx(0.03)
+    assert histograms['binary']['count'] == 1
+    assert {(c['name'], c.get('stage')): c['value'] for c in snapshot['counters']} == {
+        ('requests_total', None): 1,
+        ('tokens_total', 'binary'): 15
+    }
+
+    registry.reset()
+    assert registry.snapshot() == {'histograms': [], 'counters': []}
+
+def test_nested_tracking_joins_the_outer_request(registry):
+    with metrics.track(True) as outer:
+        with metrics.stage('sentence_split'):
+            metrics.count('sentences', 3)
+        with metrics.track(True) as inner:
+            assert inner is outer
+            with metrics.stage('binary'):
+                metrics.record_batch(3, 12, 16)
+        assert metrics.current() is outer
+
+    assert metrics.current() is None
+    assert set(outer.stages) == {'sentence_split', 'binary'}
+    assert outer.batches == [{'stage': 'binary', 'size': 3, 'tokens': 12, 'padded_tokens': 16}]
+    assert outer.as_dict()['padding_waste'] == pytest.approx(0.25)
+
+    # The request is recorded once, when the outermost context ends
+    counters = {(c['name'], c.get('stage')): c['value'] for c in registry.snapshot()['counters']}
+    assert counters[('requests_total', None)] == 1
+    assert counters[('sentences_total', None)] == 3
+    assert counters[('padded_tokens_total', 'binary')] == 16
+
+def test_untracked_code_records_nothing(registry):
+    with metrics.track(False) as request:
+        assert request is None
+        with metrics.stage('binary'):
+            metrics.count('sentences')
+            metrics.record_batch(1, 1, 1)
+    assert registry.snapshot() == {'histograms': [], 'counters': []}
+
+def test_tracking_is_local_to_the_context(registry):
+    seen = []
+    with metrics.track(True) as request:
+        thread = threading.Thread(target=lambda: seen.append(metrics.current()))
+        thread.start()
+        thread.join()
+
+        # Code that would not track on its own still joins the request being tracked
+        with metrics.track(False) as joined:
+            assert joined is request
+    assert seen == [None]
+
+    # A resumed request is tracked inside the context only, and is not recorded when it ends
+    other = metrics.RequestMetrics()
+    with metrics.resume(other):
+        assert metrics.current() is other
+    assert metrics.current() is None
+    assert [c['value'] for c in registry.snapshot()['counters'] if c['name'] == 'requests_total'] == [1]
+
+def test_prometheus_text_output(registry):
+    registry.observe('batch_size', 3, metrics.BATCH_SIZE_BUCKETS, stage='binary')
+    registry.observe('batch_size', 8, metrics.BATCH_SIZE_BUCKETS, stage='binary')
+    registry.inc('sentences_total', 11)
+    registry.inc('custom_total', 2)
+    registry.observe('custom_seconds', 0.1)
+    lines = registry.to_prometheus().splitlines()
+
+    assert '# HELP nlpinitiative_batch_size Number of sentences per forward pass.' in lines
+    assert '# TYPE nlpinitiative_batch_size histogram' in lines
+    assert 'nlpinitiative_batch_size_bucket{stage="binary",le="2"} 0' in lines
+    assert 'nlpinitiative_batch_size_bucket{stage="binary",le="4"} 1' in lines
+    assert 'nlpinitiative_batch_size_bucket{stage="binary",le="8"} 2' in lines
+    assert 'nlpinitiative_batch_size_bucket{stage="binary",le="+Inf"} 2' in lines
+    assert 'nlpinitiative_batch_size_sum{stage="binary"} 11.0' in lines
+    assert 'nlpinitiative_batch_size_count{stage="binary"} 2' in lines
+    assert '# TYPE nlpinitiative_sentences_total counter' in lines
+    assert 'nlpinitiative_sentences_total 11' in lines
+
+    # Metrics without help text are still typed from what they hold
+    assert '# TYPE nlpinitiative_custom_total counter' in lines
+    assert '# TYPE nlpinitiative_custom_seconds histogram' in lines
+
+def test_every_emitted_metric_has_help_text():
+    import re
+    from pathlib import Path
+
+    root = Path(metrics.__file__).resolve().parents[1]
+    emitted = set()
+    for path in list((root / 'scripts').glob('*.py')) + [root / 'app.py']:
+        emitted |= set(re.findall(r"REGISTRY\.(?:inc|observe)\('([a-z_]+)'", path.read_text()))
+    emitted |= {'request_seconds', 'batch_size', 'padding_waste_ratio', 'requests_total', 'sentences_total', 'tokens_total'}
+    assert emitted - set(metrics._HELP) == set()
@@ -0,0 +1,75 @@
+import pytest
+import threading
+import multiprocessing as mp
+
+from concurrent.futures import Future
+
+import scripts.pool as pool_module
+from scripts.pool import InferencePool
+
+def test_collector_survives_a_pipe_closed_while_waiting(monkeypatch):
+    # A bare pool, without workers, whose single result pipe is fed by the test
+    pool = InferencePool.__new__(InferencePool)
+    pool._lock = threading.Lock()
+    pool._closed = False
+    result_recv, result_send = mp.Pipe(duplex=False)
+    pool._results = [result_recv]
+    future = Future()
+    pool._pending = {0: (future, 0, 'ping', None, 1)}
+
+    # The first wait fails as it would if the monitor closed a dead worker's pipe after the snapshot
+    calls = []
+    real_wait = pool_module.wait
+    def flaky_wait(conns, timeout=None):
+        calls.append(len(conns))
+        if len(calls) == 1:
+            raise OSError(9, 'Bad file descriptor')
+        return real_wait(conns, timeout)
+    monkeypatch.setattr(pool_module, 'wait', flaky_wait)
+
+    collector = threading.Thread(target=pool._collect, daemon=True)
+    collector.start()
+    result_send.send((0, True, 'pong'))
+    try:
+        assert future.result(timeout=5) == 'pong'
+    finally:
+        pool._closed = True
+        collector.join(timeout=5)
+        result_send.close()
+        result_recv.close()
+    assert len(calls) >= 2
+
+def assert_same_outcomes(outcomes, expected):
+    assert len(outcomes) == len(expected)
+    for (pred_class, scores), (expected_class, expected_scores) in zip(outcomes, expected):
+        assert pred_class == expected_class
+        assert (scores is None) == (expected_scores is None)
+        if scores is not None:
+            assert scores == pytest.approx(expected_scores, abs=1e-5)
+
+@pytest.fixture(scope='module')
+def spawned_pool(handler):
+    # The monitor only checks the workers every few seconds, so a killed worker still has tasks sent to it before its restart
+    pool = InferencePool(handler, workers=2, threads_per_worker=1, start_method='spawn', health_interval=3.0)
+    yield pool
+    pool.close()
+
+def test_spawned_workers_match_local_inference(handler, spawned_pool, sentences):
+    assert [entry['responsive'] for entry in spawned_pool.health(timeout=60)] == [True, True]
+    for batch_size in (4, 64):
+        assert_same_outcomes(spawned_pool.infer(sentences, batch_size), handler._infer(sentences, batch_size))
+
+def test_killed_worker_is_restarted_and_its_tasks_redispatched(handler, spawned_pool, sentences):
+    spawned_pool.health(timeout=60)
+    proc = spawned_pool._procs[0]
+    proc.kill()
+    proc.join()
+
+    # Both shards are sent while worker 0 is dead, so its shard is only completed once the monitor restarts the worker
+    assert_same_outcomes(spawned_pool.infer(sentences, 8), handler._infer(sentences, 8))
+    assert spawned_pool._restarts == [1, 0]
+    assert spawned_pool._procs[0].pid != proc.pid
+
+    report = spawned_pool.health(timeout=60)
+    assert [entry['responsive'] for entry in report] == [True, True]
+    assert report[0]['restarts'] == 1
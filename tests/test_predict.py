@@ -0,0 +1,70 @@
+import pytest
+
+from scripts.results import CATEGORIES
+
+def per_sentence_results(handler, sentences):
+    """Classifies each sentence on its own, as InferenceHandler.classify_text did before batching."""
+
+    results = []
+    for sent in sentences:
+        classification, pred_class = handler.discriminatory_inference(sent)
+        result = {
+            'sentence': sent,
+            'binary_classification': {'classification': classification, 'prediction_class': pred_class},
+            'multilabel_regression': None
+        }
+        if pred_class == 1:
+            scores = handler.category_inference(sent)
+            result['multilabel_regression'] = {cat: min(max(scores[idx], 0.0), 1.0) for idx, cat in enumerate(CATEGORIES)}
+        results.append(result)
+    return results
+
+def assert_same_results(batched, expected, atol=1e-5):
+    assert len(batched) == len(expected)
+    for result, reference in zip(batched, expected):
+        assert result['sentence'] == reference['sentence']
+        assert result['binary_classification'] == reference['binary_classification']
+        if reference['multilabel_regression'] is None:
+            assert result['multilabel_regression'] is None
+        else:
+            assert result['multilabel_regression'].keys() == reference['multilabel_regression'].keys()
+            for cat, score in reference['multilabel_regression'].items():
+                assert result['multilabel_regression'][cat] == pytest.approx(score, abs=atol)
+
+def test_both_classes_occur(handler, sentences):
+    classes = {result['binary_classification']['prediction_class'] for result in handler.classify_sentences(sentences)}
+    assert classes == {0, 1}
+
+@pytest.mark.parametrize('max_batch_size', [1, 7, 64])
+def test_batched_matches_per_sentence(handler, sentences, max_batch_size):
+    assert_same_results(handler.classify_sentences(sentences, max_batch_size), per_sentence_results(handler, sentences))
+
+def test_classify_text_matches_per_sentence(handler, sentences):
+    text = ' '.join(sentences)
+    result = handler.classify_text(text, with_metrics=False)
+
+    assert result['text_input'] == text
+    assert_same_results(result['results'], per_sentence_results(handler, handler.segmenter.split(text)))
+
+def test_stream_matches_classify_text(handler, sentences):
+    text = ' '.join(sentences)
+    stream = handler.classify_text_stream(text, chunk_size=6, with_metrics=False)
+
+    chunks = []
+    while True:
+        try:
+            chunks.append(next(stream))
+        except StopIteration as stop:
+            final = stop.value
+            break
+
+    assert all(len(chunk) <= 6 for chunk in chunks)
+    assert [result for chunk in chunks for result in chunk] == final['results']
+    assert_same_results(final['results'], handler.classify_text(text, with_metrics=False)['results'])
+
+@pytest.mark.parametrize('text', ['', ' ', '\n\t  \n'])
+def test_empty_or_whitespace_input(handler, text):
+    assert handler.classify_text(text, with_metrics=False) == {'text_input': text, 'results': []}
+
+def test_empty_sentence_list(handler):
+    assert handler.classify_sentences([]) == []
@@ -0,0 +1,36 @@
+import numpy as np
+
+from scripts.prefilter import HashedNgramPrefilter, evaluate_cascade, segment_rows, train_prefilter
+from scripts.segmenters import RegexSegmenter
+
+ROWS = [
+    'They are lazy and stupid. The weather was nice today.',
+    'Those people are criminals. We went to the market.',
+    'The train was late. I had coffee with a friend.',
+    'We planted tomatoes. The meeting ran long.'
+] * 10
+LABELS = [1, 1, 0, 0] * 10
+
+def test_segment_rows_labels_sentences_with_their_row():
+    texts, labels, groups = segment_rows(ROWS, LABELS, [0, 2], RegexSegmenter().split)
+    assert texts == RegexSegmenter().split(ROWS[0]) + RegexSegmenter().split(ROWS[2])
+    assert labels.tolist() == [1, 1, 0, 0]
+    assert groups.tolist() == [0, 0, 1, 1]
+
+def test_recall_lost_counts_a_row_once_all_its_sentences_are_cleared():
+    texts, labels, groups = segment_rows(ROWS, LABELS, range(4), RegexSegmenter().split)
+    prefilter = HashedNgramPrefilter().fit(texts, labels, epochs=5, seed=0)
+    probs = prefilter.predict_proba(texts)
+
+    # A threshold between the two sentences of the first row clears one of them, which does not lose the row
+    threshold = float(np.sort(probs[groups == 0]).mean())
+    entry = evaluate_cascade(prefilter, texts, labels, [threshold], groups=groups)[0]
+    row_max = [probs[groups == g].max() for g in range(4)]
+    assert entry['cleared_positives'] == sum(1 for g in range(2) if row_max[g] < threshold)
+    assert entry['skip_rate'] == float((probs < threshold).mean())
+
+def test_train_prefilter_on_sentences():
+    _, report = train_prefilter(ROWS, LABELS, test_size=0.25, seed=0, epochs=2, segment=RegexSegmenter().split)
+    assert report['train_size'] == 30 and report['test_size'] == 10
+    assert report['train_sentences'] == 60 and report['test_sentences'] == 20
+    assert all(0.0 <= entry['recall_lost'] <= 1.0 for entry in report['thresholds'])
@@ -0,0 +1,77 @@
+import pytest
+
+import scripts.config
+import scripts.predict
+import scripts.reloader as reloader_module
+from scripts.metrics import MetricsRegistry
+from scripts.config import read_repositories
+from scripts.registry import clear_registry, loaded_handlers, register_inference_handler
+from scripts.reloader import ModelReloader
+
+class StubHandler:
+    def __init__(self, *args, **kwargs):
+        self.pool = None
+        self.collect_metrics = False
+        self.model_key = 'stub'
+        self.load_times = {}
+
+    def warmup(self):
+        pass
+
+@pytest.fixture
+def reloader(monkeypatch):
+    monkeypatch.setattr(reloader_module, 'POOL_ENABLED', False)
+    monkeypatch.setattr(reloader_module, 'SCHEDULER_ENABLED', False)
+    clear_registry()
+    register_inference_handler(StubHandler(), **read_repositories())
+    reloader = ModelReloader(poll_interval=0)
+    yield reloader
+    reloader.close()
+    clear_registry()
+
+def test_failed_forced_reload_keeps_the_active_handler_registered(reloader, monkeypatch):
+    active = reloader.current().handler
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('download failed')
+    monkeypatch.setattr(scripts.predict, 'InferenceHandler', fail)
+
+    assert not reloader.reload(force=True)
+    assert reloader.current().handler is active
+    assert list(loaded_handlers().values()) == [active]
+
+def test_forced_reload_swaps_in_new_models(reloader, monkeypatch):
+    active = reloader.current().handler
+    monkeypatch.setattr(scripts.predict, 'InferenceHandler', StubHandler)
+
+    assert reloader.reload(force=True)
+    assert reloader.current().handler is not active
+    assert list(loaded_handlers().values()) == [reloader.current().handler]
+
+def test_missing_config_falls_back_to_the_imported_repositories(reloader, monkeypatch, tmp_path):
+    monkeypatch.setattr(scripts.config, 'ROOT', tmp_path)
+    monkeypatch.setattr(reloader_module, 'CONFIG_PATH', tmp_path / 'config.toml')
+    assert read_repositories() == {
+        'bin_repo': scripts.config.BIN_REPO,
+        'ml_repo': scripts.config.ML_REPO,
+        'bin_revision': scripts.config.BIN_REVISION,
+        'ml_revision': scripts.config.ML_REVISION
+    }
+
+    # The repositories did not change, so nothing is reloaded
+    assert not reloader.reload()
+    other = ModelReloader(poll_interval=0)
+    assert other.current().handler is reloader.current().handler
+    other.close()
+
+def test_reload_metrics_are_typed():
+    registry = MetricsRegistry()
+    registry.observe('model_load_seconds', 1.5)
+    registry.observe('model_swap_seconds', 0.001)
+    registry.inc('model_reloads_total')
+    text = registry.to_prometheus()
+
+    assert '# TYPE nlpinitiative_model_load_seconds histogram' in text
+    assert '# TYPE nlpinitiative_model_swap_seconds histogram' in text
+    assert '# TYPE nlpinitiative_model_reloads_total counter' in text
+    assert 'untyped' not in text
@@ -0,0 +1,73 @@
+from streamlit.testing.v1 import AppTest
+
+from scripts.config import RENDER_PAGE_SIZE
+
+def render_app(num_sentences: int, chunk_size: int, virtualize_after: int):
+    """Streams synthetic results, in which every third sentence is discriminatory, into build_result_tree."""
+
+    import streamlit as st
+    from scripts.rendering import build_result_tree
+    from scripts.results import CATEGORIES
+
+    results = []
+    for idx in range(num_sentences):
+        flagged = idx % 3 == 0
+        results.append({
+            'sentence': f'Sentence text {idx + 1}.',
+            'binary_classification': {
+                'classification': 'Discriminatory' if flagged else 'Non-Discriminatory',
+                'prediction_class': int(flagged)
+            },
+            'multilabel_regression': {cat: 0.5 for cat in CATEGORIES} if flagged else None
+        })
+
+    def stream():
+        for start in range(0, len(results), chunk_size):
+            yield results[start:start + chunk_size]
+        return {'text_input': 'Input text.', 'results': results}
+
+    build_result_tree(st.container(), {'text_input': 'Input text.'}, stream(), virtualize_after=virtualize_after)
+
+def run(num_sentences: int, chunk_size: int = 4, virtualize_after: int = 10) -> AppTest:
+    at = AppTest.from_function(render_app, args=(num_sentences, chunk_size, virtualize_after), default_timeout=30)
+    return at.run()
+
+def page_html(at: AppTest) -> str:
+    return next(md.value for md in at.markdown if '<details' in md.value)
+
+def shown_sentences(at: AppTest) -> list[int]:
+    import re
+    return [int(num) for num in re.findall(r'Sentence #(\d+)</summary>', page_html(at))]
+
+def test_small_results_render_one_expander_per_sentence():
+    at = run(5, chunk_size=2)
+    assert not at.exception
+    assert [exp.label for exp in at.expander] == [f'Sentence #{idx}' for idx in range(1, 6)]
+    assert 'Detected Discriminatory Sentiment' in at.markdown[0].value
+    assert len(at.toggle) == 0 and len(at.dataframe) == 0
+
+def test_large_results_switch_to_the_paginated_view():
+    num_sentences = 2 * RENDER_PAGE_SIZE + 5
+    at = run(num_sentences)
+    assert not at.exception
+
+    # Past virtualize_after the sentences are no longer rendered one expander each
+    assert len(at.expander) == 0
+    flagged = [idx for idx in range(num_sentences) if idx % 3 == 0]
+    assert any(md.value == f'##### Sentence Breakdown: {len(flagged)} of {num_sentences} sentences flagged' for md in at.markdown)
+    assert at.dataframe[0].value['#'].tolist() == [idx + 1 for idx in flagged]
+
+    assert shown_sentences(at) == list(range(1, RENDER_PAGE_SIZE + 1))
+    at.number_input[0].set_value(3).run()
+    assert shown_sentences(at) == list(range(2 * RENDER_PAGE_SIZE + 1, num_sentences + 1))
+
+    at.toggle[0].set_value(True).run()
+    assert shown_sentences(at) == [idx + 1 for idx in flagged[:RENDER_PAGE_SIZE]]
+    assert 'Sentence text 2.' not in page_html(at)
+
+def test_switch_happens_while_streaming():
+    # Exactly virtualize_after sentences keep the per-sentence view, one more switches to the large view
+    assert len(run(10, chunk_size=5).expander) == 10
+    at = run(11, chunk_size=5)
+    assert len(at.expander) == 0 and len(at.toggle) == 1
+    assert shown_sentences(at) == list(range(1, 12))
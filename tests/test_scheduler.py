@@ -0,0 +1,74 @@
+import random
+import asyncio
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from test_predict import assert_same_results
+from scripts.scheduler import BatchScheduler, SchedulerClosed, SchedulerFull
+from scripts.tiny_models import synthetic_sentence
+
+@pytest.fixture
+def scheduler(handler):
+    scheduler = BatchScheduler(handler, max_wait_ms=5, max_batch_sentences=32, bucket_width=4)
+    yield scheduler
+    scheduler.close()
+
+@pytest.fixture
+def texts():
+    rng = random.Random(2)
+    return [' '.join(synthetic_sentence(rng, 1, 40) for _ in range(rng.randint(1, 6))) for _ in range(48)]
+
+def test_threaded_callers_match_the_handler(handler, scheduler, texts):
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(scheduler.classify_text, texts))
+
+    for text, result in zip(texts, results):
+        assert result['text_input'] == text
+        assert_same_results(result['results'], handler.classify_text(text)['results'])
+
+    # The callers shared forward passes
+    stats = scheduler.stats()
+    assert stats['requests'] == len(texts) and stats['batches'] < len(texts)
+
+def test_async_callers_match_the_handler(handler, scheduler, texts):
+    async def classify_all():
+        return await asyncio.gather(*[scheduler.classify_text_async(text) for text in texts])
+
+    for text, result in zip(texts, asyncio.run(classify_all())):
+        assert result['text_input'] == text
+        assert_same_results(result['results'], handler.classify_text(text)['results'])
+
+def test_stream_matches_the_handler(handler, scheduler, sentences):
+    text = ' '.join(sentences)
+    chunks = list(scheduler.classify_text_stream(text, chunk_size=7))
+    assert [len(chunk) for chunk in chunks] == [7] * 5 + [5]
+    assert_same_results([result for chunk in chunks for result in chunk], handler.classify_text(text)['results'])
+
+def test_full_queue_rejects_requests(handler):
+    # The batch is never due, so the queued sentences stay pending
+    scheduler = BatchScheduler(handler, max_wait_ms=60000, max_batch_sentences=1000, max_pending_sentences=5)
+    try:
+        pending = scheduler.submit(['One.', 'Two.', 'Three.'])
+        with pytest.raises(SchedulerFull):
+            scheduler.submit(['Four.', 'Five.', 'Six.'], block=False)
+        with pytest.raises(SchedulerFull):
+            scheduler.submit(['Four.', 'Five.', 'Six.'], timeout=0.05)
+        assert scheduler.stats()['rejected'] == 2
+
+        # A request that fits is still queued
+        scheduler.submit(['Four.', 'Five.'], block=False)
+        assert scheduler.stats()['queue_depth'] == 5
+    finally:
+        scheduler.close()
+
+    with pytest.raises(SchedulerClosed):
+        pending.result(timeout=5)
+
+def test_closed_scheduler_rejects_requests(handler):
+    scheduler = BatchScheduler(handler)
+    scheduler.close()
+    with pytest.raises(SchedulerClosed):
+        scheduler.submit(['A sentence.'])
+    with pytest.raises(SchedulerClosed):
+        scheduler.classify_text('A sentence.')
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from scripts.score_index import PROBABILITY_COLUMN, build_score_index, join_scores, load_score_index, row_hash
+
+def test_rebuild_only_scores_new_and_changed_rows(handler, sentences, tmp_path, monkeypatch):
+    texts = sentences[:10]
+    first = build_score_index(handler, texts, tmp_path)
+    assert first['scored'] == 10 and first['reused'] == 0
+    before = load_score_index(handler.model_key, tmp_path)
+
+    scored_texts = []
+    score_texts = handler.score_texts
+    monkeypatch.setattr(handler, 'score_texts', lambda batch, *args: scored_texts.extend(batch) or score_texts(batch, *args))
+
+    changed = texts[:3] + [texts[3] + ' Changed.'] + texts[4:] + [sentences[10]]
+    second = build_score_index(handler, changed, tmp_path)
+    after = load_score_index(handler.model_key, tmp_path)
+
+    assert second['scored'] == 2 and second['reused'] == 9 and second['texts'] == 11
+    assert sorted(scored_texts) == sorted([texts[3] + ' Changed.', sentences[10]])
+
+    # The unchanged rows keep their scores, and the hash of the changed row's old text is dropped
+    kept = [row_hash(text) for text in texts if text != texts[3]]
+    pd.testing.assert_frame_equal(after.loc[kept], before.loc[kept])
+    assert row_hash(texts[3]) not in after.index
+    assert set(after.index) == {row_hash(text) for text in changed}
+
+def test_join_scores_with_duplicate_texts(handler, sentences, tmp_path):
+    build_score_index(handler, sentences[:3], tmp_path)
+    index = load_score_index(handler.model_key, tmp_path)
+
+    df = pd.DataFrame(
+        {'text': [sentences[0], sentences[1], sentences[0], 'Not indexed.'], 'label': [1, 0, 1, 0]},
+        index=[10, 11, 12, 13]
+    )
+    joined = join_scores(df, 'text', index)
+
+    assert list(joined.index) == [10, 11, 12, 13]
+    assert joined['label'].tolist() == [1, 0, 1, 0]
+    expected = index.loc[row_hash(sentences[0]), PROBABILITY_COLUMN]
+    assert joined.loc[10, PROBABILITY_COLUMN] == joined.loc[12, PROBABILITY_COLUMN] == expected
+    assert joined.loc[11, PROBABILITY_COLUMN] == index.loc[row_hash(sentences[1]), PROBABILITY_COLUMN]
+    assert joined.loc[13].drop(['text', 'label']).isna().all()
@@ -0,0 +1,21 @@
+import pytest
+
+from scripts.segmenters import RegexSegmenter, Segmenter
+
+def test_common_words_end_sentences():
+    assert RegexSegmenter().split('Did you go? No. They said no. Then we left.') == ['Did you go?', 'No.', 'They said no.', 'Then we left.']
+    assert RegexSegmenter().split('It was est. Sep. Mar. Co. Fine.') == ['It was est.', 'Sep.', 'Mar.', 'Co.', 'Fine.']
+
+def test_ambiguous_abbreviations_before_lowercase_or_digits():
+    text = 'See No. 5 for details. Smith et al. found it. It opened Mar. 3 this year.'
+    assert RegexSegmenter().split(text) == ['See No. 5 for details.', 'Smith et al. found it.', 'It opened Mar. 3 this year.']
+
+def test_abbreviations_and_initials():
+    assert RegexSegmenter().split('Dr. Smith met J. Doe. They left.') == ['Dr. Smith met J. Doe.', 'They left.']
+
+def test_segmenters_must_implement_split():
+    class Incomplete(Segmenter):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
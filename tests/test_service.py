@@ -0,0 +1,106 @@
+import json
+import pytest
+import http.client
+
+from test_predict import assert_same_results
+from scripts.service import InferenceService, ServiceClient, ServiceError
+
+@pytest.fixture(scope='module', params=[False, True], ids=['handler', 'scheduler'])
+def service(request, handler):
+    service = InferenceService(
+        handler, host='127.0.0.1', port=0, max_body_bytes=64 * 1024, max_batch_texts=4, use_scheduler=request.param
+    ).start()
+    yield service
+    service.close()
+
+@pytest.fixture
+def client(service):
+    return ServiceClient(service.url, pool_size=2, timeout=30)
+
+@pytest.fixture
+def text(sentences):
+    return ' '.join(sentences)
+
+def raw_request(service, method: str, path: str, body: bytes = None, headers: dict = None) -> tuple[int, dict]:
+    host, port = service.server.server_address[:2]
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b'{}')
+    finally:
+        conn.close()
+
+def test_classify_matches_the_handler(handler, client, text):
+    result = client.classify_text(text)
+    assert result['text_input'] == text
+    assert_same_results(result['results'], handler.classify_text(text)['results'])
+
+def test_batch_matches_the_handler(handler, client, sentences):
+    texts = [' '.join(sentences[:10]), sentences[10], '', ' '.join(sentences[11:])]
+    results = client.classify_texts(texts)
+    assert [result['text_input'] for result in results] == texts
+    for result, text in zip(results, texts):
+        assert_same_results(result['results'], handler.classify_text(text)['results'])
+
+def test_stream_matches_the_handler(handler, client, text):
+    chunks = list(client.classify_text_stream(text))
+    assert len(chunks) > 1
+    assert_same_results([result for chunk in chunks for result in chunk], handler.classify_text(text)['results'])
+
+def test_health_and_stats(handler, client):
+    assert client.model_key == handler.model_key
+    assert client.stats()['model_key'] == handler.model_key
+
+def test_oversized_requests_are_rejected(service, client):
+    status, body = raw_request(service, 'POST', '/classify', b'{"text": "' + b'a' * service.max_body_bytes + b'"}')
+    assert status == 413 and 'exceeds' in body['error']
+
+    with pytest.raises(ServiceError) as error:
+        client.classify_texts(['A sentence.'] * (service.max_batch_texts + 1))
+    assert error.value.status == 413
+
+@pytest.mark.parametrize('path, body', [
+    ('/classify', b'{not json'),
+    ('/classify', b'["a list"]'),
+    ('/classify', b'{"text": 1}'),
+    ('/classify/batch', b'{"texts": "not a list"}'),
+    ('/classify/stream', b'{}')
+])
+def test_invalid_requests_are_rejected(service, path, body):
+    status, payload = raw_request(service, 'POST', path, body, {'Content-Type': 'application/json'})
+    assert status == 400 and 'error' in payload
+
+def test_unknown_endpoints(service):
+    assert raw_request(service, 'GET', '/unknown')[0] == 404
+    assert raw_request(service, 'POST', '/classify/unknown', b'{}')[0] == 404
+
+def test_busy_service_answers_503(service, client):
+    # Hold every processing slot, so the request times out waiting for one
+    timeout = service.queue_timeout
+    service.queue_timeout = 0.05
+    held = [service._slots.acquire() for _ in range(service.max_concurrency)]
+    try:
+        with pytest.raises(ServiceError) as error:
+            client.classify_text('A sentence.')
+        assert error.value.status == 503
+    finally:
+        for _ in held:
+            service._slots.release()
+        service.queue_timeout = timeout
+    assert client.classify_text('A sentence.')['text_input'] == 'A sentence.'
+
+def test_connection_is_reused_after_an_abandoned_stream(client, text):
+    stream = client.classify_text_stream(text)
+    next(stream)
+    stream.close()
+
+    # The half-read connection is dropped rather than returned to the pool
+    assert client._idle.qsize() == 0
+
+    client.classify_text('A sentence.')
+    conn = client._idle.queue[-1]
+    sock = conn.sock
+    client.classify_text('Another sentence.')
+    assert client._idle.qsize() == 1
+    assert client._idle.queue[-1] is conn and conn.sock is sock